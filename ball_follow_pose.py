@@ -1,55 +1,59 @@
 #!/usr/bin/env python3
 """
 Ball tracker with depth - CORRECTED POLLING
-Updated to integrate with file_control.py: writes to velocities.txt, sits when close to ball
+Updated to integrate with file_control.py: writes to the command channel, sits when close to ball
+--backend daemon reuses the model kept loaded by detector_daemon.py (starts in milliseconds)
+Camera and model come up concurrently; the startup timeline prints at the first command
+Every frame's detection, distance and command go to --telemetry (telemetry_query.py --name perception)
+Per-stage glass-to-publish latency is printed at exit (and on /metrics with --metrics-port)
 """
-import pyrealsense2 as rs
+from startup import StartupTimeline
+boot = StartupTimeline()
 import numpy as np
 import time
-from ultralytics import YOLO
+import argparse
+import os
+from cmd_channel import CommandWriter
+from frame_source import add_source_args, open_source, Recorder
+from tracker_core import load_detector
+from telemetry import Telemetry, PERCEPTION_DTYPE, perception_record
+from latency_trace import FrameTrace, LatencyTracer, glass_time, serve_metrics
+
+BASE = os.path.dirname(os.path.abspath(__file__))  # /home/unitree/depth_test on the robot
+
+parser = argparse.ArgumentParser(description="Ball tracker with depth")
+parser.add_argument('--backend', choices=['ultralytics', 'onnx', 'daemon'], default='ultralytics')
+parser.add_argument('--metrics-port', type=int, default=0, help='serve latency on /metrics (0 = off)')
+parser.add_argument('--startup-log', default='', help='append the startup timeline to this JSONL file')
+parser.add_argument('--telemetry', default=os.path.join(BASE, 'telemetry'),
+                    help="per-frame binary records directory ('' = off, see telemetry_query.py)")
+add_source_args(parser)
+args = parser.parse_args()
+if args.depth_mode != 'align':
+    parser.error("this tracker samples a 10x10 aligned patch; use --depth-mode align")
 
 print("="*60)
 print("BALL TRACKER WITH DEPTH")
 print("="*60)
 
-print("\n1. Initializing RealSense...")
-pipeline = rs.pipeline()
-config = rs.config()
-
-config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-
-print("Starting pipeline...")
-profile = pipeline.start(config)
-
-depth_sensor = profile.get_device().first_depth_sensor()
-depth_scale = depth_sensor.get_depth_scale()
+boot.mark('imports + args')
+print(f"\n1. Initializing frame source ({args.source}) and loading ONNX model ({args.backend})...")
+camera = boot.start('camera', lambda: open_source(args).start())  # live: starts RealSense and warms up
+model = boot.start('model', load_detector, args.backend, 'yolov8s.onnx')
+source = camera.result()
+depth_scale = source.depth_scale
 print(f"✓ Depth scale: {depth_scale}")
-
-align = rs.align(rs.stream.color)
-
-# Warmup
-print("Warming up (polling mode)...")
-for i in range(30):
-    frames = pipeline.poll_for_frames()
-    if frames and i % 10 == 0:
-        print(f"  {i}/30")
-    time.sleep(0.033)
-
-print("✓ RealSense ready")
-
-# YOLO
-print("\n2. Loading ONNX model...")
-model = YOLO('yolov8s.onnx', task='detect')
-dummy = np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8)
-for _ in range(3):
-    _ = model(dummy, classes=[32], verbose=False)
+recorder = Recorder(args.record, source.meta()) if args.record else None
+tlm = Telemetry(args.telemetry, 'perception', PERCEPTION_DTYPE).start() if args.telemetry else None
+print("✓ Frame source ready")
+detect_fn = model.result()
 print("✓ Model ready")
 
-cmd_file = '/home/unitree/depth_test/velocities.txt'  # Updated to match file_control.py
-
-with open(cmd_file, 'w') as f:
-    f.write('0.0,0.0,0.0')
+cmd = CommandWriter()  # Shared with file_control.py
+cmd.send(0.0, 0.0, 0.0)
+tracer = LatencyTracer('ball_follow_pose')
+if args.metrics_port:
+    serve_metrics(tracer, args.metrics_port)
 
 print("\n" + "="*60)
 print("TRACKING ACTIVE")
@@ -57,40 +61,47 @@ print("="*60 + "\n")
 
 try:
     loop_count = 0
-    last_detection_time = time.time()
+    last_detection_time = None  # camera time (s), so replays are deterministic
     sitting = False  # Flag to track if sitting
     
     while True:
         loop_count += 1
         
         # Poll for frames
-        frames = pipeline.poll_for_frames()
+        pkt = source.poll()
         
-        if not frames:
+        if pkt is None:
             time.sleep(0.01)
             continue
         
-        # Align
-        aligned = align.process(frames)
-        depth_frame = aligned.get_depth_frame()
-        color_frame = aligned.get_color_frame()
+        # Align (no-op for recorded/synthetic frames)
+        trace = FrameTrace(pkt.frame_no, glass_time(pkt))
+        trace.mark('capture', pkt.t_capture)
+        pkt = source.prepare(pkt)
         
-        if not depth_frame or not color_frame:
+        if pkt is None:
             continue
+        trace.mark('align')
+        if recorder is not None:
+            recorder.record(pkt)
         
-        depth_image = np.asanyarray(depth_frame.get_data())
-        color_image = np.asanyarray(color_frame.get_data())
+        now = pkt.timestamp / 1000.0
+        if last_detection_time is None:
+            last_detection_time = now
+        depth_image = pkt.depth_image
+        color_image = pkt.color_image
         
         # Detect
-        results = model(color_image, classes=[32], verbose=False)
+        detection = detect_fn(color_image, [32])
+        trace.mark('inference')
+        depth, status, vx, vyaw = None, 'SEARCHING', 0.0, 0.1  # for telemetry
         
-        if len(results[0].boxes) > 0:
-            last_detection_time = time.time()
+        if detection is not None:
+            last_detection_time = now
             sitting = False  # Reset sitting flag on detection
             
             # Get detection
-            box = results[0].boxes[0]
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+            x1, y1, x2, y2 = detection[0]
             center_x = int((x1 + x2) / 2)
             center_y = int((y1 + y2) / 2)
             
@@ -98,14 +109,17 @@ try:
             region = depth_image[max(0, center_y-5):min(depth_image.shape[0], center_y+5),
                                  max(0, center_x-5):min(depth_image.shape[1], center_x+5)]
             valid_depths = region[(region > 0) & (region < 10)]
+            trace.mark('depth')
             if len(valid_depths) > 0:
                 depth = np.median(valid_depths) * depth_scale
                 
                 if depth < 0.5:  # Close to ball: sit down
-                    with open(cmd_file, 'w') as f:
-                        f.write('sit')
+                    cmd.send_pose('sit')
+                    boot.finish('first command', args.startup_log)
                     sitting = True
                     print("Ball close - sitting down")
+                    if tlm is not None:
+                        tlm.record(perception_record(pkt, 32, detection, depth, 'SITTING', 0.0, 0.0))
                     time.sleep(0.01)  # Brief pause after sitting
                     continue  # Skip velocity calculation
                 
@@ -114,35 +128,46 @@ try:
                 vyaw = -error_x * 0.005  # Turn speed
                 
                 if depth > 1.0:
-                    vx = 0.2  # Approach
+                    vx, status = 0.2, 'APPROACHING'  # Approach
                 elif depth < 0.3:
-                    vx = -0.1  # Back up
+                    vx, status = -0.1, 'BACKING'  # Back up
                 else:
-                    vx = 0.0
+                    vx, status = 0.0, 'HOLDING'
                 
                 vy = 0.0
+                trace.mark('fsm')
                 
-                with open(cmd_file, 'w') as f:
-                    f.write(f'{vx:.3f},{vy:.3f},{vyaw:.3f}')
+                cmd.send(vx, vy, vyaw, frame_id=pkt.frame_no, t_frame=trace.t_glass)
+                trace.mark('publish')
+                tracer.add(trace)
             else:
                 # No valid depth: search
-                with open(cmd_file, 'w') as f:
-                    f.write('0.000,0.000,0.100')  # Slow turn
+                cmd.send(0.0, 0.0, 0.1)  # Slow turn
         else:
             # No detection: search or sit if previously sitting
             if sitting:
-                with open(cmd_file, 'w') as f:
-                    f.write('sit')  # Maintain sit if close before
+                cmd.send_pose('sit')  # Maintain sit if close before
+                status, vyaw = 'SITTING', 0.0
             else:
-                with open(cmd_file, 'w') as f:
-                    f.write('0.000,0.000,0.100')  # Slow turn
+                cmd.send(0.0, 0.0, 0.1)  # Slow turn
+        boot.finish('first command', args.startup_log)  # every branch above sent one
+        if tlm is not None:
+            tlm.record(perception_record(pkt, 32, detection, depth, status, vx, vyaw))
         
         time.sleep(0.01)
 
 except KeyboardInterrupt:
     print("\nStopping...")
+except EOFError:
+    print("\nEnd of recording")
 finally:
-    with open(cmd_file, 'w') as f:
-        f.write('0.0,0.0,0.0')
-    pipeline.stop()
+    cmd.send(0.0, 0.0, 0.0)
+    source.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.frames} frames to {args.record} ({recorder.dropped} dropped)")
+    if tlm is not None:
+        tlm.close()
+        print(tlm.format_stats())
+    print(tracer.format())
     print("Stopped")
\ No newline at end of file
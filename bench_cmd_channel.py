@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: write-to-Move latency, shared-memory channel vs velocities.txt
+A producer process publishes commands at tracker rate; the consumer mimics the
+file_control.py loop (read, parse, Move) and records when each command reaches Move.
+Usage: python3 bench_cmd_channel.py [--rate 30] [--count 300] [--period 0.01]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import tempfile
+import time
+
+from cmd_channel import CommandReader, CommandWriter
+
+
+def fake_move(vx, vy, vyaw):
+    pass
+
+
+def text_producer(path, rate, count, stamps, start):
+    start.wait()
+    for seq in range(1, count + 1):
+        stamps[seq] = time.monotonic()
+        with open(path, 'w') as f:
+            f.write(f'0.300,{seq}.0,-0.125')  # vy carries the sequence number
+        time.sleep(1.0 / rate)
+
+
+def shm_producer(path, rate, count, stamps, start):
+    writer = CommandWriter(path)
+    start.wait()
+    for seq in range(1, count + 1):
+        stamps[seq] = time.monotonic()
+        writer.send(0.3, float(seq), -0.125)
+        time.sleep(1.0 / rate)
+
+
+def text_consumer(path, count, period, deadline):
+    """Same read/parse path as the old file_control.py loop."""
+    latencies, read_errors, read_time, reads = {}, 0, 0.0, 0
+    last = 0
+    while last < count and time.monotonic() < deadline:
+        t0 = time.perf_counter()
+        seq = last
+        try:
+            with open(path, 'r') as f:
+                parts = f.read().strip().split(',')
+            vx, vy, vyaw = float(parts[0]), float(parts[1]), float(parts[2])
+            fake_move(vx, vy, vyaw)
+            seq = int(vy)
+        except Exception:
+            read_errors += 1
+        read_time += time.perf_counter() - t0
+        reads += 1
+        if seq != last:
+            latencies[seq] = time.monotonic()
+            last = seq
+        if period:
+            time.sleep(period)
+    return latencies, read_errors, read_time / max(reads, 1)
+
+
+def shm_consumer(path, count, period, deadline):
+    reader = CommandReader(path)
+    latencies, read_time, reads = {}, 0.0, 0
+    last = 0
+    while last < count and time.monotonic() < deadline:
+        t0 = time.perf_counter()
+        c = reader.read()
+        read_time += time.perf_counter() - t0
+        reads += 1
+        if c is not None:
+            fake_move(c.vx, c.vy, c.vyaw)
+            seq = int(c.vy)
+            if seq != last:
+                latencies[seq] = time.monotonic()
+                last = seq
+        if period:
+            time.sleep(period)
+    return latencies, reader.torn_reads, read_time / max(reads, 1)
+
+
+def run(name, producer, consumer, path, args):
+    stamps = mp.Array('d', args.count + 1, lock=False)
+    start = mp.Event()
+    proc = mp.Process(target=producer, args=(path, args.rate, args.count, stamps, start))
+    proc.start()
+    time.sleep(0.2)
+    start.set()
+    deadline = time.monotonic() + args.count / args.rate + 2.0
+    moved, errors, per_read = consumer(path, args.count, args.period, deadline)
+    proc.join()
+    lat = sorted((moved[s] - stamps[s]) * 1000 for s in moved if stamps[s] > 0)
+    if not lat:
+        print(f"{name:8s} | no commands received")
+        return
+    p95 = lat[int(0.95 * (len(lat) - 1))]
+    print(f"{name:8s} | seen {len(lat):4d}/{args.count} | "
+          f"mean {statistics.mean(lat):6.3f} ms | p50 {statistics.median(lat):6.3f} ms | "
+          f"p95 {p95:6.3f} ms | max {lat[-1]:6.3f} ms | "
+          f"read {per_read * 1e6:6.1f} us | torn reads {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=float, default=30.0, help='producer rate (Hz)')
+    parser.add_argument('--count', type=int, default=300, help='commands per run')
+    parser.add_argument('--period', type=float, default=0.01,
+                        help='consumer sleep per iteration (0 = spin)')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("COMMAND CHANNEL BENCHMARK")
+    print("="*60)
+    print(f"rate={args.rate:.0f} Hz, count={args.count}, consumer period={args.period * 1000:.1f} ms\n")
+
+    tmp = tempfile.mkdtemp(prefix='bolt_bench_')
+    shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tmp
+    run('text', text_producer, text_consumer, os.path.join(tmp, 'velocities.txt'), args)
+    run('shm', shm_producer, shm_consumer, os.path.join(shm_dir, f'bolt_bench_{os.getpid()}'), args)
+    os.unlink(os.path.join(shm_dir, f'bolt_bench_{os.getpid()}'))
+
+
+if __name__ == '__main__':
+    main()
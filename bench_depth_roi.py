@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full-frame rs.align vs ROI-only depth mapping (depth_roi.RoiDepth)
+Needs the RealSense. For every frame both paths sample the same grid of box centers;
+reports per-frame latency and the distance difference of the ROI path against rs.align.
+Usage: python3 bench_depth_roi.py [--frames 300] [--points 20]
+"""
+import argparse
+import time
+
+import numpy as np
+import pyrealsense2 as rs
+
+from depth_roi import RoiDepth, StreamGeometry
+from tracker_core import sample_depth
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--points', type=int, default=20, help='box centers sampled per frame')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("DEPTH ALIGNMENT BENCHMARK")
+    print("="*60)
+
+    pipeline = rs.pipeline()
+    config = rs.config()
+    config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
+    config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
+    profile = pipeline.start(config)
+    depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+    align = rs.align(rs.stream.color)
+    roi = RoiDepth(StreamGeometry.from_profile(profile))
+    for _ in range(30):
+        pipeline.wait_for_frames()
+
+    cols = int(np.ceil(np.sqrt(args.points * 4 / 3)))
+    rows = int(np.ceil(args.points / cols))
+    xs = np.linspace(40, 600, cols).astype(int)
+    ys = np.linspace(40, 440, rows).astype(int)
+    points = [(x, y) for y in ys for x in xs][:args.points]
+
+    t_align, t_roi, t_roi_one, errors = [], [], [], []
+    agree = total = 0
+    try:
+        for _ in range(args.frames):
+            frames = pipeline.wait_for_frames()
+
+            t0 = time.perf_counter()
+            aligned = align.process(frames)
+            aligned_depth = np.asanyarray(aligned.get_depth_frame().get_data())
+            ref = [sample_depth(aligned_depth, x, y, depth_scale) for x, y in points]
+            t_align.append((time.perf_counter() - t0) * 1000.0)
+
+            t0 = time.perf_counter()
+            raw_depth = np.asanyarray(frames.get_depth_frame().get_data())
+            t1 = time.perf_counter()
+            got = [roi.sample(raw_depth, x, y, depth_scale) for x, y in points]
+            t2 = time.perf_counter()
+            t_roi.append((t2 - t0) * 1000.0)
+            t_roi_one.append((t2 - t1) * 1000.0 / len(points))
+
+            for a, b in zip(ref, got):
+                total += 1
+                if (a is None) == (b is None):
+                    agree += 1
+                if a is not None and b is not None:
+                    errors.append(abs(a - b) * 100.0)
+    finally:
+        pipeline.stop()
+
+    print(f"{len(t_align)} frames, {len(points)} points per frame\n")
+    print(f"{'path':22s} | {'mean ms':>8s} | {'p95 ms':>8s}")
+    print(f"{'rs.align + sample':22s} | {np.mean(t_align):8.3f} | {percentile(t_align, 95):8.3f}")
+    print(f"{'ROI (all points)':22s} | {np.mean(t_roi):8.3f} | {percentile(t_roi, 95):8.3f}")
+    print(f"{'ROI (one box)':22s} | {np.mean(t_roi_one):8.3f} | {percentile(t_roi_one, 95):8.3f}")
+    print(f"\nValid/invalid agreement: {agree}/{total} ({100.0 * agree / max(total, 1):.1f}%)")
+    if errors:
+        print(f"|distance error| cm: mean {np.mean(errors):.2f}, p95 {percentile(errors, 95):.2f}, "
+              f"max {np.max(errors):.2f}")
+
+
+if __name__ == '__main__':
+    main()
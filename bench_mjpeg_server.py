@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Load test: the original MJPEGHandler vs the encode-once broadcast server (mjpeg_server.py)
+A publisher thread plays the tracking loop (synthetic 640x480 frames at --fps); N local
+clients read the stream, some of them slowed down to --slow-fps. Reports received fps and
+frame age per client, how long the publisher blocks on the frame lock, and CPU time.
+Fails if the slow clients' frame age keeps growing with the broadcast server (frames
+queueing for them instead of being skipped).
+Usage: python3 bench_mjpeg_server.py [--clients 20] [--slow 5] [--fps 30] [--seconds 8]
+"""
+import argparse
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import cv2
+import numpy as np
+
+from control_loop import Histogram
+from mjpeg_server import FrameBroadcaster, start_stream_server
+
+AGE_EDGES_MS = [5, 10, 20, 35, 50, 75, 100, 200, 500, 1000]
+SLOW_RCVBUF = 32 * 1024
+
+
+def synthetic_frames(n=30):
+    """Moving ball on noise, so JPEG sizes are realistic."""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    base = cv2.GaussianBlur(base, (9, 9), 0)
+    frames = []
+    for i in range(n):
+        f = base.copy()
+        cv2.circle(f, (80 + i * 16, 240), 40, (0, 255, 0), -1)
+        cv2.putText(f, f"frame {i}", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        frames.append(f)
+    return frames
+
+
+# --- the original server, as it was in test_coloured_model.py -----------------
+legacy_frame = None
+legacy_lock = threading.Lock()
+legacy_stamp = 0.0
+legacy_running = True
+
+
+class LegacyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=frame')
+        self.end_headers()
+        try:
+            while legacy_running:  # the original looped forever; this lets the bench shut down
+                with legacy_lock:
+                    if legacy_frame is not None:
+                        _, jpeg = cv2.imencode('.jpg', legacy_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+                        self.wfile.write(b'--frame\r\n')
+                        self.send_header('Content-type', 'image/jpeg')
+                        self.send_header('Content-length', len(jpeg))
+                        self.send_header('X-Timestamp', f"{legacy_stamp:.6f}")
+                        self.end_headers()
+                        self.wfile.write(jpeg.tobytes())
+                        self.wfile.write(b'\r\n')
+                time.sleep(0.033)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args): pass
+
+
+def legacy_publish(image):
+    global legacy_frame, legacy_stamp
+    with legacy_lock:
+        legacy_frame = image
+        legacy_stamp = time.monotonic()
+
+
+# --- clients ------------------------------------------------------------------
+class StreamClient(threading.Thread):
+    """Reads multipart parts by Content-Length; optional per-frame delay to act slow."""
+
+    def __init__(self, port, delay=0.0):
+        super().__init__(daemon=True)
+        self.port = port
+        self.delay = delay
+        self.frames = 0
+        self.age = Histogram(AGE_EDGES_MS)
+        self.samples = []  # (receive time, age ms)
+        self.error = None
+        self.stop = False
+
+    def run(self):
+        try:
+            sock = socket.socket()
+            if self.delay:
+                # a slow viewer is a slow link, which holds a few frames in flight; a reader
+                # that just sleeps would otherwise let the kernel grow its receive buffer to MBs
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_RCVBUF)
+            sock.settimeout(5)
+            sock.connect(('127.0.0.1', self.port))
+            sock.sendall(b'GET / HTTP/1.0\r\n\r\n')
+            f = sock.makefile('rb')
+            while f.readline() not in (b'\r\n', b''):  # response headers
+                pass
+            while not self.stop:
+                headers = {}
+                line = f.readline()
+                while line and line.strip() != b'--frame':
+                    line = f.readline()
+                if not line:
+                    break
+                for line in iter(f.readline, b'\r\n'):
+                    key, _, value = line.decode().partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                f.read(int(headers['content-length']))
+                self.frames += 1
+                if 'x-timestamp' in headers:
+                    now = time.monotonic()
+                    age = (now - float(headers['x-timestamp'])) * 1000.0
+                    self.age.add(age)
+                    self.samples.append((now, age))
+                if self.delay:
+                    time.sleep(self.delay)
+            sock.close()
+        except OSError as e:
+            self.error = e
+
+
+def run(mode, args, frames):
+    global legacy_running
+    port = args.port
+    if mode == 'legacy':
+        server = HTTPServer(('127.0.0.1', port), LegacyHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        publish = legacy_publish
+        stream = None
+    else:
+        stream = FrameBroadcaster(quality=70)
+        server = start_stream_server(stream, port)
+        publish = stream.publish
+
+    clients = [StreamClient(port, 1.0 / args.slow_fps if i < args.slow else 0.0)
+               for i in range(args.clients)]
+    for c in clients:
+        c.start()
+    time.sleep(0.3)
+
+    publish_ms = Histogram([0.01, 0.1, 1, 5, 10, 20, 50])
+    period = 1.0 / args.fps
+    cpu0 = time.process_time()
+    start = time.monotonic()
+    i = 0
+    while time.monotonic() - start < args.seconds:
+        t0 = time.perf_counter()
+        publish(frames[i % len(frames)])
+        publish_ms.add((time.perf_counter() - t0) * 1000.0)
+        i += 1
+        time.sleep(max(0.0, start + i * period - time.monotonic()))
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu0
+
+    for c in clients:
+        c.stop = True
+    legacy_running = False
+    server.shutdown()
+    server.server_close()
+    if stream is not None:
+        stream.stop()
+    return clients, publish_ms, cpu / elapsed, elapsed
+
+
+def age_growth(client):
+    """Mean frame age (ms) of the second half of the run minus the first half."""
+    if len(client.samples) < 4:
+        return 0.0
+    half = len(client.samples) // 2
+    early = [a for _, a in client.samples[:half]]
+    late = [a for _, a in client.samples[half:]]
+    return sum(late) / len(late) - sum(early) / len(early)
+
+
+def report(title, clients, publish_ms, cpu, elapsed, args):
+    print(f"\n{title}")
+    served = [c for c in clients if c.frames]
+    slow, fast = clients[:args.slow], clients[args.slow:]
+    for label, group in (('fast', fast), ('slow', slow)):
+        if not group:
+            continue
+        fps = [c.frames / elapsed for c in group]
+        ages = [c.age.mean() for c in group if c.age.n]
+        print(f"  {label} clients: {len(group):3d}  fps min/mean/max = "
+              f"{min(fps):5.1f}/{sum(fps) / len(fps):5.1f}/{max(fps):5.1f}"
+              + (f"  mean frame age {sum(ages) / len(ages):6.1f} ms" if ages else "")
+              + f"  growth {max(age_growth(c) for c in group):+7.1f} ms")
+    print(f"  clients served: {len(served)}/{len(clients)}")
+    print(f"  publisher: mean={publish_ms.mean():.3f} ms max={publish_ms.max:.3f} ms")
+    print(f"  process CPU: {cpu * 100:.0f}% of one core")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--slow', type=int, default=5, help='how many clients are slow readers')
+    parser.add_argument('--slow-fps', type=float, default=5.0)
+    parser.add_argument('--fps', type=float, default=30.0, help='publish rate of the fake tracker')
+    parser.add_argument('--seconds', type=float, default=8.0)
+    parser.add_argument('--port', type=int, default=18080)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("MJPEG STREAM LOAD TEST")
+    print("="*60)
+    print(f"{args.clients} clients ({args.slow} at {args.slow_fps:g} fps), publish {args.fps:g} fps")
+    frames = synthetic_frames()
+
+    for mode, title in (('legacy', '1. Original HTTPServer + per-client encode under frame_lock'),
+                        ('broadcast', '2. Encode-once broadcast (mjpeg_server.py)')):
+        clients, publish_ms, cpu, elapsed = run(mode, args, frames)
+        report(title, clients, publish_ms, cpu, elapsed, args)
+        time.sleep(0.5)
+
+    # broadcast clients (last run): a slow viewer lags by what its buffers hold, but no more
+    growth = max((age_growth(c) for c in clients[:args.slow]), default=0.0)
+    assert growth < 1000.0 / args.slow_fps, f"slow clients queue frames: age grew {growth:.0f} ms"
+    print(f"\n✓ Slow clients skip frames (frame age growth {growth:+.1f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Loopback benchmark: on-device vs offloaded detection under simulated network delay
+Runs the trackers' detect + depth + FSM path over the same frames once with the model
+on this machine and then through offload.py (server in this process, on 127.0.0.1)
+behind a delay proxy that holds every chunk for --delay-ms in each direction and,
+with --bandwidth, serializes it at that link rate. --robots N clients share the server
+at --fps each, so the server can batch across them. Reports end-to-end latency per
+frame, how many frames fell back on-device and the server's batch sizes.
+On-device runs a single client: each robot would have its own Jetson.
+Usage: python3 bench_offload.py --model onnx:final_best.onnx [--remote-model onnx:final_best_dynamic.onnx]
+                                [--delays 0,10,30,60] [--robots 1] [--fps 30] [--frames 300]
+                                [--budget 60] [--bandwidth 0]
+"""
+import argparse
+import collections
+import socket
+import threading
+import time
+
+from bench_perception import FakeCommandSink, load_frames, percentiles
+from detector_daemon import ResidentModel
+from offload import InferenceServer, OffloadDetector
+from tracker_core import box_center, fsm_command, load_detector, sample_depth
+
+CLASSES = [0, 1, 2]
+
+
+class DelayProxy:
+    """TCP forwarder on 127.0.0.1 adding a fixed one-way delay (and optional link rate)."""
+
+    def __init__(self, upstream, delay_s, bandwidth_mbps=0.0):
+        self.upstream = upstream
+        self.delay = delay_s
+        self.byte_s = 8.0 / (bandwidth_mbps * 1e6) if bandwidth_mbps > 0 else 0.0
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, name='proxy-accept', daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.upstream)
+            for s in (client, server):
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, server)
+            self._pipe(server, client)
+
+    def _pipe(self, src, dst):
+        chunks = collections.deque()
+        ready = threading.Condition()
+
+        def receive():
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b''
+                with ready:
+                    chunks.append((time.perf_counter(), data))
+                    ready.notify()
+                if not data:
+                    return
+
+        def deliver():
+            link_free = 0.0
+            while True:
+                with ready:
+                    while not chunks:
+                        ready.wait()
+                    t_in, data = chunks.popleft()
+                if not data:
+                    dst.close()
+                    return
+                due = max(t_in + self.delay, link_free + len(data) * self.byte_s)
+                link_free = due
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=receive, name='proxy-recv', daemon=True).start()
+        threading.Thread(target=deliver, name='proxy-send', daemon=True).start()
+
+    def close(self):
+        self.listener.close()
+
+
+def run_robot(detect_fn, frames, depth_scale, fps, n_frames, out):
+    """Paced tracker loop; appends end-to-end ms (detect + depth + FSM + send) to out."""
+    sink = FakeCommandSink()
+    period = 1.0 / fps if fps > 0 else 0.0
+    next_t = time.perf_counter()
+    for i in range(n_frames):
+        color, depth = frames[i % len(frames)]
+        t0 = time.perf_counter()
+        detection = detect_fn(color, CLASSES)
+        if detection is not None:
+            xyxy, _, _ = detection
+            x, y = box_center(xyxy)
+            distance = sample_depth(depth, x, y, depth_scale)
+            if distance is not None:
+                vx, vyaw, _ = fsm_command(x, distance)
+                sink.send(vx, 0.0, vyaw)
+        out.append((time.perf_counter() - t0) * 1000.0)
+        next_t += period
+        wait = next_t - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+
+
+def run_case(detect_fns, frames, depth_scale, args):
+    """End-to-end latencies (ms) of one concurrent client per detect_fn."""
+    latencies = [[] for _ in detect_fns]
+    threads = [threading.Thread(target=run_robot, args=(fn, frames, depth_scale, args.fps, args.frames, out))
+               for fn, out in zip(detect_fns, latencies)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [ms for out in latencies for ms in out]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default='onnx:final_best.onnx', help='on-device backend:path')
+    parser.add_argument('--remote-model', default=None,
+                        help='server backend:path (default: --model; a dynamic-batch export batches)')
+    parser.add_argument('--delays', default='0,10,30,60', help='one-way network delays (ms)')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='link rate in Mbit/s (0 = unlimited)')
+    parser.add_argument('--robots', type=int, default=1, help='concurrent offloading clients')
+    parser.add_argument('--fps', type=float, default=30.0, help='frame rate of each client')
+    parser.add_argument('--frames', type=int, default=300, help='frames per client and case')
+    parser.add_argument('--budget', type=float, default=60.0, help='offload round-trip budget (ms)')
+    parser.add_argument('--max-batch', type=int, default=4)
+    parser.add_argument('--max-wait-ms', type=float, default=3.0)
+    parser.add_argument('--source', default='synthetic', help="'synthetic' or a recording directory")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("OFFLOAD BENCHMARK - ON-DEVICE VS REMOTE INFERENCE")
+    print("="*60)
+    frames, depth_scale, _, _, _ = load_frames(args.source, min(args.frames, 300))
+    backend, path = args.model.split(':', 1)
+    remote_backend, remote_path = (args.remote_model or args.model).split(':', 1)
+    local_fn = load_detector(backend, path)
+    resident = ResidentModel(remote_backend, remote_path)
+    print(f"✓ {len(frames)} frames; on-device {path} ({backend}), server {resident.name} ({remote_backend})\n")
+
+    print(f"{'case':>16s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'remote':>7s} {'fallbacks':>9s}  server")
+    lat = run_case([local_fn], frames, depth_scale, args)
+    p = percentiles(lat)
+    print(f"{'on-device':>16s} {p['p50']:8.1f} {p['p95']:8.1f} {p['p99']:8.1f} {'-':>7s} {'-':>9s}")
+
+    for delay_ms in [float(d) for d in args.delays.split(',')]:
+        server = InferenceServer([resident], 0, args.max_batch, args.max_wait_ms / 1000.0, host='127.0.0.1')
+        threading.Thread(target=server.serve_forever, name='offload-server', daemon=True).start()
+        proxy = DelayProxy(server.server_address, delay_ms / 1000.0, args.bandwidth)
+        dets = [OffloadDetector('127.0.0.1', proxy.port, resident.name, local=lambda: local_fn,
+                                budget_ms=args.budget) for _ in range(args.robots)]
+        try:
+            lat = run_case([d.detect for d in dets], frames, depth_scale, args)
+        finally:
+            for d in dets:
+                d.close()  # also ends the proxied connections
+            proxy.close()
+            server.shutdown()
+            server.server_close()
+        p = percentiles(lat)
+        remote = sum(d.remote_frames for d in dets)
+        total = remote + sum(d.local_frames for d in dets)
+        name = f"offload +{delay_ms:.0f}ms"
+        print(f"{name:>16s} {p['p50']:8.1f} {p['p95']:8.1f} {p['p99']:8.1f} "
+              f"{remote / max(total, 1):7.0%} {sum(d.fallbacks for d in dets):9d}  {server.format_stats()}")
+
+    print(f"\nend-to-end = detect + depth + FSM + send per frame; delay is one-way, "
+          f"{args.robots} robot(s) at {args.fps:.0f} fps, budget {args.budget:.0f} ms")
+    print("remote = share of frames answered by the server (the rest ran on-device after a fallback)")
+
+
+if __name__ == '__main__':
+    main()
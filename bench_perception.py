@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Offline perception benchmark: detector backends/models x depth strategies, no robot needed
+Each configuration runs the trackers' detection + depth + FSM path over the same frames
+(synthetic or a recording made with --record) in its own process, with a fake command
+sink, and reports throughput, per-frame latency percentiles, CPU utilisation, memory
+and detection rate as <out>.json and <out>.md. Memory is the RSS growth from loading and
+running the model, measured on top of the preloaded frames (reported separately), so
+their size does not hide the model footprint. --baseline compares against an earlier
+JSON and flags configurations that got slower.
+Configurations are backend:weights[:classes], e.g.
+    ultralytics:yolov8n.pt:32  onnx:yolov8s.onnx:32  ultralytics:final_best.pt  onnx:final_best.onnx
+Depth strategies: center (7x7 median, tracker_core.sample_depth), box (median of the
+inner half of the box), roi (depth_roi.RoiDepth; needs a recording made with
+--depth-mode roi).
+Usage: python3 bench_perception.py --models onnx:final_best.onnx,ultralytics:final_best.pt
+                                   [--depth center,box] [--source synthetic] [--frames 300]
+                                   [--out bench_results/perception] [--baseline old.json]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import resource
+import time
+
+import numpy as np
+
+from tracker_core import fsm_command, load_detector, sample_depth, box_center
+
+DEFAULT_CLASSES = [0, 1, 2]
+COCO_SPORTS_BALL = [32]
+
+
+class FakeCommandSink:
+    """Stands in for cmd_channel.CommandWriter; counts what the FSM would have sent."""
+
+    def __init__(self):
+        self.sent = 0
+        self.last = None
+
+    def send(self, vx, vy, vyaw, **kwargs):
+        self.sent += 1
+        self.last = (vx, vy, vyaw)
+
+
+def parse_config(spec):
+    parts = spec.split(':')
+    backend, path = parts[0], parts[1]
+    if len(parts) > 2:
+        classes = [int(c) for c in parts[2].split('+')]
+    else:
+        classes = COCO_SPORTS_BALL if os.path.basename(path).startswith('yolov8') else DEFAULT_CLASSES
+    return backend, path, classes
+
+
+def box_depth(depth_image, xyxy, depth_scale):
+    """Median of valid depth in the central half of the box (m), or None."""
+    x1, y1, x2, y2 = [int(v) for v in xyxy]
+    qx, qy = (x2 - x1) // 4, (y2 - y1) // 4
+    patch = depth_image[y1 + qy:y2 - qy + 1, x1 + qx:x2 - qx + 1]
+    valid = patch[patch > 0]
+    if len(valid) < 5:
+        return None
+    distance = float(np.median(valid)) * depth_scale
+    return distance if 0.1 <= distance <= 3.0 else None
+
+
+def load_frames(source_spec, frames):
+    """[(color, depth)], depth_scale, aligned, geometry, ground truth (synthetic only)."""
+    from frame_source import RecordedSource, SyntheticSource
+    if source_spec == 'synthetic':
+        source = SyntheticSource(frames=frames, realtime=False)
+    else:
+        source = RecordedSource(source_spec, realtime=False)
+    out, truth = [], []
+    try:
+        while frames is None or len(out) < frames:
+            pkt = source.prepare(source.read())
+            out.append((pkt.color_image, pkt.depth_image))
+            if source_spec == 'synthetic':
+                truth.append(source.ball_state(pkt.frame_no)[3])
+    except EOFError:
+        pass
+    return (out, source.depth_scale, getattr(source, 'aligned', True),
+            getattr(source, 'geometry', None), truth or None)
+
+
+def current_rss_mb():
+    """Current resident set size (MB) of this process (Linux /proc)."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': float('nan'), 'p95': float('nan'), 'p99': float('nan')}
+    a = np.asarray(values)
+    return {'p50': float(np.percentile(a, 50)), 'p95': float(np.percentile(a, 95)),
+            'p99': float(np.percentile(a, 99))}
+
+
+def run_config(spec, depth_mode, args, result_queue):
+    """Child process: load, warm up, then time every frame."""
+    try:
+        backend, path, classes = parse_config(spec)
+        frames, depth_scale, aligned, geometry, truth = load_frames(args.source, args.frames)
+        if not aligned and depth_mode != 'roi':
+            raise ValueError("recording has raw (unaligned) depth; only --depth roi applies")
+        if depth_mode == 'roi':
+            if geometry is None:
+                raise ValueError("roi depth needs a raw-depth recording (--depth-mode roi)")
+            from depth_roi import RoiDepth
+            roi = RoiDepth(geometry)
+            depth_fn = lambda depth, xyxy: roi.sample(depth, *box_center(xyxy), depth_scale)
+        elif depth_mode == 'box':
+            depth_fn = lambda depth, xyxy: box_depth(depth, xyxy, depth_scale)
+        else:
+            depth_fn = lambda depth, xyxy: sample_depth(depth, *box_center(xyxy), depth_scale)
+
+        frames_rss = current_rss_mb()
+        t_load = time.perf_counter()
+        detect_fn = load_detector(backend, path)
+        load_s = time.perf_counter() - t_load
+        sink = FakeCommandSink()
+
+        total, detect_ms, depth_ms = [], [], []
+        detected = with_depth = 0
+        errors = []
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        for i in range(args.repeat * len(frames)):
+            color, depth = frames[i % len(frames)]
+            t0 = time.perf_counter()
+            detection = detect_fn(color, classes)
+            t1 = time.perf_counter()
+            if detection is not None:
+                detected += 1
+                xyxy, _, _ = detection
+                distance = depth_fn(depth, xyxy)
+                t2 = time.perf_counter()
+                depth_ms.append((t2 - t1) * 1000.0)
+                if distance is not None:
+                    with_depth += 1
+                    vx, vyaw, _ = fsm_command(box_center(xyxy)[0], distance)
+                    sink.send(vx, 0.0, vyaw)
+                    if truth is not None:
+                        errors.append(abs(distance - truth[i % len(frames)]))
+            total.append((time.perf_counter() - t0) * 1000.0)
+            detect_ms.append((t1 - t0) * 1000.0)
+        wall = time.perf_counter() - wall0
+        cpu = time.process_time() - cpu0
+        n = len(total)
+        result_queue.put({
+            'config': spec, 'depth': depth_mode, 'frames': n,
+            'load_s': load_s, 'fps': n / wall, 'cpu_pct': 100.0 * cpu / wall,
+            'frames_rss_mb': frames_rss, 'model_rss_mb': current_rss_mb() - frames_rss,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+            'frame_ms': percentiles(total), 'detect_ms': percentiles(detect_ms),
+            'depth_ms': percentiles(depth_ms),
+            'detection_rate': detected / n if n else 0.0,
+            'depth_rate': with_depth / detected if detected else 0.0,
+            'commands': sink.sent,
+            'distance_mae_m': float(np.mean(errors)) if errors else None,
+        })
+    except Exception as e:
+        result_queue.put({'config': spec, 'depth': depth_mode, 'error': f"{type(e).__name__}: {e}"})
+
+
+def wait_row(process, result_queue, poll=1.0):
+    """The child's result row, or None if it exits without one (segfault, OOM kill)."""
+    while True:
+        try:
+            return result_queue.get(timeout=poll)
+        except queue.Empty:
+            if not process.is_alive():
+                try:  # a row put just before exiting may still be in flight
+                    return result_queue.get(timeout=poll)
+                except queue.Empty:
+                    return None
+
+
+def format_table(rows, baseline=None, tolerance=0.1):
+    base = {(r['config'], r['depth']): r for r in baseline or [] if 'error' not in r}
+    lines = ["| config | depth | fps | frame p50/p95/p99 ms | detect p50 ms | CPU % | model RSS MB | "
+             "det rate | depth MAE m | vs baseline |",
+             "|---|---|---:|---:|---:|---:|---:|---:|---:|---|"]
+    for r in rows:
+        if 'error' in r:
+            lines.append(f"| {r['config']} | {r['depth']} | error: {r['error']} |||||||")
+            continue
+        f = r['frame_ms']
+        mae = f"{r['distance_mae_m']:.3f}" if r['distance_mae_m'] is not None else 'n/a'
+        cmp = ''
+        old = base.get((r['config'], r['depth']))
+        if old is not None:
+            change = r['frame_ms']['p95'] / old['frame_ms']['p95'] - 1.0
+            cmp = f"p95 {change:+.0%}" + (" **REGRESSION**" if change > tolerance else "")
+        lines.append(f"| {r['config']} | {r['depth']} | {r['fps']:.1f} | "
+                     f"{f['p50']:.1f}/{f['p95']:.1f}/{f['p99']:.1f} | {r['detect_ms']['p50']:.1f} | "
+                     f"{r['cpu_pct']:.0f} | {r['model_rss_mb']:.0f} | {r['detection_rate']:.2f} | "
+                     f"{mae} | {cmp} |")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models', default='onnx:final_best.onnx',
+                        help='comma-separated backend:weights[:classes] (classes joined with +)')
+    parser.add_argument('--depth', default='center,box', help='center, box, roi')
+    parser.add_argument('--source', default='synthetic', help="'synthetic' or a recording directory")
+    parser.add_argument('--frames', type=int, default=300, help='frames to load (synthetic length)')
+    parser.add_argument('--repeat', type=int, default=1, help='passes over the frame set')
+    parser.add_argument('--out', default='bench_results/perception')
+    parser.add_argument('--baseline', default=None, help='earlier <out>.json to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='p95 slowdown flagged as regression')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("PERCEPTION BENCHMARK")
+    print("="*60)
+    configs = [(m, d) for m in args.models.split(',') for d in args.depth.split(',')]
+    print(f"{len(configs)} configuration(s), source={args.source}, frames={args.frames} x {args.repeat}\n")
+
+    ctx = mp.get_context('spawn')  # fresh interpreter per config: clean RSS and no shared model state
+    rows = []
+    for spec, depth_mode in configs:
+        q = ctx.Queue()
+        p = ctx.Process(target=run_config, args=(spec, depth_mode, args, q))
+        p.start()
+        row = wait_row(p, q)
+        p.join()
+        if row is None:
+            row = {'config': spec, 'depth': depth_mode, 'error': f"worker died (exit code {p.exitcode})"}
+        rows.append(row)
+        if 'error' in row:
+            print(f"✗ {spec} / {depth_mode}: {row['error']}")
+        else:
+            print(f"✓ {spec} / {depth_mode}: {row['fps']:.1f} fps, p95 {row['frame_ms']['p95']:.1f} ms, "
+                  f"model +{row['model_rss_mb']:.0f} MB over {row['frames_rss_mb']:.0f} MB of frames")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    table = format_table(rows, baseline, args.tolerance)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out + '.json', 'w') as f:
+        json.dump({'source': args.source, 'frames': args.frames, 'repeat': args.repeat,
+                   'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': rows}, f, indent=2)
+    with open(args.out + '.md', 'w') as f:
+        f.write(f"# Perception benchmark ({args.source}, {args.frames} frames)\n\n{table}\n")
+    print("\n" + table)
+    print(f"\n✓ {args.out}.json, {args.out}.md")
+
+
+if __name__ == '__main__':
+    main()
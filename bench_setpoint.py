@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Closed-loop yaw tracking: last-setpoint hold vs SetpointShaper (prediction, slew limits)
+Simulates the whole loop at the control rate: target bearing -> camera at --fps ->
+tracker FSM + BearingFilter -> setpoint delivered after --latency (+ jitter) ->
+file_control at --rate -> robot yaw rate as a first-order lag (--tau) -> robot yaw.
+Reports RMS/max bearing error, step overshoot and rise time, and how much the sent
+vyaw jumps between cycles, for each target motion.
+--replay DIR rebuilds the target's world bearing from a robot run's telemetry
+(perception box column + integrated control yaw) and replays it as one more scenario.
+Usage: python3 bench_setpoint.py [--latency 0.06] [--jitter 0.01] [--fps 30] [--rate 100]
+                                 [--seconds 12] [--replay telemetry/]
+"""
+import argparse
+import bisect
+import math
+import random
+from collections import deque
+
+from control_loop import SetpointShaper
+from tracker_core import (FRAME_W, FOCAL_PX, TARGET_DISTANCE, YAW_PER_BEARING, BearingFilter,
+                          fsm_command, pixel_bearing)
+
+HALF_FOV = math.atan2(FRAME_W / 2.0, FOCAL_PX)
+STEP_AT, STEP_SIZE = 1.0, 0.4
+
+
+def scenario(name):
+    """Target world bearing (rad, + = left / counter-clockwise) as a function of time."""
+    if name == 'step':
+        return lambda t: STEP_SIZE if t >= STEP_AT else 0.0
+    if name == 'sine':  # ball rolled back and forth across the view
+        return lambda t: 0.3 * math.sin(2 * math.pi * t / 6.0)
+    if name == 'ramp':  # target circling the robot at 0.15 rad/s
+        return lambda t: 0.15 * t
+    raise ValueError(name)
+
+
+def replay_trajectory(directory):
+    """Target world bearing of the latest recorded run: robot yaw (integrated sent vyaw)
+    minus the image bearing of the detected box. Times start at 0."""
+    from telemetry import load
+    perception = load(directory, 'perception')
+    control = load(directory, 'control')
+    seen = perception[perception['cls'] >= 0]
+    t0 = max(seen['t'][0], control['t'][0])
+    ct, cyaw = control['t'].tolist(), control['myaw'].tolist()
+    yaw, psi = [0.0], 0.0
+    for i in range(1, len(ct)):
+        psi += cyaw[i - 1] * (ct[i] - ct[i - 1])
+        yaw.append(psi)
+    times, theta = [], []
+    for t, x1, x2 in zip(seen['t'].tolist(), seen['x1'].tolist(), seen['x2'].tolist()):
+        if t < t0 or t > ct[-1]:
+            continue
+        psi_t = yaw[max(0, bisect.bisect_right(ct, t) - 1)]
+        times.append(t - t0)
+        theta.append(psi_t - pixel_bearing((x1 + x2) / 2.0))
+    if len(times) < 2:
+        raise ValueError(f"{directory}: no overlapping perception and control records")
+    base = theta[0]
+
+    def bearing(t):
+        i = min(max(bisect.bisect_right(times, t), 1), len(times) - 1)
+        a, b = times[i - 1], times[i]
+        k = min(max((t - a) / (b - a), 0.0), 1.0) if b > a else 0.0
+        return theta[i - 1] + k * (theta[i] - theta[i - 1]) - base
+    return bearing, times[-1]
+
+
+def simulate(target, seconds, mode, args, step=False, seed=0):
+    """mode: 'hold' (last setpoint as is), 'predict' (bearing prediction only) or 'shaped'
+    (prediction + slew limits, what file_control.py runs)."""
+    rng = random.Random(seed)
+    dt = 1.0 / args.rate
+    accel = tuple(float(a) for a in args.accel.split(',')) if mode == 'shaped' else (1e9,) * 3
+    shaper = SetpointShaper(YAW_PER_BEARING, args.max_predict, accel)
+    bf = BearingFilter()
+    psi = omega = 0.0
+    setpoint = (0.0, 0.0, 0.0, 0.0, float('nan'), 0.0)
+    pending = deque()
+    next_frame = 0.0
+    errors, steps, log = [], [], []
+    last_out = 0.0
+    for i in range(int(seconds * args.rate)):
+        t = i * dt
+        while next_frame <= t:
+            b = -(target(next_frame) - psi) + rng.gauss(0.0, args.noise)
+            b = max(-HALF_FOV, min(HALF_FOV, b))  # at the image edge the box clips
+            x_center = FRAME_W / 2.0 + FOCAL_PX * math.tan(b)
+            _, vyaw, _ = fsm_command(x_center, TARGET_DISTANCE)
+            bearing, rate = bf.update(next_frame, pixel_bearing(x_center))
+            t_pub = next_frame + args.latency + rng.uniform(0.0, args.jitter)
+            pending.append((t_pub, (0.0, 0.0, vyaw, next_frame, bearing, rate)))
+            next_frame += 1.0 / args.fps
+        while pending and pending[0][0] <= t:
+            setpoint = pending.popleft()[1]
+        if mode != 'hold':
+            out = shaper.step(shaper.target(*setpoint, t), t)[2]
+        else:
+            out = setpoint[2]
+        steps.append(abs(out - last_out))
+        last_out = out
+        omega += (out - omega) * min(1.0, dt / args.tau)
+        psi += omega * dt
+        log.append((t, psi))
+        if t >= 0.5:
+            errors.append(target(t) - psi)
+    result = {
+        'rms': math.sqrt(sum(e * e for e in errors) / len(errors)),
+        'max': max(abs(e) for e in errors),
+        'jump_rms': math.sqrt(sum(s * s for s in steps) / len(steps)),
+        'jump_max': max(steps),
+        'overshoot': None, 'rise': None,
+    }
+    if step:
+        after = [(t, p) for t, p in log if t >= STEP_AT]
+        result['overshoot'] = max(0.0, max(p for _, p in after) - STEP_SIZE) / STEP_SIZE
+        # the FSM's turn deadband leaves up to ~0.07 rad, so rise is measured to 80%
+        rise = next((t for t, p in after if p >= 0.8 * STEP_SIZE), None)
+        result['rise'] = rise - STEP_AT if rise is not None else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.06, help='glass-to-setpoint latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='extra uniform latency (s)')
+    parser.add_argument('--noise', type=float, default=0.003, help='bearing measurement noise (rad)')
+    parser.add_argument('--fps', type=float, default=30.0, help='detection rate (Hz)')
+    parser.add_argument('--rate', type=float, default=100.0, help='control loop rate (Hz)')
+    parser.add_argument('--tau', type=float, default=0.05, help='robot yaw-rate response time (s)')
+    parser.add_argument('--seconds', type=float, default=12.0)
+    parser.add_argument('--max-predict', type=float, default=0.15)
+    parser.add_argument('--accel', default='1.5,1.5,6.0')
+    parser.add_argument('--replay', default=None, help='telemetry directory of a robot run')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("SETPOINT SHAPING - CLOSED-LOOP YAW SIMULATION")
+    print("="*60)
+    print(f"latency {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f}), detection {args.fps:.0f} Hz, "
+          f"control {args.rate:.0f} Hz, yaw lag {args.tau * 1000:.0f} ms\n")
+
+    cases = [('step', scenario('step'), args.seconds), ('sine', scenario('sine'), args.seconds),
+             ('ramp', scenario('ramp'), args.seconds)]
+    if args.replay:
+        bearing, duration = replay_trajectory(args.replay)
+        cases.append(('replay', bearing, duration))
+
+    print(f"{'scenario':>8s} {'mode':>7s} {'rms err':>8s} {'max err':>8s} {'overshoot':>9s} "
+          f"{'rise':>6s} {'dvyaw rms':>9s} {'dvyaw max':>9s}")
+    for name, target, seconds in cases:
+        for mode in ('hold', 'predict', 'shaped'):
+            r = simulate(target, seconds, mode, args, step=name == 'step')
+            overshoot = f"{r['overshoot']:9.0%}" if r['overshoot'] is not None else f"{'':>9s}"
+            rise = f"{r['rise']:6.2f}" if r['rise'] is not None else f"{'':>6s}"
+            print(f"{name:>8s} {mode:>7s} {r['rms']:8.4f} {r['max']:8.4f} "
+                  f"{overshoot} {rise} {r['jump_rms']:9.4f} {r['jump_max']:9.4f}")
+    print("\nerrors in rad; rise = s to 80% of the step; dvyaw = change of the sent vyaw per cycle")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: synchronous SportClient calls vs SportDispatcher, using FakeSportClient
+Runs a 100 Hz control loop for a few seconds with a sit/stand transition in the
+middle and reports how long the loop stalls and how stale the sent setpoints are.
+Usage: python3 bench_sport_dispatch.py [--move-delay 0.004] [--pose-delay 0.5] [--seconds 6]
+"""
+import argparse
+import time
+
+from control_loop import DeadlineScheduler, Histogram, LoopStats
+from sport_dispatch import FakeSportClient, SportDispatcher, LATENCY_EDGES_MS
+
+
+def pose_schedule(seconds):
+    """(time offset, pose) pairs: sit at 1/3, stand at 2/3 of the run."""
+    return [(seconds / 3.0, 'sit'), (2.0 * seconds / 3.0, 'stand')]
+
+
+def run_sync(client, args):
+    """The pre-dispatcher file_control.py loop: Move and pose calls inline, 2 s settle sleep."""
+    period = 1.0 / args.rate
+    stats = LoopStats(period)
+    move_latency = Histogram(LATENCY_EDGES_MS)
+    schedule = pose_schedule(args.seconds)
+    start = time.monotonic()
+    scheduler = DeadlineScheduler(period)
+    while time.monotonic() - start < args.seconds:
+        now = time.monotonic() - start
+        if schedule and now >= schedule[0][0]:
+            pose = schedule.pop(0)[1]
+            (client.StandDown if pose == 'sit' else client.StandUp)()
+            time.sleep(args.settle)
+        t0 = time.perf_counter()
+        client.Move(0.3, 0.0, 0.1)
+        move_latency.add((time.perf_counter() - t0) * 1000.0)
+        scheduler.wait()
+        stats.tick(time.monotonic())
+    return stats, move_latency
+
+
+def run_dispatched(client, args):
+    period = 1.0 / args.rate
+    stats = LoopStats(period)
+    dispatcher = SportDispatcher(client, settle_time=args.settle).start()
+    schedule = pose_schedule(args.seconds)
+    ops = []
+    start = time.monotonic()
+    scheduler = DeadlineScheduler(period)
+    while time.monotonic() - start < args.seconds:
+        now = time.monotonic() - start
+        if schedule and now >= schedule[0][0]:
+            ops.append(dispatcher.request_pose(schedule.pop(0)[1]))
+        dispatcher.set_velocity(0.3, 0.0, 0.1)
+        scheduler.wait()
+        stats.tick(time.monotonic())
+    for op in ops:
+        op.wait(args.settle + 2 * args.pose_delay + 1.0)
+    dispatcher.stop()
+    return stats, dispatcher, ops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=float, default=100.0)
+    parser.add_argument('--seconds', type=float, default=6.0)
+    parser.add_argument('--move-delay', type=float, default=0.004, help='fake Move RPC time (s)')
+    parser.add_argument('--pose-delay', type=float, default=0.5, help='fake StandUp/Down RPC time (s)')
+    parser.add_argument('--settle', type=float, default=2.0, help='post-pose settle time (s)')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("SPORT CLIENT DISPATCH BENCHMARK")
+    print("="*60)
+    print(f"rate={args.rate:.0f} Hz, Move={args.move_delay * 1000:.1f} ms, "
+          f"pose={args.pose_delay * 1000:.0f} ms, settle={args.settle:.1f} s\n")
+
+    print("1. Synchronous (old file_control.py)")
+    stats, move_latency = run_sync(FakeSportClient(args.move_delay, args.pose_delay), args)
+    print(stats.period.format("Loop period (ms)"))
+    print(move_latency.format("Move latency (ms)"))
+    print(f"Worst loop stall: {stats.period.max:.1f} ms\n")
+
+    print("2. SportDispatcher")
+    stats, dispatcher, ops = run_dispatched(FakeSportClient(args.move_delay, args.pose_delay), args)
+    print(stats.period.format("Loop period (ms)"))
+    print(dispatcher.format_stats())
+    for op in ops:
+        total = (op.finished - op.requested) if op.finished else float('nan')
+        print(f"Pose {op.pose:5s}: {op.state}, {total:.2f}s incl. settle (loop kept running)")
+    print(f"Worst loop stall: {stats.period.max:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
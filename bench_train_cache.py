@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Epoch time of YOLO training with and without the pre-decoded image cache (train_cache.py)
+Loader pass: iterates the augmented training dataset (mosaic, HSV, flips, letterbox) once
+per --passes with ultralytics' YOLODataset (JPEG decode + resize every time) and with
+CachedYOLODataset, reporting images/s and seconds per epoch; this isolates the data
+path from the model. --train-epochs N also runs N real CPU training epochs with each
+trainer and reports the epoch times (the first cached run includes building the cache,
+reported separately).
+Usage: python3 bench_train_cache.py --data dataset/data.yaml [--imgsz 640] [--passes 2]
+                                    [--train-epochs 0] [--model yolov8n.pt]
+"""
+import argparse
+import os
+import time
+
+from ultralytics.cfg import get_cfg
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.data.utils import check_det_dataset
+
+from export_models import split_images
+from train_cache import TRAIN_CACHE_DIR, CachedDetectionTrainer, CachedYOLODataset, build_cache
+
+
+def loader_pass(dataset_cls, img_dir, data, imgsz, passes):
+    """Seconds per pass over every training sample, augmentation included."""
+    hyp = get_cfg()
+    dataset = dataset_cls(img_path=img_dir, imgsz=imgsz, augment=True, hyp=hyp, data=data,
+                          prefix=f"{dataset_cls.__name__}: ")
+    times = []
+    for _ in range(passes):
+        t0 = time.perf_counter()
+        for i in range(len(dataset)):
+            dataset[i]
+        times.append(time.perf_counter() - t0)
+    return len(dataset), times
+
+
+def train_epochs(trainer, args):
+    """Wall time of each training epoch."""
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    marks = []
+    model.add_callback('on_train_epoch_start', lambda t: marks.append(['start', time.perf_counter()]))
+    model.add_callback('on_train_epoch_end', lambda t: marks.append(['end', time.perf_counter()]))
+    model.train(data=args.data, epochs=args.train_epochs, imgsz=args.imgsz, device='cpu',
+                workers=args.workers, plots=False, val=False, trainer=trainer,
+                project=os.path.join(args.cache_dir, 'bench_runs'), exist_ok=True)
+    starts = [t for k, t in marks if k == 'start']
+    ends = [t for k, t in marks if k == 'end']
+    return [e - s for s, e in zip(starts, ends)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--passes', type=int, default=2, help='loader passes per dataset')
+    parser.add_argument('--train-epochs', type=int, default=0, help='real training epochs per trainer')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cache-dir', default=TRAIN_CACHE_DIR)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("TRAINING CACHE BENCHMARK")
+    print("="*60)
+    CachedYOLODataset.cache_root = args.cache_dir
+    data = check_det_dataset(args.data)
+    paths = split_images(args.data, 'train')
+    img_dir = os.path.dirname(paths[0])
+    t0 = time.perf_counter()
+    build_cache(paths, args.imgsz, args.cache_dir, args.workers)
+    print(f"Cache ready in {time.perf_counter() - t0:.1f} s (one-off per dataset version)\n")
+
+    print(f"{'loader':>20s} {'images':>7s} {'s/epoch':>8s} {'images/s':>9s}")
+    results = {}
+    for name, cls in (('decode every epoch', YOLODataset), ('memmap cache', CachedYOLODataset)):
+        n, times = loader_pass(cls, img_dir, data, args.imgsz, args.passes)
+        best = min(times)
+        results[name] = best
+        print(f"{name:>20s} {n:7d} {best:8.2f} {n / best:9.1f}")
+    base, cached = results['decode every epoch'], results['memmap cache']
+    print(f"\n✓ Data path {base / cached:.1f}x faster with the cache")
+
+    if args.train_epochs:
+        print(f"\nTraining {args.train_epochs} epoch(s) of {args.model} on CPU with each trainer...")
+        plain = train_epochs(None, args)
+        fast = train_epochs(CachedDetectionTrainer, args)
+        print(f"{'trainer':>20s} {'epoch times (s)':>30s}")
+        print(f"{'DetectionTrainer':>20s} {' '.join(f'{t:.1f}' for t in plain):>30s}")
+        print(f"{'CachedDetection':>20s} {' '.join(f'{t:.1f}' for t in fast):>30s}")
+        print(f"\n✓ Mean epoch {sum(plain) / len(plain):.1f} s -> {sum(fast) / len(fast):.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Box propagation between detector runs
+BoxKalman   - constant-velocity Kalman filter on (cx, cy, w, h)
+FlowRefiner - sparse Lucas-Kanade flow of corner features inside the box
+BoxTracker  - fuses both: detections correct the filter, flow corrects it on frames
+              where the detector was skipped or missed, and a confidence value tells
+              the FSM whether the target is really lost or just not re-detected yet
+"""
+import cv2
+import numpy as np
+
+
+class BoxKalman:
+    """State (cx, cy, w, h, vx, vy); velocities in px/s."""
+
+    def __init__(self, box, accel_std=800.0, size_std=40.0):
+        x1, y1, x2, y2 = box
+        self.x = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0.0, 0.0])
+        self.P = np.diag([4.0, 4.0, 16.0, 16.0, 400.0 ** 2, 400.0 ** 2])
+        self.accel_std = accel_std
+        self.size_std = size_std
+        self.H = np.zeros((4, 6))
+        self.H[[0, 1, 2, 3], [0, 1, 2, 3]] = 1.0
+
+    def predict(self, dt):
+        if dt <= 0:
+            return
+        F = np.eye(6)
+        F[0, 4] = F[1, 5] = dt
+        q = self.accel_std ** 2
+        Q = np.zeros((6, 6))
+        Q[[0, 1], [0, 1]] = q * dt ** 4 / 4
+        Q[[0, 1], [4, 5]] = Q[[4, 5], [0, 1]] = q * dt ** 3 / 2
+        Q[[4, 5], [4, 5]] = q * dt ** 2
+        Q[[2, 3], [2, 3]] = (self.size_std * dt) ** 2
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, z, meas_std):
+        """z = (cx, cy, w, h); meas_std = per-component standard deviations (px)."""
+        R = np.diag(np.square(meas_std))
+        y = np.asarray(z, float) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(6) - K @ self.H) @ self.P
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+
+class FlowRefiner:
+    """Median LK displacement of features inside the box, with a forward-backward check."""
+
+    def __init__(self, max_corners=30, fb_threshold=1.0, min_points=4):
+        self.max_corners = max_corners
+        self.fb_threshold = fb_threshold
+        self.min_points = min_points
+        self.lk = dict(winSize=(15, 15), maxLevel=2,
+                       criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def shift(self, prev_gray, gray, box):
+        """(dx, dy, quality 0..1) of the box content between frames, or None."""
+        h, w = gray.shape[:2]
+        x1, y1, x2, y2 = np.clip(np.round(box), 0, [w - 1, h - 1, w - 1, h - 1]).astype(int)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        mask = np.zeros_like(prev_gray)
+        mask[y1:y2, x1:x2] = 255
+        p0 = cv2.goodFeaturesToTrack(prev_gray, self.max_corners, 0.01, 3, mask=mask)
+        if p0 is None or len(p0) < self.min_points:
+            return None
+        p1, st, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **self.lk)
+        p0r, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **self.lk)
+        fb = np.linalg.norm((p0 - p0r).reshape(-1, 2), axis=1)
+        good = (st.ravel() == 1) & (st_back.ravel() == 1) & (fb < self.fb_threshold)
+        if good.sum() < self.min_points:
+            return None
+        d = (p1 - p0).reshape(-1, 2)[good]
+        dx, dy = np.median(d, axis=0)
+        return float(dx), float(dy), float(good.sum()) / len(p0)
+
+
+class TrackEstimate:
+    def __init__(self, detection, confidence, source):
+        self.detection = detection    # (xyxy int array, conf, cls_id), same as the detector
+        self.confidence = confidence  # 1.0 right after a detection, decays while coasting
+        self.source = source          # 'detector', 'flow' or 'predict'
+
+
+class BoxTracker:
+    """step() once per camera frame. detected=False means the detector did not run on
+    this frame (skipped); detected=True with detection=None is a real detector miss."""
+
+    DET_STD = (2.0, 2.0, 4.0, 4.0)
+    FLOW_STD = (4.0, 4.0, 1e3, 1e3)   # flow says nothing about box size
+
+    def __init__(self, min_confidence=0.3, flow_decay=0.97, predict_decay=0.85, miss_decay=0.6,
+                 use_flow=True):
+        self.min_confidence = min_confidence
+        self.flow_decay = flow_decay
+        self.predict_decay = predict_decay
+        self.miss_decay = miss_decay
+        self.flow = FlowRefiner() if use_flow else None
+        self.kf = None
+        self.confidence = 0.0
+        self.cls_id = None
+        self.det_conf = 0.0
+        self._prev_gray = None
+        self._prev_t = None
+        self.counts = {'detector': 0, 'flow': 0, 'predict': 0, 'lost': 0}
+
+    def reset(self):
+        self.kf = None
+        self.confidence = 0.0
+
+    def step(self, image, t, detection=None, detected=True):
+        """Returns a TrackEstimate, or None when there is no confident target."""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        dt = 0.0 if self._prev_t is None else t - self._prev_t
+        prev_gray, self._prev_gray, self._prev_t = self._prev_gray, gray, t
+
+        if detection is not None:
+            xyxy, conf, cls_id = detection
+            if self.kf is None or cls_id != self.cls_id:
+                self.kf = BoxKalman(xyxy)
+            else:
+                self.kf.predict(dt)
+                x1, y1, x2, y2 = xyxy
+                self.kf.update(((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1), self.DET_STD)
+            self.cls_id, self.det_conf, self.confidence = cls_id, conf, 1.0
+            self.counts['detector'] += 1
+            return TrackEstimate(detection, 1.0, 'detector')
+
+        if self.kf is None:
+            return None
+        prior = self.kf.box()
+        self.kf.predict(dt)
+        source = 'predict'
+        measured = self.flow.shift(prev_gray, gray, prior) if (self.flow and prev_gray is not None) else None
+        if measured is not None:
+            dx, dy, quality = measured
+            cx, cy, w, h = (prior[0] + prior[2]) / 2, (prior[1] + prior[3]) / 2, prior[2] - prior[0], prior[3] - prior[1]
+            self.kf.update((cx + dx, cy + dy, w, h), self.FLOW_STD)
+            self.confidence *= self.flow_decay * (0.5 + 0.5 * quality)
+            source = 'flow'
+        else:
+            self.confidence *= self.predict_decay
+        if detected:
+            self.confidence *= self.miss_decay  # the detector looked and did not find it
+
+        if self.confidence < self.min_confidence:
+            self.counts['lost'] += 1
+            self.reset()
+            return None
+        self.counts[source] += 1
+        xyxy = np.round(self.kf.box()).astype(int)
+        return TrackEstimate((xyxy, self.det_conf * self.confidence, self.cls_id), self.confidence, source)
+
+    def format_stats(self):
+        c = self.counts
+        return (f"tracker: detector={c['detector']} flow={c['flow']} "
+                f"predict={c['predict']} lost={c['lost']}")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Shared-memory command channel between the trackers and file_control.py
+Replaces the velocities.txt text protocol with a memory-mapped record
+(vx, vy, vyaw, pose, sequence number, producer timestamp) guarded by a seqlock.
+Trackers also pass the id and glass time of the frame a command was computed from, so
+file_control.py can measure glass-to-motion latency (latency_trace.py), and the target's
+bearing (rad, + = right of the image center) and bearing rate at that glass time, so it
+can predict the bearing forward to "now" (control_loop.SetpointShaper). NaN = no target.
+
+Writer (trackers, pose_control.py):
+    cmd = CommandWriter()
+    cmd.send(vx, 0.0, vyaw)
+    cmd.send(vx, 0.0, vyaw, frame_id=pkt.frame_no, t_frame=trace.t_glass,
+             bearing=b, bearing_rate=b_rate)
+    cmd.send_pose('sit')
+
+Reader (file_control.py):
+    reader = CommandReader()
+    c = reader.poll()          # newest command, or None if nothing new
+    reader.enable_wakeup()     # optional: writers poke <path>.fifo on every publish
+    reader.wait(0.01)          # True as soon as a new command is published
+"""
+import errno
+import mmap
+import os
+import select
+import stat
+import struct
+import time
+from collections import namedtuple
+
+CHANNEL_PATH = '/dev/shm/bolt_cmd'
+
+POSE_NONE = 0
+POSE_STAND = 1
+POSE_SIT = 2
+POSE_POINT = 3
+POSE_IDS = {'stand': POSE_STAND, 'sit': POSE_SIT, 'point': POSE_POINT}
+POSE_NAMES = {v: k for k, v in POSE_IDS.items()}
+NO_BEARING = float('nan')
+
+# seqlock counter | command seq | producer stamp (CLOCK_MONOTONIC) | vx | vy | vyaw | pose
+# | source frame id (0 = none) | source frame glass time (CLOCK_MONOTONIC)
+# | target bearing at the glass time (rad, NaN = none) | bearing rate (rad/s)
+_VERSION = struct.Struct('<Q')
+_PAYLOAD = struct.Struct('<Qddddi4xqddd')
+_PAYLOAD_OFFSET = _VERSION.size
+RECORD_SIZE = _VERSION.size + _PAYLOAD.size
+
+Command = namedtuple('Command', 'seq stamp vx vy vyaw pose frame_id t_frame bearing bearing_rate')
+
+
+def _open_map(path):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        if os.fstat(fd).st_size < RECORD_SIZE:
+            os.ftruncate(fd, RECORD_SIZE)
+        return mmap.mmap(fd, RECORD_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+    finally:
+        os.close(fd)
+
+
+class CommandWriter:
+    """Producer side. One active writer at a time (a tracker or pose_control.py)."""
+
+    def __init__(self, path=CHANNEL_PATH):
+        self.path = path
+        self._map = _open_map(path)
+        self._fifo = path + '.fifo'
+        self._notify_fd = None
+
+    def _notify(self):
+        if self._notify_fd is None:
+            try:
+                self._notify_fd = os.open(self._fifo, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError:
+                return  # no reader waiting for wakeups
+        try:
+            os.write(self._notify_fd, b'\x01')
+        except BlockingIOError:
+            pass  # reader has not drained yet; it is already due to wake
+        except OSError:
+            os.close(self._notify_fd)
+            self._notify_fd = None
+
+    def _publish(self, vx, vy, vyaw, pose, frame_id=0, t_frame=0.0, bearing=NO_BEARING,
+                 bearing_rate=0.0):
+        m = self._map
+        version = _VERSION.unpack_from(m, 0)[0]
+        if version & 1:
+            version += 1  # a previous writer died mid-update
+        seq = _PAYLOAD.unpack_from(m, _PAYLOAD_OFFSET)[0] + 1
+        _VERSION.pack_into(m, 0, version + 1)
+        _PAYLOAD.pack_into(m, _PAYLOAD_OFFSET, seq, time.monotonic(),
+                           float(vx), float(vy), float(vyaw), pose, int(frame_id), float(t_frame),
+                           float(bearing), float(bearing_rate))
+        _VERSION.pack_into(m, 0, version + 2)
+        self._notify()
+        return seq
+
+    def send(self, vx, vy, vyaw, frame_id=0, t_frame=0.0, bearing=NO_BEARING, bearing_rate=0.0):
+        return self._publish(vx, vy, vyaw, POSE_NONE, frame_id, t_frame, bearing, bearing_rate)
+
+    def send_pose(self, pose):
+        if pose not in POSE_IDS:
+            raise ValueError(f"Unknown pose: {pose}")
+        return self._publish(0.0, 0.0, 0.0, POSE_IDS[pose])
+
+    def close(self):
+        if self._notify_fd is not None:
+            os.close(self._notify_fd)
+        self._map.close()
+
+
+class CommandReader:
+    """Consumer side (file_control.py). Never blocks the writer."""
+
+    def __init__(self, path=CHANNEL_PATH, max_retries=100):
+        self.path = path
+        self.max_retries = max_retries
+        self.last_seq = 0
+        self.torn_reads = 0
+        self._map = _open_map(path)
+        self._wake_fd = None
+
+    def enable_wakeup(self):
+        """Create <path>.fifo so writers can wake wait() instead of it timing out."""
+        fifo = self.path + '.fifo'
+        try:
+            os.mkfifo(fifo, 0o666)
+        except FileExistsError:
+            if not stat.S_ISFIFO(os.stat(fifo).st_mode):
+                raise
+        # O_RDWR keeps a writer end open so select() never sees EOF between trackers
+        self._wake_fd = os.open(fifo, os.O_RDWR | os.O_NONBLOCK)
+
+    def wait(self, timeout):
+        """Sleep up to `timeout` seconds; return True early if a writer published."""
+        if self._wake_fd is None:
+            if timeout > 0:
+                time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self._wake_fd], [], [], max(timeout, 0.0))
+        if not ready:
+            return False
+        try:
+            while os.read(self._wake_fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+        return True
+
+    def read(self):
+        """Return a consistent snapshot of the record, or None before the first write."""
+        m = self._map
+        for _ in range(self.max_retries):
+            v1 = _VERSION.unpack_from(m, 0)[0]
+            if v1 & 1:
+                self.torn_reads += 1
+                continue
+            payload = _PAYLOAD.unpack_from(m, _PAYLOAD_OFFSET)
+            if _VERSION.unpack_from(m, 0)[0] == v1:
+                if payload[0] == 0:
+                    return None
+                return Command._make(payload)
+            self.torn_reads += 1
+        return None
+
+    def poll(self):
+        """Return the newest command if its sequence number changed since the last poll."""
+        c = self.read()
+        if c is None or c.seq == self.last_seq:
+            return None
+        self.last_seq = c.seq
+        return c
+
+    def close(self):
+        if self._wake_fd is not None:
+            os.close(self._wake_fd)
+        self._map.close()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Control-loop helpers for file_control.py
+DeadlineScheduler - absolute-deadline ticks (no drift from work time)
+StalenessWatchdog - ramps velocity to zero once the producer stops publishing
+SetpointShaper    - latency-compensated, slew-limited commands between tracker setpoints
+Histogram / LoopStats - period and jitter distribution of the loop
+"""
+import math
+import time
+
+
+class DeadlineScheduler:
+    """Ticks at t0 + k*period. Overruns skip missed slots instead of bursting."""
+
+    def __init__(self, period, clock=time.monotonic, sleep=time.sleep):
+        self.period = period
+        self.clock = clock
+        self._sleep = sleep
+        self.deadline = clock() + period
+        self.overruns = 0
+
+    def remaining(self):
+        return self.deadline - self.clock()
+
+    def wait(self, wake=None):
+        """Block until the next deadline. If `wake(timeout)` is given and returns True
+        before the deadline, return False early (the tick grid is unchanged).
+        Returns True when the deadline was reached."""
+        remaining = self.remaining()
+        if remaining > 0:
+            if wake is not None and wake(remaining):
+                return False
+            remaining = self.remaining()
+            if remaining > 0:
+                self._sleep(remaining)
+        now = self.clock()
+        self.deadline += self.period
+        if now >= self.deadline:
+            missed = int((now - self.deadline) // self.period) + 1
+            self.overruns += missed
+            self.deadline += missed * self.period
+        return True
+
+
+class StalenessWatchdog:
+    """Scales the last command to zero over `ramp` seconds once it is older than `max_age`."""
+
+    def __init__(self, max_age=1.0, ramp=0.5):
+        self.max_age = max_age
+        self.ramp = ramp
+        self.tripped = False
+
+    def scale(self, age):
+        if age <= self.max_age:
+            self.tripped = False
+            return 1.0
+        self.tripped = True
+        if self.ramp <= 0:
+            return 0.0
+        return max(0.0, 1.0 - (age - self.max_age) / self.ramp)
+
+    def apply(self, vx, vy, vyaw, age):
+        k = self.scale(age)
+        return vx * k, vy * k, vyaw * k
+
+
+class SetpointShaper:
+    """Turns tracker setpoints (detection rate, < 30 Hz) into a command for every loop cycle.
+    If the setpoint carries a bearing, vyaw is corrected for the bearing predicted from the
+    frame's glass time to now (bearing_rate * age, age capped at max_predict) through the
+    FSM's turn slope `yaw_gain`; then each axis is slew-limited to `accel` (units/s^2)."""
+
+    def __init__(self, yaw_gain, max_predict=0.15, accel=(1.5, 1.5, 6.0), max_vyaw=1.0):
+        self.yaw_gain = yaw_gain
+        self.max_predict = max_predict
+        self.accel = accel
+        self.max_vyaw = max_vyaw
+        self.out = (0.0, 0.0, 0.0)
+        self.predicted = False  # last target() used a bearing prediction
+        self._t = None
+
+    def target(self, vx, vy, vyaw, t_frame, bearing, bearing_rate, now):
+        """The setpoint as it should be at `now`."""
+        self.predicted = bool(t_frame) and not math.isnan(bearing)
+        if self.predicted:
+            age = min(max(now - t_frame, 0.0), self.max_predict)
+            vyaw += self.yaw_gain * bearing_rate * age
+            vyaw = max(-self.max_vyaw, min(self.max_vyaw, vyaw))
+        return vx, vy, vyaw
+
+    def step(self, target, now):
+        """Move the output toward `target` by at most accel * dt per axis."""
+        dt = 0.0 if self._t is None else min(max(now - self._t, 0.0), 0.1)
+        self._t = now
+        self.out = tuple(o + max(-a * dt, min(a * dt, t - o))
+                         for o, t, a in zip(self.out, target, self.accel))
+        return self.out
+
+    def reset(self, now=None):
+        """Output jumps to zero (after a pose change the robot is stationary)."""
+        self.out = (0.0, 0.0, 0.0)
+        self._t = now
+
+
+class Histogram:
+    """Fixed-edge histogram in milliseconds."""
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, value):
+        i = 0
+        while i < len(self.edges) and value >= self.edges[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def format(self, title, width=40):
+        lines = [f"{title}: n={self.n} mean={self.mean():.3f} min={self.min:.3f} max={self.max:.3f}"]
+        if not self.n:
+            return lines[0]
+        peak = max(self.counts)
+        labels = [f"< {self.edges[0]:g}"]
+        labels += [f"{lo:g}..{hi:g}" for lo, hi in zip(self.edges, self.edges[1:])]
+        labels.append(f">= {self.edges[-1]:g}")
+        for label, count in zip(labels, self.counts):
+            bar = '#' * int(round(width * count / peak)) if peak else ''
+            lines.append(f"  {label:>12s} | {count:7d} {bar}")
+        return '\n'.join(lines)
+
+
+class LoopStats:
+    """Period and jitter (period - nominal) histograms for a periodic loop, in ms."""
+
+    def __init__(self, period):
+        self.nominal = period * 1000.0
+        p = self.nominal
+        self.period = Histogram([p * f for f in (0.5, 0.8, 0.9, 0.95, 1.05, 1.1, 1.2, 1.5, 2.0)])
+        self.jitter = Histogram([-2.0, -1.0, -0.5, -0.2, 0.2, 0.5, 1.0, 2.0, 5.0])
+        self._last = None
+
+    def tick(self, now):
+        if self._last is not None:
+            dt = (now - self._last) * 1000.0
+            self.period.add(dt)
+            self.jitter.add(dt - self.nominal)
+        self._last = now
+
+    def format(self):
+        return (self.period.format("Loop period (ms)") + "\n" +
+                self.jitter.format("Loop jitter (ms)"))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Crop-and-track detection for the trackers
+Full-frame inference while searching (and every `full_every` frames as a re-check);
+once a ball is locked, inference runs on a small crop around the predicted box at a
+reduced imgsz and the box is mapped back to frame coordinates. A miss on the crop
+falls back to a full-frame pass on the same frame.
+
+detect_fn(image, classes, imgsz) -> (xyxy int array, conf, cls_id) or None
+(see tracker_core.yolo_detect); the result format is unchanged for the FSM.
+Fixed-shape backends (onnx, daemon, offload) ignore imgsz and would letterbox the crop
+back up to the export size; give them `crop_fn`, a detector exported at crop_imgsz.
+"""
+import numpy as np
+
+from tracker_core import FRAME_W, FRAME_H
+
+
+class CropDetector:
+    def __init__(self, detect_fn, full_every=15, crop_imgsz=320, crop_scale=3.0,
+                 min_crop=160, full_imgsz=None, crop_fn=None):
+        self.detect_fn = detect_fn
+        self.crop_fn = crop_fn or detect_fn
+        self.full_every = full_every
+        self.crop_imgsz = crop_imgsz
+        self.crop_scale = crop_scale
+        self.min_crop = min_crop
+        self.full_imgsz = full_imgsz
+        self.last_box = None          # float xyxy in frame coordinates
+        self.velocity = np.zeros(2)   # box center motion, px/frame
+        self.since_full = 0
+        self.last_mode = 'full'
+        self.counts = {'full': 0, 'crop': 0, 'crop_miss': 0}
+
+    def reset(self):
+        """Forget the lock (e.g. when the target class changes)."""
+        self.last_box = None
+        self.velocity[:] = 0
+
+    def crop_window(self):
+        """(x0, y0, x1, y1) around the predicted box, clipped to the frame."""
+        x1, y1, x2, y2 = self.last_box
+        cx, cy = (x1 + x2) / 2 + self.velocity[0], (y1 + y2) / 2 + self.velocity[1]
+        side = min(max(self.crop_scale * max(x2 - x1, y2 - y1), self.min_crop), FRAME_H)
+        x0 = int(round(min(max(cx - side / 2, 0), FRAME_W - side)))
+        y0 = int(round(min(max(cy - side / 2, 0), FRAME_H - side)))
+        return x0, y0, x0 + int(side), y0 + int(side)
+
+    def _update(self, det):
+        box = det[0].astype(float)
+        if self.last_box is not None:
+            prev = ((self.last_box[0] + self.last_box[2]) / 2, (self.last_box[1] + self.last_box[3]) / 2)
+            cur = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+            self.velocity = 0.5 * self.velocity + 0.5 * np.subtract(cur, prev)
+        self.last_box = box
+
+    def _full(self, image, classes):
+        self.since_full = 0
+        self.last_mode = 'full'
+        self.counts['full'] += 1
+        return self.detect_fn(image, classes, self.full_imgsz)
+
+    def detect(self, image, classes):
+        det = None
+        if self.last_box is not None and self.since_full < self.full_every:
+            x0, y0, x1, y1 = self.crop_window()
+            self.counts['crop'] += 1
+            self.last_mode = 'crop'
+            det = self.crop_fn(image[y0:y1, x0:x1], classes, self.crop_imgsz)
+            if det is not None:
+                xyxy, conf, cls_id = det
+                det = (xyxy + np.array([x0, y0, x0, y0], dtype=xyxy.dtype), conf, cls_id)
+                self.since_full += 1
+            else:
+                self.counts['crop_miss'] += 1
+        if det is None:
+            det = self._full(image, classes)
+        if det is not None:
+            self._update(det)
+        else:
+            self.reset()
+        return det
+
+    def format_stats(self):
+        c = self.counts
+        return (f"detector: full={c['full']} crop={c['crop']} "
+                f"crop misses={c['crop_miss']}")
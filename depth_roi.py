@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+ROI-only depth-to-color mapping, instead of rs.align on the full 640x480 frame
+Only the raw depth pixels that can land in the 7x7 color patch around the box center
+are projected into the color image (vectorized NumPy), using the same per-pixel
+footprint and nearest-depth rule as rs.align. Distortion is ignored: the D4xx depth
+stream is undistorted and the color stream reports (near) zero coefficients.
+"""
+import numpy as np
+
+from tracker_core import FRAME_W, FRAME_H
+
+Z_MIN, Z_MAX = 0.1, 3.0  # same validity range as tracker_core.sample_depth
+
+
+class Intrinsics:
+    def __init__(self, width, height, fx, fy, ppx, ppy):
+        self.width, self.height = width, height
+        self.fx, self.fy, self.ppx, self.ppy = fx, fy, ppx, ppy
+
+    @classmethod
+    def from_rs(cls, i):
+        return cls(i.width, i.height, i.fx, i.fy, i.ppx, i.ppy)
+
+    def to_dict(self):
+        return dict(width=self.width, height=self.height, fx=self.fx, fy=self.fy,
+                    ppx=self.ppx, ppy=self.ppy)
+
+
+class StreamGeometry:
+    """Depth/color intrinsics and the depth->color rigid transform (R, t in meters)."""
+
+    def __init__(self, depth, color, rotation, translation):
+        self.depth = depth
+        self.color = color
+        self.R = np.asarray(rotation, np.float64).reshape(3, 3)
+        self.t = np.asarray(translation, np.float64).reshape(3)
+
+    @classmethod
+    def from_profile(cls, profile):
+        import pyrealsense2 as rs
+        d = profile.get_stream(rs.stream.depth).as_video_stream_profile()
+        c = profile.get_stream(rs.stream.color).as_video_stream_profile()
+        ext = d.get_extrinsics_to(c)
+        # librealsense stores the rotation column-major
+        R = np.asarray(ext.rotation, np.float64).reshape(3, 3).T
+        return cls(Intrinsics.from_rs(d.get_intrinsics()), Intrinsics.from_rs(c.get_intrinsics()),
+                   R, ext.translation)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(Intrinsics(**d['depth']), Intrinsics(**d['color']), d['rotation'], d['translation'])
+
+    def to_dict(self):
+        return dict(depth=self.depth.to_dict(), color=self.color.to_dict(),
+                    rotation=self.R.tolist(), translation=self.t.tolist())
+
+
+class RoiDepth:
+    """Samples the median distance of a color-image patch straight from the raw depth image."""
+
+    def __init__(self, geometry, half=3, min_valid=5):
+        self.g = geometry
+        self.half = half
+        self.min_valid = min_valid
+        self.R_inv = geometry.R.T
+
+    def _color_to_depth_px(self, u, v, z):
+        """Depth-image pixel of color pixel(s) (u, v) seen at distance z."""
+        c, d = self.g.color, self.g.depth
+        p = np.stack([(u - c.ppx) / c.fx * z, (v - c.ppy) / c.fy * z, np.broadcast_to(z, np.shape(u))])
+        q = self.R_inv @ (p.reshape(3, -1) - self.g.t[:, None])
+        return d.fx * q[0] / q[2] + d.ppx, d.fy * q[1] / q[2] + d.ppy
+
+    def search_window(self, x0, y0, x1, y1):
+        """Raw depth rows/cols whose pixels may project into color box [x0..x1]x[y0..y1]."""
+        us = np.array([x0 - 0.5, x1 + 0.5, x0 - 0.5, x1 + 0.5] * 2, np.float64)
+        vs = np.array([y0 - 0.5, y0 - 0.5, y1 + 0.5, y1 + 0.5] * 2, np.float64)
+        zs = np.array([Z_MIN] * 4 + [Z_MAX] * 4, np.float64)
+        du, dv = self._color_to_depth_px(us, vs, zs)
+        d = self.g.depth
+        c0 = max(0, int(np.floor(du.min())) - 1)
+        c1 = min(d.width, int(np.ceil(du.max())) + 2)
+        r0 = max(0, int(np.floor(dv.min())) - 1)
+        r1 = min(d.height, int(np.ceil(dv.max())) + 2)
+        return r0, r1, c0, c1
+
+    def project_patch(self, depth_raw, depth_scale, x0, y0, x1, y1):
+        """Aligned z16 values of color box [x0..x1]x[y0..y1] (0 = no depth), like rs.align."""
+        r0, r1, c0, c1 = self.search_window(x0, y0, x1, y1)
+        out = np.zeros((y1 - y0 + 1, x1 - x0 + 1), np.uint16)
+        if r1 <= r0 or c1 <= c0:
+            return out
+        raw = depth_raw[r0:r1, c0:c1]
+        rows, cols = np.nonzero(raw)
+        if rows.size == 0:
+            return out
+        z16 = raw[rows, cols]
+        z = z16.astype(np.float64) * depth_scale
+        v = rows + r0
+        u = cols + c0
+
+        d, c, R, t = self.g.depth, self.g.color, self.g.R, self.g.t
+        # Footprint: project the top-left and bottom-right corners of every depth pixel
+        corners = []
+        for off in (-0.5, 0.5):
+            X = (u + off - d.ppx) / d.fx * z
+            Y = (v + off - d.ppy) / d.fy * z
+            P = R @ np.stack([X, Y, z]) + t[:, None]
+            corners.append((np.floor(c.fx * P[0] / P[2] + c.ppx + 0.5).astype(np.int64),
+                            np.floor(c.fy * P[1] / P[2] + c.ppy + 0.5).astype(np.int64)))
+        (ux0, vy0), (ux1, vy1) = corners
+        inside = (ux0 >= 0) & (vy0 >= 0) & (ux1 < c.width) & (vy1 < c.height)
+
+        qy, qx = np.mgrid[y0:y1 + 1, x0:x1 + 1]
+        qx = qx.ravel()[None, :]
+        qy = qy.ravel()[None, :]
+        covered = (inside[:, None] &
+                   (ux0[:, None] <= qx) & (qx <= ux1[:, None]) &
+                   (vy0[:, None] <= qy) & (qy <= vy1[:, None]))
+        # rs.align keeps the nearest depth when several pixels cover the same color pixel
+        best = np.where(covered, z16[:, None].astype(np.int64), np.iinfo(np.int64).max).min(axis=0)
+        best[best == np.iinfo(np.int64).max] = 0
+        out[:] = best.reshape(out.shape)
+        return out
+
+    def sample(self, depth_raw, x_center, y_center, depth_scale):
+        """Drop-in for tracker_core.sample_depth on the raw (unaligned) depth image."""
+        h = self.half
+        x_c = max(h + 2, min(FRAME_W - h - 3, x_center))
+        y_c = max(h + 2, min(FRAME_H - h - 3, y_center))
+        patch = self.project_patch(depth_raw, depth_scale, x_c - h, y_c - h, x_c + h, y_c + h)
+        valid_depths = patch[patch > 0]
+        if len(valid_depths) < self.min_valid:
+            return None
+        distance = np.median(valid_depths) * depth_scale
+        if distance < Z_MIN or distance > Z_MAX:
+            return None
+        return float(distance)
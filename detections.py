@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Detection record layout shared by the detectors, the daemon and the offload server
+NumPy only, so clients can decode replies without importing onnxruntime or ultralytics.
+"""
+import numpy as np
+
+DET_DTYPE = np.dtype([('x1', 'f4'), ('y1', 'f4'), ('x2', 'f4'), ('y2', 'f4'),
+                      ('conf', 'f4'), ('cls', 'i4')])
+
+
+def top_detection(dets):
+    """Best row of a DET_DTYPE array in the trackers' (xyxy int, conf, cls_id) format."""
+    if len(dets) == 0:
+        return None
+    d = dets[0]
+    xyxy = np.array([d['x1'], d['y1'], d['x2'], d['y2']]).astype(int)
+    return xyxy, float(d['conf']), int(d['cls'])
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Resident detector daemon: models stay loaded and warm, trackers connect in milliseconds
+Serves one or more models on a Unix socket. Each client maps a frame buffer in /dev/shm
+(same idea as cmd_channel.py), so a request is a few bytes on the socket plus an image
+that is never copied through it; the reply is the detections as DET_DTYPE records.
+Clients asking for the same model share one instance (a lock serializes its inference).
+
+Daemon:
+    python3 detector_daemon.py --model onnx:/home/unitree/depth_test/final_best.onnx \
+                               --model onnx:/home/unitree/depth_test/yolov8s.onnx
+Client (or load_detector('daemon', path) / --backend daemon in the trackers):
+    client = DetectorClient('final_best.onnx')
+    dets = client.detect(color_image, classes=[0, 2])   # DET_DTYPE array, best first
+    top = client.top(color_image, classes)               # (xyxy, conf, cls_id) or None
+"""
+import argparse
+import ast
+import json
+import mmap
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from detections import DET_DTYPE, top_detection
+
+SOCKET_PATH = '/tmp/bolt_detector.sock'
+SHM_DIR = '/dev/shm'
+
+# request: seq | height | width | number of class ids (ALL_CLASSES = no filter), then int16 ids
+_REQUEST = struct.Struct('<IHHH')
+_CLASS_ID = struct.Struct('<h')
+ALL_CLASSES = 0xFFFF
+# reply: seq | number of detections | inference ms | wait for the model lock ms, then records
+REPLY = struct.Struct('<IHff')
+BAD_REQUEST = 0xFFFF  # number of detections of a rejected request (frame larger than the buffer)
+
+
+def recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0:
+            raise ConnectionError("detector daemon connection closed")
+        got += k
+    return buf
+
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) < n:
+        raise ConnectionError("client closed")
+    return data
+
+
+class ResidentModel:
+    """One loaded model, shared by every client that asks for it."""
+
+    def __init__(self, backend, path, warmup=3):
+        self.backend = backend
+        self.path = path
+        self.name = os.path.basename(path)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.infer_s = 0.0
+        if backend == 'onnx':
+            from onnx_detector import GRAPH_CACHE_DIR, OnnxDetector
+            self.det = OnnxDetector(path, cache_dir=GRAPH_CACHE_DIR)
+            self.det.warmup(warmup)
+            meta = self.det.session.get_modelmeta().custom_metadata_map
+            self.names = ast.literal_eval(meta['names']) if 'names' in meta else {}
+        else:
+            from ultralytics import YOLO
+            self.model = YOLO(path, task='detect')
+            for _ in range(warmup):
+                self.model(np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8), verbose=False)
+            self.names = dict(self.model.names)
+
+    def detect(self, image, classes):
+        if self.backend == 'onnx':
+            return self.det.detect(image, classes)
+        return _yolo_dets(self.model(image, classes=classes, verbose=False)[0].boxes)
+
+    def detect_batch(self, images, classes_list):
+        """detect() for several frames in one model call where the backend allows it."""
+        if self.backend == 'onnx':
+            return self.det.detect_batch(images, classes_list)
+        results = self.model(list(images), verbose=False)
+        out = []
+        for result, classes in zip(results, classes_list):
+            dets = _yolo_dets(result.boxes)
+            out.append(dets if classes is None else dets[np.isin(dets['cls'], classes)])
+        return out
+
+
+def _yolo_dets(boxes):
+    """ultralytics Boxes -> DET_DTYPE array."""
+    out = np.empty(len(boxes), DET_DTYPE)
+    if len(boxes):
+        xyxy = boxes.xyxy.cpu().numpy()
+        out['x1'], out['y1'], out['x2'], out['y2'] = xyxy.T
+        out['conf'] = boxes.conf.cpu().numpy()
+        out['cls'] = boxes.cls.cpu().numpy()
+    return out
+
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        f = sock.makefile('rb')
+        try:
+            hello = json.loads(f.readline())
+            model = server.models.get(hello.get('model'))
+            if model is None:
+                raise KeyError(f"model '{hello.get('model')}' not loaded "
+                               f"(have: {', '.join(server.models)})")
+            fd = os.open(hello['shm'], os.O_RDWR)
+            try:
+                frame_map = mmap.mmap(fd, hello['size'], mmap.MAP_SHARED, mmap.PROT_READ)
+            finally:
+                os.close(fd)
+        except (ValueError, KeyError, OSError) as e:
+            sock.sendall((json.dumps({'ok': False, 'error': str(e)}) + '\n').encode())
+            return
+        sock.sendall((json.dumps({'ok': True, 'model': model.name, 'backend': model.backend,
+                                  'names': {str(k): v for k, v in model.names.items()}})
+                      + '\n').encode())
+        server.clients += 1
+        print(f"✓ client {hello.get('client', '?')} -> {model.name}")
+        try:
+            while True:
+                seq, h, w, n_cls = _REQUEST.unpack(_read_exact(f, _REQUEST.size))
+                classes = None
+                if n_cls != ALL_CLASSES:
+                    classes = [int(c) for c in np.frombuffer(_read_exact(f, n_cls * _CLASS_ID.size), '<i2')]
+                if h * w * 3 > len(frame_map):
+                    sock.sendall(REPLY.pack(seq, BAD_REQUEST, 0.0, 0.0))
+                    continue
+                image = np.frombuffer(frame_map, np.uint8, h * w * 3).reshape(h, w, 3)
+                t0 = time.perf_counter()
+                with model.lock:
+                    t1 = time.perf_counter()
+                    dets = model.detect(image, classes)
+                    t2 = time.perf_counter()
+                    model.requests += 1
+                    model.infer_s += t2 - t1
+                del image
+                sock.sendall(REPLY.pack(seq, len(dets), (t2 - t1) * 1000.0, (t1 - t0) * 1000.0)
+                             + dets.astype(DET_DTYPE, copy=False).tobytes())
+        except ConnectionError:
+            pass
+        finally:
+            server.clients -= 1
+            frame_map.close()
+            print(f"client {hello.get('client', '?')} disconnected")
+
+
+class DetectorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, models, path=SOCKET_PATH):
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous daemon
+        super().__init__(path, _ClientHandler)
+        os.chmod(path, 0o666)
+        self.models = {m.name: m for m in models}
+        self.clients = 0
+
+    def format_stats(self):
+        parts = [f"{self.clients} client(s)"]
+        for m in self.models.values():
+            mean = m.infer_s / m.requests * 1000.0 if m.requests else 0.0
+            parts.append(f"{m.name}: {m.requests} requests, {mean:.1f} ms mean")
+        return ' | '.join(parts)
+
+
+class DetectorClient:
+    """Connects to the daemon and maps a frame buffer. Construction takes milliseconds;
+    raises ConnectionError if no daemon is running or the model is not loaded."""
+
+    def __init__(self, model, path=SOCKET_PATH, max_shape=(480, 640, 3), timeout=5.0):
+        self.model = model
+        self.size = int(np.prod(max_shape))
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError as e:
+            self.sock.close()
+            raise ConnectionError(f"no detector daemon on {path} ({e})") from e
+        shm = os.path.join(SHM_DIR, f'bolt_det_{os.getpid()}_{id(self):x}')
+        fd = os.open(shm, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.size)
+            self._map = mmap.mmap(fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._frame = np.frombuffer(self._map, np.uint8)
+        try:
+            hello = {'model': model, 'shm': shm, 'size': self.size,
+                     'client': f"{os.path.basename(sys.argv[0])}[{os.getpid()}]"}
+            self.sock.sendall((json.dumps(hello) + '\n').encode())
+            line = bytearray()
+            while not line.endswith(b'\n'):
+                line += recv_exact(self.sock, 1)
+            reply = json.loads(line)
+        finally:
+            os.unlink(shm)  # both sides have it mapped; nothing to clean up after a crash
+        if not reply['ok']:
+            self.close()
+            raise ConnectionError(f"detector daemon: {reply['error']}")
+        self.names = {int(k): v for k, v in reply['names'].items()}
+        self.seq = 0
+        self.last_infer_ms = 0.0
+        self.last_wait_ms = 0.0
+
+    def detect(self, image, classes=None):
+        h, w = image.shape[:2]
+        if h * w * 3 > self.size:
+            raise ValueError(f"frame {w}x{h} larger than the mapped buffer")
+        np.copyto(self._frame[:h * w * 3].reshape(h, w, 3), image)
+        self.seq += 1
+        if classes is None:
+            req = _REQUEST.pack(self.seq, h, w, ALL_CLASSES)
+        else:
+            req = _REQUEST.pack(self.seq, h, w, len(classes)) + b''.join(
+                _CLASS_ID.pack(c) for c in classes)
+        self.sock.sendall(req)
+        seq, n, self.last_infer_ms, self.last_wait_ms = REPLY.unpack(recv_exact(self.sock, REPLY.size))
+        if seq != self.seq:
+            raise ConnectionError(f"detector daemon: reply {seq} for request {self.seq}")
+        if n == BAD_REQUEST:
+            raise ValueError(f"detector daemon rejected a {w}x{h} frame (larger than its mapping)")
+        return np.frombuffer(recv_exact(self.sock, n * DET_DTYPE.itemsize), DET_DTYPE)
+
+    def top(self, image, classes=None):
+        return top_detection(self.detect(image, classes))
+
+    def close(self):
+        self.sock.close()
+        self._frame = None
+        self._map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', action='append', required=True,
+                        help="backend:path, repeatable ('onnx:final_best.onnx', 'ultralytics:final_best.pt')")
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    parser.add_argument('--stats-every', type=float, default=30.0, help='s between stats lines (0 = off)')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("DETECTOR DAEMON")
+    print("="*60)
+    models = []
+    for spec in args.model:
+        backend, path = spec.split(':', 1) if ':' in spec else ('onnx', spec)
+        t0 = time.perf_counter()
+        models.append(ResidentModel(backend, path))
+        print(f"✓ {models[-1].name} ({backend}) loaded and warm in {time.perf_counter() - t0:.1f} s")
+
+    server = DetectorServer(models, args.socket)
+    threading.Thread(target=server.serve_forever, name='detector-daemon', daemon=True).start()
+    print(f"✓ Listening on {args.socket}")
+    try:
+        while True:
+            time.sleep(args.stats_every or 3600)
+            if args.stats_every:
+                print(server.format_stats())
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.unlink(args.socket)
+        print("Stopped")
+
+
+if __name__ == '__main__':
+    main()
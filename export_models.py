@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Export the custom model as ONNX FP32 / FP16 / INT8 and report accuracy vs CPU latency
+INT8 is static QDQ quantization calibrated on images from the `valid` split; the
+detection head's post-processing (DFL, concat, sigmoid) stays in float.
+Each variant gets mAP@0.5 on the `test` split (ultralytics val) and single-frame CPU
+latency through onnx_detector.OnnxDetector, written to <out>/report.md and report.json.
+
+--imgsz takes one or more sizes: square (640) or rectangular WxH (640x480 matches the
+camera with no letterbox padding). ultralytics only validates ONNX at square sizes, so a
+rectangular size reports the mAP of the .pt checkpoint validated with rect=True at the
+same input shape (FP32 accuracy).
+Usage: python3 export_models.py --weights final_best.pt --data data.yaml [--out exports]
+                                [--imgsz 640 | 320x256,480x384,640x480]
+                                [--variants fp32,fp16,int8] [--calib-images 100] [--min-map 0.985]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def split_images(data_yaml, split):
+    """Image paths of a split ('train', 'val'/'valid', 'test') listed in a YOLO data.yaml."""
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+    key = 'val' if split in ('val', 'valid') else split
+    entry = data.get(key)
+    if entry is None:
+        raise KeyError(f"{data_yaml} has no '{key}' split")
+    base = os.path.dirname(os.path.abspath(data_yaml))
+    roots = [data.get('path') or base, base]
+    candidates = [os.path.join(r, entry) for r in roots]
+    # Roboflow exports write '../valid/images' relative to the dataset root
+    candidates.append(os.path.join(base, entry.replace('../', '', 1)))
+    for c in candidates:
+        if os.path.isdir(c):
+            return sorted(p for p in glob.glob(os.path.join(c, '*')) if p.lower().endswith(IMAGE_EXTS))
+    raise FileNotFoundError(f"split '{split}' not found, tried: {candidates}")
+
+
+def parse_sizes(text):
+    """'640' -> [640]; '640x480,320x256' (WxH) -> [(480, 640), (256, 320)] as (h, w)."""
+    sizes = []
+    for item in text.split(','):
+        if 'x' in item:
+            w, h = (int(v) for v in item.lower().split('x'))
+            sizes.append((h, w) if h != w else w)
+        else:
+            sizes.append(int(item))
+    return sizes
+
+
+def size_tag(imgsz):
+    if isinstance(imgsz, int):
+        return '' if imgsz == 640 else f'_{imgsz}'
+    return f'_{imgsz[1]}x{imgsz[0]}'
+
+
+def export_fp32(weights, out_dir, imgsz, name):
+    """ultralytics ONNX export with the same settings as yolo_models.py. imgsz: int or (h, w)."""
+    from ultralytics import YOLO
+    path = YOLO(weights).export(format='onnx', simplify=True, dynamic=False, opset=12,
+                                imgsz=list(imgsz) if isinstance(imgsz, tuple) else imgsz)
+    dest = os.path.join(out_dir, f'{name}{size_tag(imgsz)}_fp32.onnx')
+    shutil.move(path, dest)
+    return dest
+
+
+def export_fp16(fp32_path, dest):
+    """FP16 weights/activations with float32 I/O, so the same pre/post-processing works."""
+    import onnx
+    from onnxconverter_common import float16
+    model = float16.convert_float_to_float16(onnx.load(fp32_path), keep_io_types=True)
+    onnx.save(model, dest)
+    return dest
+
+
+def head_postprocess_nodes(onnx_path):
+    """Non-Conv nodes of the YOLOv8 Detect head (model.22): DFL softmax, concat, sigmoid."""
+    import onnx
+    graph = onnx.load(onnx_path).graph
+    head = [n for n in graph.node if '/model.22/' in n.name and n.op_type != 'Conv']
+    return [n.name for n in head]
+
+
+class ImageCalibrationReader:
+    """onnxruntime CalibrationDataReader over letterboxed calibration images."""
+
+    def __init__(self, fp32_path, images):
+        from onnx_detector import OnnxDetector
+        self.det = OnnxDetector(fp32_path, providers=['CPUExecutionProvider'])
+        self.images = list(images)
+
+    def get_next(self):
+        while self.images:
+            image = cv2.imread(self.images.pop(0))
+            if image is not None:
+                return {self.det.input_name: self.det.preprocess(image).copy()}
+        return None
+
+    def rewind(self):
+        pass
+
+
+def export_int8(fp32_path, dest, calib_images, quantize_head=False):
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+    exclude = [] if quantize_head else head_postprocess_nodes(fp32_path)
+    quantize_static(fp32_path, dest, ImageCalibrationReader(fp32_path, calib_images),
+                    quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8, per_channel=True,
+                    calibrate_method=CalibrationMethod.MinMax, nodes_to_exclude=exclude)
+    return dest
+
+
+def evaluate_map50(model_path, data_yaml, imgsz, split='test', rect=False):
+    """(mAP@0.5, per-class recall dict) with ultralytics' validator on CPU."""
+    from ultralytics import YOLO
+    model = YOLO(model_path, task='detect')
+    metrics = model.val(data=data_yaml, split=split, imgsz=imgsz, batch=1, device='cpu',
+                        rect=rect, plots=False, verbose=False)
+    recall = {model.names[c]: float(metrics.box.r[i]) for i, c in enumerate(metrics.box.ap_class_index)}
+    return float(metrics.box.map50), recall
+
+
+def measure_latency(onnx_path, images, runs=50, warmup=5, threads=None):
+    """Single-frame CPU latency (ms) of OnnxDetector.detect, including pre/post-processing."""
+    import onnxruntime as ort
+    from onnx_detector import OnnxDetector
+    opts = ort.SessionOptions()
+    if threads:
+        opts.intra_op_num_threads = threads
+    det = OnnxDetector(onnx_path, providers=['CPUExecutionProvider'], session_options=opts)
+    frames = [cv2.imread(p) for p in images[:max(1, min(len(images), 10))]]
+    frames = [f for f in frames if f is not None] or [np.zeros((480, 640, 3), np.uint8)]
+    for i in range(warmup):
+        det.detect(frames[i % len(frames)])
+    times = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        det.detect(frames[i % len(frames)])
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {'mean_ms': float(np.mean(times)), 'p50_ms': float(np.percentile(times, 50)),
+            'p95_ms': float(np.percentile(times, 95))}
+
+
+def format_report(rows, min_map):
+    lines = ["| variant | size MB | mAP@0.5 | mean ms | p50 ms | p95 ms |",
+             "|---|---:|---:|---:|---:|---:|"]
+    for r in rows:
+        m = f"{r['map50']:.4f}" if r.get('map50') is not None else 'n/a'
+        lines.append(f"| {r['variant']} | {r['size_mb']:.1f} | {m} | {r['mean_ms']:.2f} | "
+                     f"{r['p50_ms']:.2f} | {r['p95_ms']:.2f} |")
+    ok = [r for r in rows if r.get('map50') is not None and r['map50'] >= min_map]
+    if ok:
+        best = min(ok, key=lambda r: r['mean_ms'])
+        lines.append(f"\nFastest variant with mAP@0.5 >= {min_map}: **{best['variant']}** ({best['path']})")
+    else:
+        lines.append(f"\nNo variant reaches mAP@0.5 >= {min_map}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--weights', default='final_best.pt')
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--out', default='exports')
+    parser.add_argument('--imgsz', type=parse_sizes, default=[640],
+                        help='640 or comma-separated WxH sizes, e.g. 320x256,480x384,640x480')
+    parser.add_argument('--variants', default='fp32,fp16,int8')
+    parser.add_argument('--calib-images', type=int, default=100)
+    parser.add_argument('--quantize-head', action='store_true',
+                        help='also quantize the detection head post-processing')
+    parser.add_argument('--runs', type=int, default=50, help='latency runs per variant')
+    parser.add_argument('--threads', type=int, default=None, help='onnxruntime intra-op threads')
+    parser.add_argument('--min-map', type=float, default=0.985)
+    parser.add_argument('--skip-eval', action='store_true', help='latency only')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.weights))[0]
+    variants = args.variants.split(',')
+
+    print("="*60)
+    print(f"EXPORT + QUANTIZE {name}")
+    print("="*60)
+
+    calib = split_images(args.data, 'valid')[:args.calib_images] if 'int8' in variants else []
+    test_images = split_images(args.data, 'test')
+    rows = []
+    for imgsz in args.imgsz:
+        tag = size_tag(imgsz)
+        label = f"{imgsz}x{imgsz}" if isinstance(imgsz, int) else f"{imgsz[1]}x{imgsz[0]}"
+        print(f"\n--- input {label} ---")
+        print("1. Exporting FP32 ONNX...")
+        paths = {'fp32': export_fp32(args.weights, args.out, imgsz, name)}
+        print(f"✓ {paths['fp32']}")
+        if 'fp16' in variants:
+            print("2. Converting to FP16...")
+            try:
+                paths['fp16'] = export_fp16(paths['fp32'], os.path.join(args.out, f'{name}{tag}_fp16.onnx'))
+                print(f"✓ {paths['fp16']}")
+            except ImportError as e:
+                print(f"✗ FP16 skipped ({e}); pip install onnxconverter-common")
+        if 'int8' in variants:
+            print(f"3. INT8 static quantization ({len(calib)} valid images)...")
+            paths['int8'] = export_int8(paths['fp32'], os.path.join(args.out, f'{name}{tag}_int8.onnx'),
+                                        calib, args.quantize_head)
+            print(f"✓ {paths['int8']}")
+
+        print("4. Evaluating...")
+        rect_map = None
+        if not isinstance(imgsz, int) and not args.skip_eval:
+            rect_map = evaluate_map50(args.weights, args.data, max(imgsz), rect=True)
+        for variant in [v for v in ('fp32', 'fp16', 'int8') if v in paths and v in variants]:
+            path = paths[variant]
+            row = {'variant': f"{variant} {label}", 'imgsz': imgsz, 'path': path,
+                   'size_mb': os.path.getsize(path) / 1e6}
+            row.update(measure_latency(path, test_images, args.runs, threads=args.threads))
+            if args.skip_eval:
+                pass
+            elif isinstance(imgsz, int):
+                row['map50'], row['recall'] = evaluate_map50(path, args.data, imgsz)
+            elif variant == 'fp32':
+                row['map50'], row['recall'] = rect_map
+                row['map50_source'] = 'pt rect=True'
+            rows.append(row)
+            m = f"{row['map50']:.4f}" if row.get('map50') is not None else 'n/a'
+            print(f"  {row['variant']}: {row['mean_ms']:.2f} ms, mAP@0.5={m}")
+
+    report = format_report(rows, args.min_map)
+    with open(os.path.join(args.out, 'report.md'), 'w') as f:
+        f.write(f"# {name} export report\n\n{report}\n")
+    with open(os.path.join(args.out, 'report.json'), 'w') as f:
+        json.dump(rows, f, indent=2)
+    print("\n" + report)
+
+
+if __name__ == '__main__':
+    main()
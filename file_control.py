@@ -1,29 +1,77 @@
 #!/usr/bin/env python3
 """
-File-based robot control - reads commands from file
+Robot control - reads commands from the shared-memory command channel
 Run this in Terminal 1 on the robot
 Supports velocity commands (vx,vy,vyaw) and pose commands ('stand', 'sit')
+Every cycle is recorded as a fixed-size binary record (telemetry.py); inspect a run
+with telemetry_query.py. The text log only keeps events.
+Commands from the trackers carry their frame's glass time: glass-to-Move latency per
+stage is served on :8081/metrics and printed at shutdown (latency_trace.py).
+Between tracker setpoints every cycle sends a slew-limited command whose yaw rate is
+corrected for the target bearing predicted to now (control_loop.SetpointShaper).
+Usage: python3 file_control.py [--rate 100] [--wake-on-command] [--max-age 1.0] [--ramp 0.5]
+                               [--fake-client] [--telemetry DIR] [--metrics-port 8081]
+                               [--raw-setpoints] [--max-predict 0.15] [--accel 1.5,1.5,6.0]
 """
+import os
 import sys
 import time
 import logging
-sys.path.insert(0, '/home/unitree/Documents/code/unitree_sdk2_python')
-from unitree_sdk2py.core.channel import ChannelFactortyInitialize
-from unitree_sdk2py.go2.sport.sport_client import SportClient
+import argparse
+from cmd_channel import (CommandReader, CommandWriter, POSE_NONE, POSE_STAND, POSE_SIT, POSE_IDS,
+                         POSE_NAMES, CHANNEL_PATH)
+from control_loop import DeadlineScheduler, StalenessWatchdog, LoopStats, SetpointShaper
+from sport_dispatch import SportDispatcher, FakeSportClient
+from latency_trace import FrameTrace, LatencyTracer, serve_metrics
+from telemetry import (Telemetry, CONTROL_DTYPE, FLAG_NEW_CMD, FLAG_WATCHDOG, FLAG_POSE_BUSY,
+                       FLAG_OVERRUN, FLAG_PREDICTED)
+from tracker_core import YAW_PER_BEARING
 
-# Set up logging to file
-logging.basicConfig(filename='/home/unitree/depth_test/file_control.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+parser = argparse.ArgumentParser(description="Robot control loop")
+parser.add_argument('--rate', type=float, default=100.0, help='Move rate (Hz)')
+parser.add_argument('--wake-on-command', action='store_true',
+                    help='apply new commands immediately instead of at the next tick')
+parser.add_argument('--max-age', type=float, default=1.0,
+                    help='command age (s) after which the watchdog ramps to zero')
+parser.add_argument('--ramp', type=float, default=0.5, help='watchdog ramp-down time (s)')
+parser.add_argument('--fake-client', action='store_true',
+                    help='use FakeSportClient instead of the robot (off-robot testing)')
+parser.add_argument('--telemetry', default=None,
+                    help="per-cycle binary records directory (default <script dir>/telemetry, '' = off)")
+parser.add_argument('--metrics-port', type=int, default=8081, help='latency /metrics port (0 = off)')
+parser.add_argument('--raw-setpoints', action='store_true',
+                    help='send the last setpoint as is (no prediction or slew limiting)')
+parser.add_argument('--max-predict', type=float, default=0.15,
+                    help='longest bearing prediction (s) from the frame glass time')
+parser.add_argument('--accel', default='1.5,1.5,6.0',
+                    help='slew limits vx,vy,vyaw (m/s^2, m/s^2, rad/s^2)')
+parser.add_argument('--yaw-gain', type=float, default=YAW_PER_BEARING,
+                    help='vyaw per rad of bearing used for the prediction (the FSM turn slope)')
+args = parser.parse_args()
+PERIOD = 1.0 / args.rate
+
+BASE = os.path.dirname(os.path.abspath(__file__))  # /home/unitree/depth_test on the robot
+
+# Set up logging to file (events only; per-cycle data goes to telemetry)
+logging.basicConfig(filename=os.path.join(BASE, 'file_control.log'), level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+TELEMETRY_DIR = os.path.join(BASE, 'telemetry') if args.telemetry is None else args.telemetry
 
 print("="*60)
-print("ROBOT CONTROL - FILE-BASED")
+print("ROBOT CONTROL - SHARED-MEMORY CHANNEL")
 print("="*60)
 
 # Initialize robot
 print("\nInitializing robot...")
 logging.info("Initializing robot")
 try:
-    ChannelFactortyInitialize(0)
-    client = SportClient()
+    if args.fake_client:
+        client = FakeSportClient()
+    else:
+        sys.path.insert(0, '/home/unitree/Documents/code/unitree_sdk2_python')
+        from unitree_sdk2py.core.channel import ChannelFactortyInitialize
+        from unitree_sdk2py.go2.sport.sport_client import SportClient
+        ChannelFactortyInitialize(0)
+        client = SportClient()
     client.SetTimeout(10.0)
     client.Init()
     print("Standing up...")
@@ -35,78 +83,154 @@ except Exception as e:
     logging.error(f"Init error: {e}")
     sys.exit(1)
 
-# Command file (updated to match pose_control.py)
-cmd_file = '/home/unitree/depth_test/velocities.txt'
+# Command channel (shared with the trackers and pose_control.py)
+CommandWriter(CHANNEL_PATH).send(0.0, 0.0, 0.0)  # Write default
+reader = CommandReader(CHANNEL_PATH)
+if args.wake_on_command:
+    reader.enable_wakeup()
+watchdog = StalenessWatchdog(args.max_age, args.ramp)
+shaper = None if args.raw_setpoints else SetpointShaper(
+    args.yaw_gain, args.max_predict, tuple(float(a) for a in args.accel.split(',')))
+stats = LoopStats(PERIOD)
+
+def log_error(what, e):
+    print(f"{what} error: {e}")
+    logging.error(f"{what} error: {e}")
+
+tracer = LatencyTracer('control', end_to_end='glass_to_move')
 
-# Write default
-with open(cmd_file, 'w') as f:
-    f.write('0.0,0.0,0.0')
+def trace_move(tag, t_start, t_end):
+    """Runs on the dispatcher thread once the Move for a tracker frame returned."""
+    frame_id, t_glass, t_publish, t_read = tag
+    trace = FrameTrace(frame_id, t_glass)
+    trace.mark('publish', t_publish)  # glass -> tracker published the command
+    trace.mark('read', t_read)        # command consumed by this loop
+    trace.mark('move_start', t_start)
+    trace.mark('move_end', t_end)
+    tracer.add(trace)
 
-print(f"✓ Ready - reading from {cmd_file}")
-logging.info(f"Ready - reading from {cmd_file}")
+# The dispatcher thread owns the client from here on; the loop never blocks on RPCs
+dispatcher = SportDispatcher(client, settle_time=2.0, on_error=log_error, on_move=trace_move).start()
+if args.metrics_port:
+    serve_metrics(tracer, args.metrics_port)
+tlm = Telemetry(TELEMETRY_DIR, 'control', CONTROL_DTYPE).start() if TELEMETRY_DIR else None
+
+print(f"✓ Ready - reading from {CHANNEL_PATH}")
+logging.info(f"Ready - reading from {CHANNEL_PATH}")
+print(f"Rate {args.rate:.0f} Hz, wake-on-command={args.wake_on_command}, "
+      f"watchdog {args.max_age:.2f}s + {args.ramp:.2f}s ramp")
+if shaper is not None:
+    print(f"Setpoints: bearing prediction up to {args.max_predict * 1000:.0f} ms, "
+          f"slew limits {args.accel}")
+if tlm is not None:
+    print(f"Telemetry: {TELEMETRY_DIR} (python3 telemetry_query.py {TELEMETRY_DIR})")
 print("Press Ctrl+C to stop\n")
 
 vx, vy, vyaw = 0.0, 0.0, 0.0
+t_frame, bearing, bearing_rate = 0.0, float('nan'), 0.0
 current_pose = "stand"  # Track current pose
+pose_target = "stand"   # Last pose requested from the dispatcher
+pose_op = None
 iteration = 0
+last_seq = -1
+mx, my, myaw = 0.0, 0.0, 0.0
 
 try:
+    scheduler = DeadlineScheduler(PERIOD)
+    wake = reader.wait if args.wake_on_command else None
     while True:
-        # Read command from file
-        try:
-            with open(cmd_file, 'r') as f:
-                content = f.read().strip()
-                parts = content.split(',')
-                if len(parts) == 1 and parts[0] in ['stand', 'sit']:
-                    # Pose command
-                    pose_cmd = parts[0]
-                    if pose_cmd != current_pose:
-                        try:
-                            if pose_cmd == "sit":
-                                client.StandDown()
-                                current_pose = "sit"
-                            elif pose_cmd == "stand":
-                                client.StandUp()
-                                current_pose = "stand"
-                            print(f"Executed pose: {pose_cmd}")
-                            logging.info(f"Executed pose: {pose_cmd}")
-                            time.sleep(2)  # Delay for stability
-                        except Exception as e:
-                            print(f"Pose error: {e}")
-                            logging.error(f"Pose error: {e}")
-                    # Skip Move for pose commands
-                    time.sleep(0.01)
-                    iteration += 1
-                    continue
-                elif len(parts) >= 3:
-                    # Velocity command
-                    vx = float(parts[0])
-                    vy = float(parts[1])
-                    vyaw = float(parts[2])
-        except Exception as e:
-            print(f"Read error: {e}")
-            logging.error(f"Read error: {e}")
-            pass
-        
-        # Send move command (only for velocities)
-        try:
-            client.Move(vx, vy, vyaw)
-        except Exception as e:
-            print(f"Move error: {e}")
-            logging.error(f"Move error: {e}")
-        
-        if iteration % 100 == 0:
-            print(f"vx={vx:+.2f}, vyaw={vyaw:+.2f}, pose={current_pose}")
-            logging.info(f"vx={vx:+.2f}, vyaw={vyaw:+.2f}, pose={current_pose}")
-        
-        iteration += 1
-        time.sleep(0.01)  # 100Hz
+        send_move = True
+        cmd_age = 0.0
+        cycle_start = time.monotonic()
+        overruns = scheduler.overruns
+        flags = 0
+        # Read latest command from the channel
+        cmd = reader.read()
+        t_read = time.monotonic()
+        trace_tag = None
+        if cmd is not None:
+            cmd_age = cycle_start - cmd.stamp
+            if cmd.seq != last_seq:
+                flags |= FLAG_NEW_CMD
+                last_seq = cmd.seq
+                if cmd.frame_id:
+                    trace_tag = (cmd.frame_id, cmd.t_frame, cmd.stamp, t_read)
+            if cmd.pose in (POSE_STAND, POSE_SIT):
+                # Pose command: runs asynchronously on the dispatcher
+                pose_cmd = POSE_NAMES[cmd.pose]
+                if pose_cmd != pose_target:
+                    pose_op = dispatcher.request_pose(pose_cmd)
+                    pose_target = pose_cmd
+                # Skip Move for pose commands
+                send_move = False
+                if shaper is not None:
+                    shaper.reset()
+            elif cmd.pose == POSE_NONE:
+                # Velocity command
+                vx, vy, vyaw = cmd.vx, cmd.vy, cmd.vyaw
+                t_frame, bearing, bearing_rate = cmd.t_frame, cmd.bearing, cmd.bearing_rate
+            # other poses ('point') are not executed here: Move keeps the last velocity, as before
+
+        if pose_op is not None and pose_op.done():
+            if pose_op.state == 'done':
+                print(f"Executed pose: {pose_op.pose}")
+                logging.info(f"Executed pose: {pose_op.pose} "
+                             f"({(pose_op.finished - pose_op.requested):.2f}s incl. settle)")
+            else:
+                pose_target = dispatcher.current_pose  # retry on the next pose command
+            pose_op = None
+        current_pose = dispatcher.current_pose
+
+        if send_move:
+            # Watchdog: a crashed tracker must not leave the last command running
+            was_tripped = watchdog.tripped
+            if shaper is not None:
+                # Setpoint predicted to now, watchdog, then slew limit: smooth 100 Hz output
+                # between tracker updates instead of steps
+                setpoint = shaper.target(vx, vy, vyaw, t_frame, bearing, bearing_rate, cycle_start)
+                mx, my, myaw = shaper.step(watchdog.apply(*setpoint, cmd_age), cycle_start)
+                if shaper.predicted:
+                    flags |= FLAG_PREDICTED
+            else:
+                mx, my, myaw = watchdog.apply(vx, vy, vyaw, cmd_age)
+            if watchdog.tripped != was_tripped:
+                msg = (f"Watchdog: command {cmd_age:.2f}s old, ramping to zero" if watchdog.tripped
+                       else "Watchdog: fresh command, resuming")
+                print(msg)
+                logging.warning(msg)
+
+            # Latest setpoint wins; the dispatcher coalesces if Move is still in flight
+            dispatcher.set_velocity(mx, my, myaw, trace_tag)
+            if watchdog.tripped:
+                flags |= FLAG_WATCHDOG
+        if pose_op is not None:
+            flags |= FLAG_POSE_BUSY
+
+        woke_on_deadline = scheduler.wait(wake)
+        if tlm is not None:
+            if scheduler.overruns != overruns:
+                flags |= FLAG_OVERRUN
+            tlm.record((cycle_start, iteration, last_seq, cmd_age, vx, vy, vyaw, mx, my, myaw,
+                        POSE_IDS.get(current_pose, POSE_NONE), flags, dispatcher.last_move_ms))
+        if woke_on_deadline:
+            stats.tick(time.monotonic())
+            if iteration % 100 == 0:
+                print(f"vx={vx:+.2f}, vyaw={vyaw:+.2f}, pose={current_pose}")
+            iteration += 1
 
 except KeyboardInterrupt:
     print("\n\nStopping robot...")
     logging.info("Stopping robot")
+    report = (stats.format() + f"\nOverruns: {scheduler.overruns}\n" +
+              dispatcher.format_stats() + "\n" + tracer.format())
+    print(report)
+    logging.info("\n" + report)
 
 finally:
+    dispatcher.stop()
+    if tlm is not None:
+        tlm.close()
+        print(tlm.format_stats())
     # Stop with multiple commands
     for _ in range(30):
         try:
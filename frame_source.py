@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Frame sources for the trackers, so the perception path runs without a RealSense
+RealSenseSource - live camera (depth aligned to color, or raw depth + geometry for depth_roi)
+RecordedSource  - replays a session written by Recorder, real-time or as fast as possible
+SyntheticSource - generated frames: a coloured ball moving over a textured floor
+Recorder        - background writer of color/depth/timestamps in compressed chunks
+
+Every source has read() (blocking), poll() (non-blocking, None if nothing is ready)
+and prepare(pkt), which fills pkt.color_image / pkt.depth_image. For the live camera
+prepare() is the depth-to-color alignment, so it can run as its own pipeline stage.
+read()/poll() raise EOFError at the end of a recording.
+
+Sources with aligned=False deliver the raw depth image plus `geometry`
+(depth_roi.StreamGeometry) so depth can be mapped for just the detected box.
+
+Recording layout (a directory):
+    meta.json              depth_scale, width, height, fps, aligned, geometry, frames, chunks
+    chunk_00000.npz        color (N,H,W,3) uint8, depth (N,H,W) uint16,
+                           timestamp (N,) float64 camera ms, frame_no (N,) int64
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from tracker_core import FramePacket, FRAME_W, FRAME_H
+from depth_roi import StreamGeometry
+
+CHUNK_FRAMES = 30
+
+
+class FrameSource:
+    depth_scale = 0.001
+    width, height, fps = FRAME_W, FRAME_H, 30
+    aligned = True     # depth_image is registered to color_image
+    geometry = None    # depth_roi.StreamGeometry when known
+
+    def start(self):
+        return self
+
+    def read(self):
+        raise NotImplementedError
+
+    def poll(self):
+        return self.read()
+
+    def prepare(self, pkt):
+        return pkt
+
+    def stop(self):
+        pass
+
+    def meta(self):
+        return {'depth_scale': self.depth_scale, 'width': self.width,
+                'height': self.height, 'fps': self.fps, 'aligned': self.aligned,
+                'geometry': self.geometry.to_dict() if self.geometry is not None else None}
+
+
+class RealSenseSource(FrameSource):
+    def __init__(self, width=FRAME_W, height=FRAME_H, fps=30, warmup=30, align=True):
+        self.width, self.height, self.fps = width, height, fps
+        self.warmup = warmup
+        self.aligned = align
+        self.frame_no = 0
+
+    def start(self):
+        import pyrealsense2 as rs
+        self.pipeline = rs.pipeline()
+        config = rs.config()
+        config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
+        config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+        self.profile = self.pipeline.start(config)
+        self.depth_scale = self.profile.get_device().first_depth_sensor().get_depth_scale()
+        self.geometry = StreamGeometry.from_profile(self.profile)
+        self.align = rs.align(rs.stream.color) if self.aligned else None
+        for _ in range(self.warmup):
+            self.pipeline.poll_for_frames()
+            time.sleep(1.0 / self.fps)
+        return self
+
+    def _packet(self, frames):
+        self.frame_no += 1
+        return FramePacket(self.frame_no, time.monotonic(), frames=frames,
+                           timestamp=frames.get_timestamp())
+
+    def read(self):
+        return self._packet(self.pipeline.wait_for_frames())
+
+    def poll(self):
+        frames = self.pipeline.poll_for_frames()
+        return self._packet(frames) if frames else None
+
+    def prepare(self, pkt):
+        frames = self.align.process(pkt.frames) if self.align is not None else pkt.frames
+        depth_frame = frames.get_depth_frame()
+        color_frame = frames.get_color_frame()
+        if not depth_frame or not color_frame:
+            return None
+        pkt.frames = frames  # keeps the frame buffers alive for the numpy views
+        pkt.depth_image = np.asanyarray(depth_frame.get_data())
+        pkt.color_image = np.asanyarray(color_frame.get_data())
+        return pkt
+
+    def stop(self):
+        self.pipeline.stop()
+
+
+class _PacedSource(FrameSource):
+    """Shared pacing: realtime=True releases frame k at t0 + (ts_k - ts_0)."""
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self._t0 = None
+        self._ts0 = None
+        self._pending = None
+
+    def _due(self, timestamp_ms):
+        if not self.realtime:
+            return 0.0
+        now = time.monotonic()
+        if self._t0 is None:
+            self._t0, self._ts0 = now, timestamp_ms
+        return self._t0 + (timestamp_ms - self._ts0) / 1000.0 - now
+
+    def _next(self):
+        """(frame_no, timestamp_ms, color, depth) of the next frame; EOFError at the end."""
+        raise NotImplementedError
+
+    def _emit(self, item):
+        frame_no, ts, color, depth = item
+        return FramePacket(frame_no, time.monotonic(), timestamp=ts,
+                           color_image=color, depth_image=depth)
+
+    def read(self):
+        item = self._peek()
+        wait = self._due(item[1])
+        if wait > 0:
+            time.sleep(wait)
+        self._pending = None
+        return self._emit(item)
+
+    def poll(self):
+        item = self._peek()
+        if self._due(item[1]) > 0:
+            return None
+        self._pending = None
+        return self._emit(item)
+
+    def _peek(self):
+        if self._pending is None:
+            self._pending = self._next()
+        return self._pending
+
+
+class RecordedSource(_PacedSource):
+    def __init__(self, path, realtime=True):
+        super().__init__(realtime)
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self._meta = json.load(f)
+        self.depth_scale = self._meta['depth_scale']
+        self.width, self.height = self._meta['width'], self._meta['height']
+        self.fps = self._meta.get('fps', 30)
+        self.aligned = self._meta.get('aligned', True)
+        if self._meta.get('geometry'):
+            self.geometry = StreamGeometry.from_dict(self._meta['geometry'])
+        self.chunks = sorted(n for n in os.listdir(path) if n.startswith('chunk_') and n.endswith('.npz'))
+        self._chunk_idx = 0
+        self._chunk = None
+        self._row = 0
+
+    def meta(self):
+        return dict(self._meta)
+
+    def _load_chunk(self):
+        if self._chunk_idx >= len(self.chunks):
+            raise EOFError(f"End of recording {self.path}")
+        with np.load(os.path.join(self.path, self.chunks[self._chunk_idx])) as z:
+            self._chunk = {k: z[k] for k in z.files}
+        self._chunk_idx += 1
+        self._row = 0
+
+    def _next(self):
+        if self._chunk is None or self._row >= len(self._chunk['frame_no']):
+            self._load_chunk()
+        c, i = self._chunk, self._row
+        self._row += 1
+        return (int(c['frame_no'][i]), float(c['timestamp'][i]),
+                c['color'][i], c['depth'][i])
+
+
+class SyntheticSource(_PacedSource):
+    """A ball of one of the three trained colours rolling in front of the camera.
+    Depth is a tilted floor plane plus the ball at its current distance."""
+
+    BALL_BGR = {0: (60, 180, 40), 1: (180, 80, 230), 2: (40, 220, 240)}
+
+    def __init__(self, frames=None, realtime=True, cls_id=0, seed=0, fps=30):
+        super().__init__(realtime)
+        self.frames = frames
+        self.cls_id = cls_id
+        self.fps = fps
+        self.rng = np.random.default_rng(seed)
+        self.frame_no = 0
+        h, w = self.height, self.width
+        yy = np.arange(h, dtype=np.float32)[:, None]
+        floor_m = np.clip(4.0 - 3.2 * yy / h, 0.3, 4.0) * np.ones((1, w), np.float32)
+        self._floor_depth = (floor_m / self.depth_scale).astype(np.uint16)
+        noise = self.rng.integers(0, 40, (h, w, 1), dtype=np.uint8)
+        self._background = (np.array([90, 100, 110], np.uint8) + noise).astype(np.uint8)
+
+    def ball_state(self, k):
+        """Ground-truth (x, y, radius_px, distance_m) of frame k."""
+        t = k / self.fps
+        distance = 1.2 + 0.8 * np.sin(2 * np.pi * t / 8.0)
+        x = self.width / 2 + 0.35 * self.width * np.sin(2 * np.pi * t / 5.0)
+        y = self.height / 2 + 40 * np.sin(2 * np.pi * t / 3.0)
+        radius = 0.065 * 385.0 / distance  # 6.5 cm ball, ~385 px focal length
+        return x, y, radius, distance
+
+    def _next(self):
+        import cv2
+        if self.frames is not None and self.frame_no >= self.frames:
+            raise EOFError("End of synthetic sequence")
+        self.frame_no += 1
+        x, y, r, d = self.ball_state(self.frame_no)
+        color = self._background.copy()
+        center = (int(round(x)), int(round(y)))
+        cv2.circle(color, center, int(round(r)), self.BALL_BGR[self.cls_id], -1, cv2.LINE_AA)
+        depth = self._floor_depth.copy()
+        cv2.circle(depth, center, int(round(r)), int(d / self.depth_scale), -1)
+        return self.frame_no, self.frame_no * 1000.0 / self.fps, color, depth
+
+
+class Recorder:
+    """Writes prepared packets to a recording directory from a background thread.
+    record() never blocks: when the writer falls behind, frames are dropped and counted."""
+
+    def __init__(self, path, meta, chunk_frames=CHUNK_FRAMES, max_pending=90):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = dict(meta)
+        self.chunk_frames = chunk_frames
+        self.frames = 0
+        self.chunks = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        self._write_meta()
+        self._thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, pkt):
+        if self._queue.full():  # dropped anyway: skip the copies
+            self.dropped += 1
+            return
+        item = (pkt.frame_no, getattr(pkt, 'timestamp', pkt.t_capture * 1000.0),
+                np.array(pkt.color_image, copy=True), np.array(pkt.depth_image, copy=True))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = dict(self.meta, frames=self.frames, chunks=self.chunks, dropped=self.dropped)
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        frame_no, ts, color, depth = zip(*batch)
+        name = os.path.join(self.path, f'chunk_{self.chunks:05d}.npz')
+        np.savez_compressed(name, frame_no=np.array(frame_no, np.int64),
+                            timestamp=np.array(ts, np.float64),
+                            color=np.stack(color), depth=np.stack(depth))
+        self.chunks += 1
+        self.frames += len(batch)
+        batch.clear()
+        self._write_meta()
+
+    def _run(self):
+        batch = []
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._flush(batch)
+                return
+            batch.append(item)
+            if len(batch) >= self.chunk_frames:
+                self._flush(batch)
+
+
+def add_source_args(parser):
+    parser.add_argument('--source', default='live',
+                        help="'live', 'synthetic', or a recording directory to replay")
+    parser.add_argument('--fast', action='store_true',
+                        help='replay/synthetic as fast as possible instead of real-time')
+    parser.add_argument('--frames', type=int, default=None, help='synthetic sequence length')
+    parser.add_argument('--record', default=None, metavar='DIR',
+                        help='record the prepared color/depth frames to DIR')
+    parser.add_argument('--depth-mode', choices=['align', 'roi'], default='align',
+                        help="'align': rs.align every frame; 'roi': map only the box patch")
+
+
+def open_source(args):
+    if args.source == 'live':
+        return RealSenseSource(align=getattr(args, 'depth_mode', 'align') == 'align')
+    if args.source == 'synthetic':
+        return SyntheticSource(frames=args.frames, realtime=not args.fast)
+    return RecordedSource(args.source, realtime=not args.fast)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Adaptive input resolution for the ONNX detector
+One fixed-size export per input size (export_models.py --imgsz 320x256,480x384,640x480).
+ResolutionPolicy picks the smallest size at which the last box still covers
+`min_box_px` input pixels; a lost or distant target goes back to the largest size.
+Going up is immediate, going down needs `margin` headroom for `hold` consecutive
+frames, so the size does not flap around the threshold.
+
+    det = MultiResDetector(['m_320x256_fp32.onnx', 'm_480x384_fp32.onnx', 'm_640x480_fp32.onnx'])
+    detection = det.detect(color_image, classes)   # same format as OnnxDetector.top
+    det.observe_distance(distance)                 # from the control stage
+"""
+import time
+
+from control_loop import Histogram
+from onnx_detector import OnnxDetector, top_detection
+
+LATENCY_EDGES_MS = [5, 10, 15, 20, 30, 40, 60, 80, 120, 200]
+
+
+def size_label(size):
+    h, w = size
+    return f"{w}x{h}"
+
+
+class ResolutionPolicy:
+    """sizes: (h, w) input shapes; the choice is an index into them, smallest first."""
+
+    def __init__(self, sizes, min_box_px=24, margin=1.5, hold=10, far_distance=2.0, log=print):
+        self.sizes = sorted(sizes, key=lambda s: s[0] * s[1])
+        self.min_box_px = min_box_px
+        self.margin = margin
+        self.hold = hold
+        self.far_distance = far_distance
+        self.log = log
+        self.current = len(self.sizes) - 1  # start at full resolution (searching)
+        self._down_streak = 0
+        self.switches = []                  # (time, from, to, reason)
+
+    def scale(self, index, image_shape):
+        h, w = self.sizes[index]
+        return min(h / image_shape[0], w / image_shape[1])
+
+    def wanted(self, box, image_shape, factor=1.0):
+        """Smallest size index where the box's short side is >= min_box_px * factor."""
+        side = min(box[2] - box[0], box[3] - box[1])
+        for i in range(len(self.sizes)):
+            if side * self.scale(i, image_shape) >= self.min_box_px * factor:
+                return i
+        return len(self.sizes) - 1
+
+    def update(self, box, image_shape, distance=None):
+        """Feed the last detection (xyxy in image pixels, or None); returns the next size."""
+        largest = len(self.sizes) - 1
+        if box is None:
+            target, reason = largest, 'lost'
+        elif distance is not None and distance > self.far_distance:
+            target, reason = largest, f'far {distance:.2f}m'
+        else:
+            target = self.wanted(box, image_shape)
+            reason = f"box {min(box[2] - box[0], box[3] - box[1]):.0f}px"
+            if target < self.current:
+                # only step down once there is headroom at the smaller size, held for a while
+                if self.wanted(box, image_shape, self.margin) <= target:
+                    self._down_streak += 1
+                else:
+                    self._down_streak = 0
+                if self._down_streak < self.hold:
+                    return self.sizes[self.current]
+
+        if target != self.current:
+            self._switch(target, reason)
+        self._down_streak = 0
+        return self.sizes[self.current]
+
+    def _switch(self, target, reason):
+        before, self.current = self.current, target
+        self.switches.append((time.monotonic(), before, target, reason))
+        if self.log:
+            self.log(f"input {size_label(self.sizes[before])} -> {size_label(self.sizes[target])} ({reason})")
+
+
+class MultiResDetector:
+    """One OnnxDetector per export, selected by a ResolutionPolicy on every call."""
+
+    def __init__(self, paths, policy=None, warmup=3, **detector_kwargs):
+        detectors = [OnnxDetector(p, **detector_kwargs) for p in paths]
+        by_size = {(d.in_h, d.in_w): d for d in detectors}
+        if len(by_size) != len(detectors):
+            raise ValueError("each model must have a different input size")
+        for d in detectors:
+            d.warmup(warmup)
+        self.policy = policy or ResolutionPolicy(list(by_size))
+        self.detectors = [by_size[s] for s in self.policy.sizes]
+        self.latency = [Histogram(LATENCY_EDGES_MS) for _ in self.detectors]
+        self.distance = None
+
+    def observe_distance(self, distance):
+        self.distance = distance
+
+    def detect(self, image, classes=None, imgsz=None):
+        """(xyxy, conf, cls_id) or None, like OnnxDetector.top; imgsz is ignored."""
+        i = self.policy.current
+        t0 = time.perf_counter()
+        detection = top_detection(self.detectors[i].detect(image, classes))
+        self.latency[i].add((time.perf_counter() - t0) * 1000.0)
+        self.policy.update(detection[0] if detection is not None else None, image.shape, self.distance)
+        return detection
+
+    def format_stats(self):
+        lines = [f"input size switches: {len(self.policy.switches)}, "
+                 f"current {size_label(self.policy.sizes[self.policy.current])}"]
+        for size, hist in zip(self.policy.sizes, self.latency):
+            lines.append(f"  {size_label(size):>8s}: n={hist.n:6d} mean={hist.mean():6.2f} ms"
+                         + (f" max={hist.max:6.2f} ms" if hist.n else ""))
+        return '\n'.join(lines)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Laptop viewer for robot ball tracker
+Displays MJPEG stream and buttons to change target
+Reader thread: parses multipart parts by Content-Length into a reused buffer.
+Decode thread: decodes only the newest JPEG (older ones are dropped).
+Tk main loop: picks up the decoded image with after() - no Tk calls from threads.
+Target buttons POST /target to the tracker over one kept-alive connection and show the
+click-to-effect latency from the acknowledgement (frame the switch was applied on);
+SSH + target.txt is only used if the tracker does not answer.
+Usage: python laptop_viewer.py <robot_ip>
+"""
+import sys
+import json
+import http.client
+import tkinter as tk
+import urllib.request
+import threading
+import time
+from PIL import Image, ImageTk
+import io
+import paramiko
+
+# Robot connection - change this to your robot's IP
+ROBOT_IP = sys.argv[1] if len(sys.argv) > 1 else "192.168.123.18"
+ROBOT_USER = "unitree"
+ROBOT_PASS = "123"
+TARGET_FILE = "/home/unitree/depth_test/target.txt"
+STREAM_PORT = 8080
+STREAM_URL = f"http://{ROBOT_IP}:{STREAM_PORT}"
+REFRESH_MS = 15
+
+
+class MjpegReader:
+    """multipart/x-mixed-replace parts from a file-like HTTP response.
+    Uses the part's Content-Length and reads straight into a bytearray; parts without
+    a length fall back to scanning for the JPEG end marker from where the last scan stopped.
+    Bytes read past that marker (the next boundary and headers) wait in `pending`."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = bytearray(256 * 1024)
+        self.pending = bytearray()
+
+    def _readline(self):
+        if self.pending:
+            end = self.pending.find(b'\n')
+            if end != -1:
+                line = bytes(self.pending[:end + 1])
+                del self.pending[:end + 1]
+                return line
+            line = bytes(self.pending) + self.stream.readline()
+            self.pending.clear()
+            return line
+        return self.stream.readline()
+
+    def _headers(self):
+        headers = {}
+        while True:
+            line = self._readline()
+            if not line:
+                raise EOFError("stream closed")
+            line = line.strip()
+            if not line:
+                if headers:
+                    return headers
+                continue  # blank line between parts
+            if line.startswith(b'--'):
+                continue  # boundary
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+    def _read_exact(self, n):
+        if len(self.buf) < n:
+            self.buf = bytearray(n * 2)
+        view = memoryview(self.buf)
+        got = min(len(self.pending), n)
+        if got:
+            view[:got] = self.pending[:got]
+            del self.pending[:got]
+        while got < n:
+            k = self.stream.readinto(view[got:n])
+            if not k:
+                raise EOFError("stream closed")
+            got += k
+        return view[:n]
+
+    def _read_until_eoi(self):
+        data, self.pending = self.pending, bytearray()
+        scanned = 0
+        while True:
+            end = data.find(b'\xff\xd9', max(0, scanned - 1))
+            if end != -1:
+                self.pending = data[end + 2:]
+                return memoryview(data)[:end + 2]
+            scanned = len(data)
+            chunk = self.stream.read1(16384) if hasattr(self.stream, 'read1') else self.stream.read(4096)
+            if not chunk:
+                raise EOFError("stream closed")
+            data += chunk
+
+    def next_part(self):
+        """(headers dict, memoryview of the JPEG). The view is only valid until the next call."""
+        headers = self._headers()
+        length = headers.get('content-length')
+        if length is not None:
+            return headers, self._read_exact(int(length))
+        return headers, self._read_until_eoi()
+
+
+class TargetClient:
+    """POST /target over one persistent HTTP connection, reconnecting once if it dropped."""
+
+    def __init__(self, host, port=STREAM_PORT, timeout=3):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _post(self, body):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        self.conn.request('POST', '/target', body, {'Content-Type': 'application/json'})
+        resp = self.conn.getresponse()
+        data = resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {data.decode(errors='replace')}")
+        return json.loads(data)
+
+    def set(self, target):
+        """(ack dict, round trip ms). The ack arrives after the tracker applied the target."""
+        body = json.dumps({'target': target})
+        with self.lock:
+            t0 = time.perf_counter()
+            try:
+                ack = self._post(body)
+            except (OSError, http.client.HTTPException):
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                t0 = time.perf_counter()
+                ack = self._post(body)
+            return ack, (time.perf_counter() - t0) * 1000.0
+
+
+class BallTrackerViewer:
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title(f"Ball Tracker - {ROBOT_IP}")
+        self.root.configure(bg='#2b2b2b')
+
+        self.video_label = tk.Label(self.root, bg='black', width=640, height=480)
+        self.video_label.pack(padx=10, pady=10)
+
+        self.status_var = tk.StringVar(value="Connecting...")
+        tk.Label(self.root, textvariable=self.status_var, font=('Arial', 12),
+                 fg='white', bg='#2b2b2b').pack(pady=5)
+
+        btn_frame = tk.Frame(self.root, bg='#2b2b2b')
+        btn_frame.pack(pady=10)
+
+        tk.Label(btn_frame, text="Target:", font=('Arial', 12, 'bold'),
+                 fg='white', bg='#2b2b2b').pack(side=tk.LEFT, padx=5)
+
+        for text, color, target in [('ALL', '#888888', 'all'), ('GREEN', '#00ff00', 'green'),
+                                     ('PINK', '#ff00ff', 'pink'), ('YELLOW', '#ffff00', 'yellow')]:
+            tk.Button(btn_frame, text=text, width=8, font=('Arial', 11, 'bold'),
+                     bg=color, command=lambda t=target: self.set_target(t)).pack(side=tk.LEFT, padx=5)
+
+        self.target_var = tk.StringVar(value="Current: all")
+        tk.Label(self.root, textvariable=self.target_var, font=('Arial', 14, 'bold'),
+                 fg='#00ff00', bg='#2b2b2b').pack(pady=10)
+
+        # reader -> decoder: newest JPEG only; decoder -> Tk: newest decoded image only
+        self.jpeg_lock = threading.Lock()
+        self.jpeg_ready = threading.Event()
+        self.latest_jpeg = None
+        self.image_lock = threading.Lock()
+        self.latest_image = None
+        self.connection_status = "Connecting..."
+        self.received = 0
+        self.dropped = 0
+        self.decoded = 0
+        self.decode_time = 0.0
+        self.shown = 0
+        self.stats_start = time.monotonic()
+
+        self.target_client = TargetClient(ROBOT_IP)
+        self.target_result = None     # (target var text, status text) from the sender thread
+        self.target_latencies = []
+        self.message_until = 0.0
+
+        self.running = True
+        threading.Thread(target=self.stream_video, daemon=True).start()
+        threading.Thread(target=self.decode_worker, daemon=True).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(REFRESH_MS, self.refresh)
+
+    def set_target(self, target):
+        threading.Thread(target=self.send_target, args=(target,), daemon=True).start()
+
+    def send_target(self, target):
+        try:
+            ack, rtt = self.target_client.set(target)
+            if ack.get('frame') is None:
+                raise RuntimeError("tracker did not apply the target")
+            self.target_latencies.append(rtt)
+            self.target_result = (f"Current: {target}",
+                                  f"Target {target} on frame {ack['frame']}: {rtt:.0f} ms click-to-effect")
+        except Exception as e:
+            self.target_result = self.set_target_ssh(target, e)
+
+    def set_target_ssh(self, target, reason):
+        """Fallback: write target.txt over SSH (the tracker polls it every 0.5 s)."""
+        try:
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(ROBOT_IP, username=ROBOT_USER, password=ROBOT_PASS, timeout=5)
+            ssh.exec_command(f"echo '{target}' > {TARGET_FILE}")
+            ssh.close()
+            return f"Current: {target}", f"Target set to: {target} (via SSH; API: {reason})"
+        except Exception as e:
+            return None, f"SSH Error: {e}"
+
+    def stream_video(self):
+        while self.running:
+            try:
+                stream = urllib.request.urlopen(STREAM_URL, timeout=5)
+                reader = MjpegReader(stream)
+                self.connection_status = "Connected"
+                while self.running:
+                    _, jpeg = reader.next_part()
+                    data = bytes(jpeg)  # the reader's buffer is reused for the next part
+                    with self.jpeg_lock:
+                        if self.latest_jpeg is not None:
+                            self.dropped += 1
+                        self.latest_jpeg = data
+                        self.received += 1
+                    self.jpeg_ready.set()
+            except Exception as e:
+                self.connection_status = f"Connecting... {e}"
+                time.sleep(2)
+
+    def decode_worker(self):
+        while self.running:
+            if not self.jpeg_ready.wait(0.5):
+                continue
+            self.jpeg_ready.clear()
+            with self.jpeg_lock:
+                data, self.latest_jpeg = self.latest_jpeg, None
+            if data is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                img = Image.open(io.BytesIO(data))
+                img.load()
+            except Exception:
+                continue
+            self.decode_time += time.perf_counter() - t0
+            self.decoded += 1
+            with self.image_lock:
+                self.latest_image = img
+
+    def refresh(self):
+        """Runs on the Tk main loop: show the newest decoded frame and the stream stats."""
+        if not self.running:
+            return
+        if self.target_result is not None:
+            target_text, status_text = self.target_result
+            self.target_result = None
+            if target_text is not None:
+                self.target_var.set(target_text)
+            self.status_var.set(status_text)
+            self.message_until = time.monotonic() + 2.0
+        with self.image_lock:
+            img, self.latest_image = self.latest_image, None
+        if img is not None:
+            photo = ImageTk.PhotoImage(img)
+            self.video_label.configure(image=photo)
+            self.video_label.image = photo
+            self.shown += 1
+
+        elapsed = time.monotonic() - self.stats_start
+        if elapsed >= 1.0:
+            with self.jpeg_lock:
+                received, dropped = self.received, self.dropped
+                self.received = self.dropped = 0
+            decode_ms = 1000.0 * self.decode_time / self.decoded if self.decoded else 0.0
+            if time.monotonic() < self.message_until:
+                pass  # keep the target message up
+            elif self.connection_status == "Connected":
+                self.status_var.set(f"Connected | {received / elapsed:.1f} fps received, "
+                                    f"{self.shown / elapsed:.1f} shown, decode {decode_ms:.1f} ms, "
+                                    f"{dropped} dropped")
+            else:
+                self.status_var.set(self.connection_status)
+            self.decoded = self.shown = 0
+            self.decode_time = 0.0
+            self.stats_start = time.monotonic()
+        self.root.after(REFRESH_MS, self.refresh)
+
+    def on_close(self):
+        self.running = False
+        if self.target_latencies:
+            lat = sorted(self.target_latencies)
+            print(f"Target switches: {len(lat)}, click-to-effect mean={sum(lat) / len(lat):.0f} ms "
+                  f"median={lat[len(lat) // 2]:.0f} ms max={lat[-1]:.0f} ms")
+        self.root.destroy()
+
+    def run(self):
+        self.root.mainloop()
+
+if __name__ == "__main__":
+    print(f"Connecting to {ROBOT_IP}...")
+    BallTrackerViewer().run()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Glass-to-motion latency tracing
+Every frame carries a FrameTrace of CLOCK_MONOTONIC marks (glass, capture, align,
+inference, depth, fsm, publish). The command record carries the frame id and its glass
+time to file_control.py, which adds read (command consumed), move_start and move_end
+(client.Move returned). LatencyTracer keeps the last `window` samples of every interval
+between consecutive marks plus the end-to-end span, and reports p50/p95/p99 as a table
+or in Prometheus text format (/metrics).
+
+    trace = FrameTrace(pkt.frame_no, glass_time(pkt))
+    trace.mark('inference')
+    ...
+    tracer.add(trace)
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def glass_time(pkt):
+    """Best CLOCK_MONOTONIC estimate of when the frame was exposed. RealSense timestamps
+    are system-clock ms (global time); other sources fall back to the capture time."""
+    now_wall, now = time.time(), time.monotonic()
+    age = now_wall - getattr(pkt, 'timestamp', 0.0) / 1000.0
+    if 0.0 <= age < 0.5:
+        return min(now - age, pkt.t_capture)
+    return pkt.t_capture
+
+
+class FrameTrace:
+    def __init__(self, frame_id, t_glass):
+        self.frame_id = frame_id
+        self.marks = [('glass', t_glass)]
+
+    def mark(self, stage, t=None):
+        self.marks.append((stage, time.monotonic() if t is None else t))
+
+    @property
+    def t_glass(self):
+        return self.marks[0][1]
+
+
+class LatencySeries:
+    """Ring of the last `window` samples (ms)."""
+
+    def __init__(self, window):
+        self.samples = [0.0] * window
+        self.n = 0
+
+    def add(self, ms):
+        self.samples[self.n % len(self.samples)] = ms
+        self.n += 1
+
+    def quantiles(self, qs=QUANTILES):
+        values = sorted(self.samples[:min(self.n, len(self.samples))])
+        if not values:
+            return [float('nan')] * len(qs)
+        return [values[min(len(values) - 1, int(q * len(values)))] for q in qs]
+
+    def max(self):
+        return max(self.samples[:min(self.n, len(self.samples))], default=float('nan'))
+
+
+class LatencyTracer:
+    """Per-stage and end-to-end latency. add() is cheap (a few list writes under a lock);
+    percentiles are only computed when a report is requested."""
+
+    def __init__(self, name, window=4096, end_to_end='glass_to_publish'):
+        self.name = name
+        self.window = window
+        self.end_to_end = end_to_end
+        self.series = {}
+        self.order = []
+        self._lock = threading.Lock()
+
+    def add_interval(self, stage, ms):
+        with self._lock:
+            series = self.series.get(stage)
+            if series is None:
+                series = self.series[stage] = LatencySeries(self.window)
+                self.order.append(stage)
+            series.add(ms)
+
+    def add(self, trace):
+        """Intervals between consecutive marks, named after the later mark, plus end to end."""
+        prev = trace.marks[0][1]
+        for stage, t in trace.marks[1:]:
+            self.add_interval(stage, (t - prev) * 1000.0)
+            prev = t
+        self.add_interval(self.end_to_end, (prev - trace.t_glass) * 1000.0)
+
+    def rows(self):
+        with self._lock:
+            return [(stage, self.series[stage].n, *self.series[stage].quantiles(),
+                     self.series[stage].max()) for stage in self.order]
+
+    def format(self):
+        lines = [f"{self.name} latency (ms, last {self.window} samples)",
+                 f"  {'stage':>18s} {'n':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}"]
+        for stage, n, p50, p95, p99, mx in self.rows():
+            lines.append(f"  {stage:>18s} {n:8d} {p50:8.2f} {p95:8.2f} {p99:8.2f} {mx:8.2f}")
+        return '\n'.join(lines)
+
+    def prometheus(self):
+        lines = ["# TYPE bolt_latency_ms summary"]
+        for stage, n, *qs, mx in self.rows():
+            labels = f'process="{self.name}",stage="{stage}"'
+            for q, v in zip(QUANTILES, qs):
+                lines.append(f'bolt_latency_ms{{{labels},quantile="{q}"}} {v:.3f}')
+            lines.append(f'bolt_latency_ms_count{{{labels}}} {n}')
+            lines.append(f'bolt_latency_ms_max{{{labels}}} {mx:.3f}')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.tracer.prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4')
+        self.send_header('Content-length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): pass
+
+
+def serve_metrics(tracer, port):
+    """GET /metrics for processes without the stream server (file_control.py)."""
+    server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+    server.daemon_threads = True
+    server.tracer = tracer
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
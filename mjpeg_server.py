@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Encode-once MJPEG broadcast server for the trackers
+The tracker hands frames to FrameBroadcaster.publish() (a reference swap, no encode).
+One encoder thread draws the overlay (render callback), JPEG-encodes the newest frame
+once and builds the complete multipart part; every client thread waits on the frame
+version and sends those same bytes. A slow client simply gets the newest part when its
+socket drains (TCP_NOTSENT_LOWAT) - intermediate frames are skipped, nothing queues up.
+wants_frame() is False while nobody watches and between stream ticks (max_fps), so the
+tracker only copies a frame when it will actually be shown.
+
+Per-frame detections go out separately as JSON (stream.events), for viewers that draw
+overlays themselves:
+    GET /            MJPEG stream (also /stream)
+    GET /events      server-sent events, one `data: {json}` per frame (newest only)
+    GET /detections  latest JSON object
+    GET /<page>      text from a callback registered in `pages` (e.g. /metrics)
+    POST /<action>   JSON body to a callback registered in `actions` (e.g. /target);
+                     keep-alive, so a client can reuse one connection
+
+    stream = FrameBroadcaster(render=draw_overlay)
+    server = start_stream_server(stream, port=8080)
+    stream.events.publish(state)                 # every frame, cheap
+    if stream.wants_frame():
+        stream.publish(image.copy(), state)      # rendered + encoded off the loop
+"""
+import json
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from control_loop import Histogram
+
+BOUNDARY = b'frame'
+STREAM_LOWAT = 16 * 1024  # a viewer's socket counts as writable below this many unsent bytes
+ENCODE_EDGES_MS = [1, 2, 3, 5, 8, 12, 20, 30, 50]
+
+
+class EventBroadcaster:
+    """Latest-value JSON channel; subscribers wait on the version like the MJPEG clients."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.state = None
+        self.version = 0
+        self.clients = 0
+        self.running = True
+
+    def publish(self, state):
+        with self._cond:
+            self.state = state
+            self.version += 1
+            if self.clients:
+                self._cond.notify_all()
+
+    def wait(self, last_version, timeout=1.0):
+        """(version, json text) newer than last_version, or (last_version, None)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.version != last_version or not self.running, timeout):
+                return last_version, None
+            return self.version, json.dumps(self.state)
+
+    def latest(self):
+        with self._cond:
+            return json.dumps(self.state)
+
+    def subscribe(self):
+        with self._cond:
+            self.clients += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self.clients -= 1
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+
+class FrameBroadcaster:
+    def __init__(self, quality=70, max_fps=None, render=None):
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.render = render    # render(image, overlay) -> image, on the encoder thread
+        self.events = EventBroadcaster()
+        self._last_publish = 0.0
+        self._raw = None
+        self._raw_overlay = None
+        self._raw_stamp = 0.0
+        self._raw_lock = threading.Lock()
+        self._raw_ready = threading.Event()
+        self._cond = threading.Condition()
+        self.part = None        # b'--frame\r\n<headers>\r\n\r\n<jpeg>\r\n' of the newest frame
+        self.version = 0
+        self.clients = 0
+        self.encoded = 0
+        self.encode_ms = Histogram(ENCODE_EDGES_MS)
+        self.running = True
+        self._thread = threading.Thread(target=self._encode_loop, name='mjpeg-encode', daemon=True)
+        self._thread.start()
+
+    def wants_frame(self):
+        """True if a viewer is connected and the next stream tick is due."""
+        return self.clients > 0 and time.monotonic() - self._last_publish >= self.min_interval
+
+    def publish(self, image, overlay=None):
+        """Hand over the newest frame. The caller must not modify `image` afterwards."""
+        now = time.monotonic()
+        with self._raw_lock:
+            self._raw = image
+            self._raw_overlay = overlay
+            self._raw_stamp = self._last_publish = now
+        self._raw_ready.set()
+
+    def _encode_loop(self):
+        while self.running:
+            if not self._raw_ready.wait(0.5):
+                continue
+            self._raw_ready.clear()
+            with self._raw_lock:
+                image, overlay, stamp = self._raw, self._raw_overlay, self._raw_stamp
+                self._raw = self._raw_overlay = None
+            if image is None or self.clients == 0:
+                continue
+            t0 = time.perf_counter()
+            if self.render is not None and overlay is not None:
+                image = self.render(image, overlay)
+            ok, jpeg = cv2.imencode('.jpg', image, self.params)
+            if not ok:
+                continue
+            self.encode_ms.add((time.perf_counter() - t0) * 1000.0)
+            data = jpeg.tobytes()
+            with self._cond:
+                self.version += 1
+                header = (f"--{BOUNDARY.decode()}\r\nContent-Type: image/jpeg\r\n"
+                          f"Content-Length: {len(data)}\r\nX-Frame: {self.version}\r\n"
+                          f"X-Timestamp: {stamp:.6f}\r\n\r\n").encode()
+                self.part = header + data + b'\r\n'
+                self.encoded += 1
+                self._cond.notify_all()
+
+    def wait_part(self, last_version, timeout=1.0):
+        """(version, part) newer than last_version, or (last_version, None) on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.version != last_version or not self.running, timeout):
+                return last_version, None
+            return self.version, self.part
+
+    def latest_part(self):
+        with self._cond:
+            return self.version, self.part
+
+    def subscribe(self):
+        with self._cond:
+            self.clients += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self.clients -= 1
+
+    def stop(self):
+        self.running = False
+        self.events.stop()
+        self._raw_ready.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def format_stats(self):
+        return (f"stream: clients={self.clients} event clients={self.events.clients} "
+                f"encoded={self.encoded} render+encode mean={self.encode_ms.mean():.2f} ms")
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive for the JSON/POST requests
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path in ('/', '/stream'):
+            self.send_stream()
+        elif path == '/events':
+            self.send_events()
+        elif path == '/detections':
+            self.send_json(200, self.server.stream.events.latest())
+        elif path in self.server.pages:
+            content_type, text = self.server.pages[path]()
+            body = text.encode()
+            self.send_response(200)
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-length', len(body))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        action = self.server.actions.get(self.path.split('?')[0])
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self.close_connection = True  # the body cannot be skipped, so the connection ends
+            self.send_json(400, json.dumps({'error': 'bad Content-Length'}))
+            return
+        body = self.rfile.read(length) if length else b''
+        if action is None:
+            self.send_json(404, json.dumps({'error': 'unknown action'}))
+            return
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise ValueError('body must be a JSON object')
+            reply = action(payload)
+        except (ValueError, KeyError) as e:
+            self.send_json(400, json.dumps({'error': str(e)}))
+            return
+        self.send_json(200, json.dumps(reply))
+
+    def send_json(self, code, text):
+        body = text.encode()
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_streaming_headers(self, content_type):
+        """Open-ended responses: no length, so the connection closes when they end."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+    def send_stream(self):
+        """Write only once the viewer's unsent bytes drop below STREAM_LOWAT, and then the
+        newest part, so a slow viewer skips frames instead of queueing them in the kernel."""
+        stream = self.server.stream
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, STREAM_LOWAT)
+        self.send_streaming_headers(f'multipart/x-mixed-replace; boundary={BOUNDARY.decode()}')
+        stream.subscribe()
+        version = 0
+        try:
+            while stream.running:
+                version, part = stream.wait_part(version)
+                if part is None:
+                    continue
+                if not select.select([], [self.connection], [], 1.0)[1]:
+                    continue
+                version, part = stream.latest_part()
+                self.wfile.write(part)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream.unsubscribe()
+
+    def send_events(self):
+        events = self.server.stream.events
+        self.send_streaming_headers('text/event-stream')
+        events.subscribe()
+        version = 0
+        try:
+            while events.running:
+                version, text = events.wait(version)
+                if text is not None:
+                    self.wfile.write(f"id: {version}\ndata: {text}\n\n".encode())
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            events.unsubscribe()
+
+    def log_message(self, format, *args): pass
+
+
+class StreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, stream, port=8080, handler=StreamHandler, actions=None, pages=None):
+        self.stream = stream
+        self.actions = actions or {}   # '/path' -> callable(request dict) -> reply dict
+        self.pages = pages or {}       # '/path' -> callable() -> (content type, text)
+        super().__init__(('0.0.0.0', port), handler)
+
+
+def start_stream_server(stream, port=8080, handler=StreamHandler, actions=None, pages=None):
+    """StreamServer serving in a daemon thread; server.shutdown() stops it."""
+    server = StreamServer(stream, port, handler, actions, pages)
+    threading.Thread(target=server.serve_forever, name='mjpeg-server', daemon=True).start()
+    return server
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Remote inference offload: the tracker sends JPEG color frames to an inference server
+on another host (the laptop running the viewer) over a persistent TCP connection and
+gets the boxes back; depth, the FSM and the command path stay on the robot.
+The server batches frames from several connected robots into one model call (up to
+--max-batch, waiting at most --max-wait-ms for a batch to fill; a single-batch ONNX
+export runs them one after another, see yolo_models.py --dynamic).
+The client keeps the on-device detector loading in the background and switches to it when
+the round trip exceeds its budget (`patience` times in a row), the server is unreachable
+or a reply times out; it tries the server again after `retry_s`.
+
+Server (laptop):
+    python3 offload.py --model onnx:final_best_dynamic.onnx [--port 8090] [--max-batch 4]
+Tracker:
+    python3 test_coloured_model.py --backend onnx --offload LAPTOP_IP[:8090] [--offload-budget 60]
+In code:
+    det = OffloadDetector('192.168.123.20', model='final_best_dynamic.onnx',
+                          local=lambda: load_detector('onnx', 'final_best.onnx'))
+    detection = det.detect(color_image, classes)        # (xyxy, conf, cls_id) or None
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detections import DET_DTYPE, top_detection
+from detector_daemon import ALL_CLASSES, BAD_REQUEST, REPLY, ResidentModel, recv_exact
+from latency_trace import LatencySeries
+
+OFFLOAD_PORT = 8090
+
+# request: seq | JPEG bytes | number of class ids (ALL_CLASSES = no filter), then int16 ids, JPEG
+_REQUEST = struct.Struct('<IIH')
+MAX_JPEG_BYTES = 8 * 1024 * 1024  # larger requests are rejected (BAD_REQUEST) and the connection closed
+MAX_CLASS_IDS = 256
+
+
+class _Job:
+    __slots__ = ('image', 'classes', 't_queued', 'result', 'done')
+
+    def __init__(self, image, classes):
+        self.image = image
+        self.classes = classes
+        self.t_queued = time.perf_counter()
+        self.result = None
+        self.done = threading.Event()
+
+
+class Batcher:
+    """Collects jobs from all connections and runs them through the model in batches."""
+
+    def __init__(self, model, max_batch=4, max_wait=0.003):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.jobs = queue.Queue()
+        self.batches = 0
+        self.frames = 0
+        self.infer_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name=f'batcher-{model.name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, image, classes):
+        """Blocks until the batch containing this frame ran; (dets, infer ms, queue ms)."""
+        job = _Job(image, classes)
+        self.jobs.put(job)
+        job.done.wait()
+        return job.result
+
+    def _run(self):
+        while True:
+            batch = [self.jobs.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            t0 = time.perf_counter()
+            try:
+                results = self.model.detect_batch([j.image for j in batch], [j.classes for j in batch])
+            except Exception as e:
+                print(f"✗ inference error: {e}")
+                results = [np.empty(0, DET_DTYPE)] * len(batch)
+            infer_ms = (time.perf_counter() - t0) * 1000.0
+            self.batches += 1
+            self.frames += len(batch)
+            self.infer_ms += infer_ms
+            for job, dets in zip(batch, results):
+                job.result = (dets, infer_ms, (t0 - job.t_queued) * 1000.0)
+                job.done.set()
+
+    def format_stats(self):
+        if not self.batches:
+            return f"{self.model.name}: idle"
+        return (f"{self.model.name}: {self.frames} frames in {self.batches} batches "
+                f"(mean {self.frames / self.batches:.2f}), {self.infer_ms / self.batches:.1f} ms per batch")
+
+
+class _OffloadHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        f = sock.makefile('rb')
+        hello = json.loads(f.readline() or '{}')
+        batcher = self.server.batchers.get(hello.get('model'))
+        if batcher is None:
+            sock.sendall((json.dumps({'ok': False, 'error': f"model '{hello.get('model')}' not loaded "
+                                      f"(have: {', '.join(self.server.batchers)})"}) + '\n').encode())
+            return
+        sock.sendall((json.dumps({'ok': True, 'model': batcher.model.name}) + '\n').encode())
+        client = hello.get('client', self.client_address[0])
+        print(f"✓ {client} connected -> {batcher.model.name}")
+        try:
+            while True:
+                header = f.read(_REQUEST.size)
+                if len(header) < _REQUEST.size:
+                    break
+                seq, size, n_cls = _REQUEST.unpack(header)
+                if size > MAX_JPEG_BYTES or (n_cls != ALL_CLASSES and n_cls > MAX_CLASS_IDS):
+                    # the body cannot be skipped safely, so the connection ends here
+                    sock.sendall(REPLY.pack(seq, BAD_REQUEST, 0.0, 0.0))
+                    print(f"✗ {client}: rejected request {seq} ({size} bytes, {n_cls} class ids)")
+                    break
+                classes = None
+                if n_cls != ALL_CLASSES:
+                    classes = [int(c) for c in np.frombuffer(f.read(2 * n_cls), '<i2')]
+                jpeg = f.read(size)
+                if len(jpeg) < size:
+                    break
+                # decoded on the connection thread, so robots decode in parallel
+                image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    dets, infer_ms, queue_ms = np.empty(0, DET_DTYPE), 0.0, 0.0
+                else:
+                    dets, infer_ms, queue_ms = batcher.submit(image, classes)
+                sock.sendall(REPLY.pack(seq, len(dets), infer_ms, queue_ms)
+                             + dets.astype(DET_DTYPE, copy=False).tobytes())
+        except OSError:
+            pass
+        print(f"{client} disconnected")
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, models, port=OFFLOAD_PORT, max_batch=4, max_wait=0.003, host='0.0.0.0'):
+        super().__init__((host, port), _OffloadHandler)
+        self.batchers = {m.name: Batcher(m, max_batch, max_wait) for m in models}
+
+    def format_stats(self):
+        return ' | '.join(b.format_stats() for b in self.batchers.values())
+
+
+class OffloadDetector:
+    """detect_fn-compatible remote detector with on-device fallback. `local` is a
+    zero-argument callable returning a local detect_fn; it is loaded on a background thread
+    right away so falling back never waits for a model load (unless it is still loading)."""
+
+    def __init__(self, host, port=OFFLOAD_PORT, model='final_best.onnx', local=None, budget_ms=60.0,
+                 patience=3, retry_s=5.0, quality=80):
+        self.host, self.port = host, port
+        self.model = model
+        self.budget = budget_ms / 1000.0
+        self.patience = patience
+        self.retry_s = retry_s
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.sock = None
+        self.seq = 0
+        self.over_budget = 0
+        self.retry_at = 0.0
+        self.remote_frames = 0
+        self.local_frames = 0
+        self.fallbacks = 0
+        self.rtt_ms = LatencySeries(1024)
+        self.last_server_ms = 0.0
+        self._local_fn = None
+        self._local_error = None
+        self._local_ready = threading.Event()
+        if local is not None:
+            threading.Thread(target=self._load_local, args=(local,), name='offload-local', daemon=True).start()
+        else:
+            self._local_ready.set()
+
+    def _load_local(self, local):
+        try:
+            self._local_fn = local()
+        except Exception as e:
+            self._local_error = e
+        self._local_ready.set()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.budget)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(max(2 * self.budget, 0.05))  # a reply this late is dropped
+        hello = {'model': self.model, 'client': f"{socket.gethostname()}:{os.path.basename(sys.argv[0])}"}
+        sock.sendall((json.dumps(hello) + '\n').encode())
+        line = bytearray()
+        while not line.endswith(b'\n'):
+            line += recv_exact(sock, 1)
+        reply = json.loads(line)
+        if not reply['ok']:
+            sock.close()
+            raise ConnectionError(f"offload server: {reply['error']}")
+        self.sock = sock
+
+    def _fall_back(self, reason):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.fallbacks += 1
+        self.over_budget = 0
+        self.retry_at = time.monotonic() + self.retry_s
+        print(f"✗ Offload -> on-device inference ({reason}); retrying the server in {self.retry_s:.0f} s")
+
+    def _remote(self, image, classes):
+        if self.sock is None:
+            self._connect()
+            print(f"✓ Offloading inference to {self.host}:{self.port}")
+        ok, jpeg = cv2.imencode('.jpg', image, self.params)
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        self.seq += 1
+        if classes is None:
+            header = _REQUEST.pack(self.seq, len(jpeg), ALL_CLASSES)
+        else:
+            header = _REQUEST.pack(self.seq, len(jpeg), len(classes)) + np.asarray(classes, '<i2').tobytes()
+        self.sock.sendall(header + jpeg.tobytes())
+        seq, n, infer_ms, queue_ms = REPLY.unpack(recv_exact(self.sock, REPLY.size))
+        if seq != self.seq:
+            raise ConnectionError(f"reply {seq} for request {self.seq}")
+        if n == BAD_REQUEST:
+            raise ValueError(f"offload server rejected a {len(jpeg)}-byte frame")
+        self.last_server_ms = infer_ms + queue_ms
+        return np.frombuffer(recv_exact(self.sock, n * DET_DTYPE.itemsize), DET_DTYPE)
+
+    def detect(self, image, classes=None, imgsz=None):
+        """(xyxy, conf, cls_id) or None, like the other detect_fns; imgsz is ignored."""
+        if time.monotonic() >= self.retry_at:
+            t0 = time.perf_counter()
+            try:
+                dets = self._remote(image, classes)
+            except (OSError, ConnectionError, ValueError) as e:
+                self._fall_back(str(e) or type(e).__name__)
+            else:
+                rtt = time.perf_counter() - t0
+                self.rtt_ms.add(rtt * 1000.0)
+                self.remote_frames += 1
+                self.over_budget = self.over_budget + 1 if rtt > self.budget else 0
+                if self.over_budget >= self.patience:
+                    self._fall_back(f"round trip {rtt * 1000:.0f} ms > {self.budget * 1000:.0f} ms budget")
+                return top_detection(dets)
+        self._local_ready.wait()
+        if self._local_fn is None:
+            raise RuntimeError(f"offload unavailable and no on-device detector ({self._local_error})")
+        self.local_frames += 1
+        return self._local_fn(image, classes)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def format_stats(self):
+        p50, p95, p99 = self.rtt_ms.quantiles()
+        return (f"offload {self.host}: {self.remote_frames} remote / {self.local_frames} local frames, "
+                f"{self.fallbacks} fallbacks, round trip p50={p50:.1f} p95={p95:.1f} ms")
+
+
+def parse_host(text, default_port=OFFLOAD_PORT):
+    host, _, port = text.partition(':')
+    return host, int(port) if port else default_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', action='append', required=True,
+                        help="backend:path, repeatable ('onnx:final_best_dynamic.onnx')")
+    parser.add_argument('--port', type=int, default=OFFLOAD_PORT)
+    parser.add_argument('--max-batch', type=int, default=4)
+    parser.add_argument('--max-wait-ms', type=float, default=3.0, help='longest wait for a batch to fill')
+    parser.add_argument('--stats-every', type=float, default=30.0, help='s between stats lines (0 = off)')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("OFFLOAD INFERENCE SERVER")
+    print("="*60)
+    models = []
+    for spec in args.model:
+        backend, path = spec.split(':', 1) if ':' in spec else ('onnx', spec)
+        models.append(ResidentModel(backend, path))
+        print(f"✓ {models[-1].name} ({backend}) loaded and warm")
+    server = InferenceServer(models, args.port, args.max_batch, args.max_wait_ms / 1000.0)
+    threading.Thread(target=server.serve_forever, name='offload-server', daemon=True).start()
+    print(f"✓ Listening on :{args.port} (batches up to {args.max_batch}, {args.max_wait_ms:.1f} ms wait)")
+    try:
+        while True:
+            time.sleep(args.stats_every or 3600)
+            if args.stats_every:
+                print(server.format_stats())
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        server.shutdown()
+        server.server_close()
+        print("Stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Lean YOLOv8 ONNX detector on onnxruntime - no ultralytics import on the robot
+Letterboxes into a preallocated input buffer, filters classes before NMS, runs a
+vectorized NumPy NMS and returns a structured array of boxes in frame pixels.
+
+    det = OnnxDetector('final_best.onnx')
+    boxes = det.detect(color_image, classes=[0, 2])   # DET_DTYPE array, best first
+    top = det.top(color_image, classes)                # (xyxy, conf, cls_id) or None
+
+With cache_dir, the graph optimized on the first run is saved there and later runs load
+it with optimization off (keyed by model file, providers and onnxruntime version).
+"""
+import os
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from detections import DET_DTYPE, top_detection
+
+GRAPH_CACHE_DIR = os.path.expanduser('~/.cache/bolt/ort')
+
+
+def nms(boxes, scores, iou_threshold):
+    """Indices kept by greedy NMS, highest score first. boxes: (N, 4) xyxy."""
+    order = scores.argsort()[::-1]
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+# caller settings carried over to the fresh SessionOptions that cached_session builds
+COPIED_OPTIONS = ('intra_op_num_threads', 'inter_op_num_threads', 'execution_mode',
+                  'enable_cpu_mem_arena', 'enable_mem_pattern', 'log_severity_level')
+
+
+def _session_options(base, level, optimized_path=None):
+    """New SessionOptions with base's thread/memory settings; base itself is not touched,
+    so one options object can be shared by several detectors."""
+    opts = ort.SessionOptions()
+    if base is not None:
+        for name in COPIED_OPTIONS:
+            setattr(opts, name, getattr(base, name))
+    opts.graph_optimization_level = level
+    if optimized_path:
+        opts.optimized_model_filepath = optimized_path
+    return opts
+
+
+def cached_session(path, providers, cache_dir, session_options=None):
+    """InferenceSession for `path`, reusing the optimized graph saved under cache_dir."""
+    st = os.stat(path)
+    eps = '-'.join(p.replace('ExecutionProvider', '').lower() for p in providers)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(cache_dir, f"{stem}.{int(st.st_mtime)}-{st.st_size}.{eps}.ort{ort.__version__}.onnx")
+    if os.path.exists(cached):
+        opts = _session_options(session_options, ort.GraphOptimizationLevel.ORT_DISABLE_ALL)
+        try:
+            return ort.InferenceSession(cached, sess_options=opts, providers=providers)
+        except Exception as e:  # unreadable cache: rebuild it
+            print(f"✗ ORT graph cache {cached}: {e}")
+            os.remove(cached)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    opts = _session_options(session_options, ort.GraphOptimizationLevel.ORT_ENABLE_ALL, tmp)
+    session = ort.InferenceSession(path, sess_options=opts, providers=providers)
+    if os.path.exists(tmp):
+        os.replace(tmp, cached)  # a crash mid-write never leaves a truncated cache entry
+    return session
+
+
+class OnnxDetector:
+    def __init__(self, path, conf=0.25, iou=0.7, max_det=30, providers=None, session_options=None,
+                 cache_dir=None, imgsz=640):
+        if providers is None:
+            available = ort.get_available_providers()
+            providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider') if p in available]
+        if cache_dir:
+            self.session = cached_session(path, providers, cache_dir, session_options)
+        else:
+            self.session = ort.InferenceSession(path, sess_options=session_options, providers=providers)
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        batch, _, self.in_h, self.in_w = inp.shape
+        self.dynamic_batch = not isinstance(batch, int)
+        if not isinstance(self.in_h, int) or not isinstance(self.in_w, int):
+            # dynamic export (yolo_models.py --dynamic): run at imgsz
+            self.in_h, self.in_w = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self._canvas = np.full((self.in_h, self.in_w, 3), 114, np.uint8)
+        self._input = np.empty((1, 3, self.in_h, self.in_w), np.float32)
+        self._last_shape = None
+        self._batch_input = None
+
+    def _letterbox(self, image, out=None):
+        """Resize+pad into the preallocated buffers; returns (scale, pad_x, pad_y).
+        `out` is the (3, H, W) input slot to fill (default: the single-image input)."""
+        h, w = image.shape[:2]
+        r = min(self.in_h / h, self.in_w / w)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        px, py = (self.in_w - nw) // 2, (self.in_h - nh) // 2
+        if self._last_shape != (h, w):
+            self._canvas[:] = 114  # padding only changes with the source shape
+            self._last_shape = (h, w)
+        region = self._canvas[py:py + nh, px:px + nw]
+        if (nh, nw) == (h, w):
+            region[:] = image
+        else:
+            region[:] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        # HWC BGR uint8 -> CHW RGB float32 in [0, 1], written in place
+        np.multiply(self._canvas[..., ::-1].transpose(2, 0, 1), 1.0 / 255.0,
+                    out=self._input[0] if out is None else out, casting='unsafe')
+        return r, px, py
+
+    def preprocess(self, image):
+        """Letterboxed NCHW float32 input for `image` (a view of the reused buffer)."""
+        self._letterbox(image)
+        return self._input
+
+    def _postprocess(self, pred, letterbox, shape, classes):
+        """DET_DTYPE boxes in frame pixels from one image's (4 + nc, N) prediction."""
+        r, px, py = letterbox
+        scores = pred[4:]
+        if classes is not None:
+            classes = np.asarray(classes, np.int64)
+            scores = scores[classes]
+        best = scores.argmax(axis=0)
+        conf = scores[best, np.arange(scores.shape[1])]
+        keep = conf > self.conf
+        if not keep.any():
+            return np.empty(0, DET_DTYPE)
+        conf = conf[keep]
+        cls = best[keep] if classes is None else classes[best[keep]]
+        cx, cy, bw, bh = pred[:4, keep]
+        boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+        # class-aware NMS in one pass: shift each class into its own coordinate range
+        idx = nms(boxes + (cls[:, None] * 4096.0), conf, self.iou)[:self.max_det]
+
+        out = np.empty(len(idx), DET_DTYPE)
+        b = (boxes[idx] - [px, py, px, py]) / r
+        h, w = shape[:2]
+        out['x1'] = np.clip(b[:, 0], 0, w)
+        out['y1'] = np.clip(b[:, 1], 0, h)
+        out['x2'] = np.clip(b[:, 2], 0, w)
+        out['y2'] = np.clip(b[:, 3], 0, h)
+        out['conf'] = conf[idx]
+        out['cls'] = cls[idx]
+        return out
+
+    def detect(self, image, classes=None):
+        letterbox = self._letterbox(image)
+        pred = self.session.run(None, {self.input_name: self._input})[0][0]  # (4 + nc, N)
+        return self._postprocess(pred, letterbox, image.shape, classes)
+
+    def detect_batch(self, images, classes_list):
+        """detect() for several images. One session run if the export has a dynamic batch
+        dimension (export with dynamic batch), otherwise one run per image."""
+        if not self.dynamic_batch or len(images) == 1:
+            return [self.detect(image, classes) for image, classes in zip(images, classes_list)]
+        if self._batch_input is None or len(self._batch_input) < len(images):
+            self._batch_input = np.empty((len(images), 3, self.in_h, self.in_w), np.float32)
+        batch = self._batch_input[:len(images)]
+        letterboxes = [self._letterbox(image, out=slot) for image, slot in zip(images, batch)]
+        preds = self.session.run(None, {self.input_name: batch})[0]
+        return [self._postprocess(pred, lb, image.shape, classes)
+                for pred, lb, image, classes in zip(preds, letterboxes, images, classes_list)]
+
+    def top(self, image, classes=None):
+        return top_detection(self.detect(image, classes))
+
+    def warmup(self, runs=3):
+        dummy = np.random.randint(0, 255, (self.in_h, self.in_w, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.detect(dummy)
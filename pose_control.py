@@ -1,13 +1,10 @@
 #!/usr/bin/env python3
 """
-Simple posing script: Updates velocities.txt with pose commands for file_control.py
+Simple posing script: Sends pose commands to file_control.py over the command channel
 Usage: python3 pose_control.py <pose>  (e.g., 'stand', 'sit', 'point')
 """
 import sys
-import os
-
-BASE = os.path.dirname(os.path.abspath(__file__))
-VEL_FILE = os.path.join(BASE, 'velocities.txt')
+from cmd_channel import CommandWriter
 
 if len(sys.argv) < 2:
     print("Usage: python3 pose_control.py <pose>  (e.g., 'stand', 'sit', 'point')")
@@ -20,8 +17,7 @@ if pose not in valid_poses:
     print(f"Invalid pose. Valid options: {valid_poses}")
     sys.exit(1)
 
-# Write pose command to the file
-with open(VEL_FILE, 'w') as f:
-    f.write(pose)
+# Publish pose command on the channel
+CommandWriter().send_pose(pose)
 
 print(f"Posed robot to: {pose}")
\ No newline at end of file
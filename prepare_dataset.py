@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Build the train/valid/test dataset from labelled sources (replaces the notebook split cell)
+Each image goes to a split chosen by a hash of its file name, so the split is the same on
+every run and adding images never moves existing ones. Images are hardlinked (symlinked
+across filesystems, or with --link sym) instead of copied; label files are rewritten with
+the class remap (default: the notebook's 1->0, 2->1, 3->2, dropping 0 'Ball') in a
+process pool. Images without a label file are skipped, as before.
+Re-runs only handle images that are new or whose label changed, then update data.yaml
+(other keys in it are kept). <out>/prepare_manifest.json records the settings and the
+split of every image: a different --split/--salt moves images to their new split, a
+different --remap/--drop rewrites every label, and outputs whose source image is gone
+are removed, so no image ends up in two splits.
+Usage: python3 prepare_dataset.py --src train [--src field_data ...] --out dataset
+                                  [--split 0.8,0.1,0.1] [--remap 1:0,2:1,3:2] [--drop 0]
+                                  [--link hard|sym|copy] [--workers 4]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+
+import yaml
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+SPLITS = ('train', 'valid', 'test')
+DEFAULT_NAMES = 'green_ball,pink_ball,yellow_ball'
+MANIFEST = 'prepare_manifest.json'
+
+
+def split_of(name, ratios, salt=''):
+    """'train', 'valid' or 'test' for a file name, from a hash of salt + name."""
+    h = int.from_bytes(hashlib.sha1((salt + name).encode()).digest()[:8], 'big') / 2.0 ** 64
+    edge = 0.0
+    for split, ratio in zip(SPLITS, ratios):
+        edge += ratio
+        if h < edge:
+            return split
+    return SPLITS[-1]
+
+
+def parse_remap(text):
+    """'1:0,2:1,3:2' -> {1: 0, 2: 1, 3: 2}."""
+    return {int(a): int(b) for a, b in (item.split(':') for item in text.split(',') if item)}
+
+
+def remap_labels(lines, remap, drop):
+    """YOLO label lines with class ids remapped; dropped and unmapped classes removed.
+    Returns (lines, kept, removed)."""
+    out, removed = [], 0
+    for line in lines:
+        parts = line.split()
+        if not parts:
+            continue
+        class_id = int(parts[0])
+        if class_id in drop or class_id not in remap:
+            removed += 1
+            continue
+        parts[0] = str(remap[class_id])
+        out.append(' '.join(parts) + '\n')
+    return out, len(out), removed
+
+
+def link_image(src, dst, mode):
+    """Hardlink, symlink or copy src to dst; returns the mode actually used."""
+    if mode == 'hard':
+        try:
+            os.link(src, dst)
+            return 'hard'
+        except OSError:
+            mode = 'sym'  # other filesystem (EXDEV) or no hardlink support
+    if mode == 'sym':
+        os.symlink(os.path.abspath(src), dst)
+        return 'sym'
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def process_one(job):
+    """Worker: link one image and write its remapped label. (mode, bytes, kept, removed)."""
+    src_img, src_lbl, dst_img, dst_lbl, link, remap, drop = job
+    for path in (dst_img, dst_lbl):
+        if os.path.lexists(path):
+            os.remove(path)
+    used = link_image(src_img, dst_img, link)
+    with open(src_lbl) as f:
+        lines, kept, removed = remap_labels(f.readlines(), remap, drop)
+    tmp = dst_lbl + '.tmp'
+    with open(tmp, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmp, dst_lbl)
+    return used, os.path.getsize(src_img), kept, removed
+
+
+def is_current(src_img, src_lbl, dst_img, dst_lbl):
+    """True when an earlier run already produced this image's outputs from the same label."""
+    try:
+        return (os.path.lexists(dst_img)
+                and os.path.getmtime(dst_lbl) >= os.path.getmtime(src_lbl)
+                and os.path.getsize(dst_img) == os.path.getsize(src_img))
+    except OSError:
+        return False
+
+
+def load_manifest(out):
+    """(params, [(image name, split)]) of the previous run. Without a manifest (older
+    runs) every image found under <out> stands in for the file list."""
+    try:
+        with open(os.path.join(out, MANIFEST)) as f:
+            manifest = json.load(f)
+        return manifest['params'], list(manifest['files'].items())
+    except (OSError, ValueError, KeyError):
+        pass
+    files = []
+    for split in SPLITS:
+        img_dir = os.path.join(out, split, 'images')
+        if os.path.isdir(img_dir):
+            files.extend((name, split) for name in os.listdir(img_dir))
+    return None, files
+
+
+def save_manifest(out, params, assigned):
+    tmp = os.path.join(out, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'params': params, 'files': assigned}, f)
+    os.replace(tmp, os.path.join(out, MANIFEST))
+
+
+def remove_stale(out, previous, assigned):
+    """Delete outputs of images whose source is gone or that now belong to another split."""
+    removed = 0
+    for name, split in previous:
+        if assigned.get(name) == split:
+            continue
+        for path in (os.path.join(out, split, 'images', name),
+                     os.path.join(out, split, 'labels', os.path.splitext(name)[0] + '.txt')):
+            if os.path.lexists(path):
+                os.remove(path)
+        removed += 1
+    return removed
+
+
+def plan(sources, out, ratios, salt, link, remap, drop, relabel=False):
+    """(jobs, per-split counts, {image name: split}, skipped, unlabelled, duplicate names)
+    over all sources; relabel=True rewrites every label. A source is a directory with
+    images/ and labels/, or with both kinds of files mixed."""
+    jobs, counts, assigned = [], dict.fromkeys(SPLITS, 0), {}
+    skipped = unlabelled = duplicates = 0
+    seen = set()
+    for src in sources:
+        img_dir = os.path.join(src, 'images') if os.path.isdir(os.path.join(src, 'images')) else src
+        lbl_dir = os.path.join(src, 'labels') if os.path.isdir(os.path.join(src, 'labels')) else src
+        for entry in sorted(os.scandir(img_dir), key=lambda e: e.name):
+            if not entry.name.lower().endswith(IMAGE_EXTS):
+                continue
+            if entry.name in seen:
+                duplicates += 1
+                continue
+            seen.add(entry.name)
+            base = os.path.splitext(entry.name)[0]
+            src_lbl = os.path.join(lbl_dir, base + '.txt')
+            if not os.path.exists(src_lbl):
+                unlabelled += 1
+                continue
+            split = split_of(entry.name, ratios, salt)
+            counts[split] += 1
+            assigned[entry.name] = split
+            dst_img = os.path.join(out, split, 'images', entry.name)
+            dst_lbl = os.path.join(out, split, 'labels', base + '.txt')
+            if not relabel and is_current(entry.path, src_lbl, dst_img, dst_lbl):
+                skipped += 1
+                continue
+            jobs.append((entry.path, src_lbl, dst_img, dst_lbl, link, remap, drop))
+    return jobs, counts, assigned, skipped, unlabelled, duplicates
+
+
+def update_data_yaml(out, names):
+    """Write/refresh <out>/data.yaml; keys other than the splits and names are kept.
+    Returns True if the file changed."""
+    path = os.path.join(out, 'data.yaml')
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+    updated = dict(data, path=os.path.abspath(out), train='train/images', val='valid/images',
+                   test='test/images', nc=len(names), names=list(names))
+    if updated == data:
+        return False
+    with open(path, 'w') as f:
+        yaml.safe_dump(updated, f, sort_keys=False)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--src', action='append', required=True,
+                        help='labelled source directory (images/ + labels/), repeatable')
+    parser.add_argument('--out', default='dataset', help='dataset root to create/update')
+    parser.add_argument('--split', default='0.8,0.1,0.1', help='train,valid,test fractions')
+    parser.add_argument('--remap', default='1:0,2:1,3:2', help='old:new class ids; others are dropped')
+    parser.add_argument('--drop', default='0', help='class ids to remove (comma separated)')
+    parser.add_argument('--names', default=DEFAULT_NAMES, help='class names after the remap')
+    parser.add_argument('--link', choices=('hard', 'sym', 'copy'), default='hard')
+    parser.add_argument('--salt', default='', help='changes the split (default split is stable)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    ratios = [float(r) for r in args.split.split(',')]
+    if len(ratios) != 3 or abs(sum(ratios) - 1.0) > 1e-6:
+        parser.error("--split needs three fractions summing to 1")
+    remap = parse_remap(args.remap)
+    drop = {int(c) for c in args.drop.split(',') if c}
+    names = args.names.split(',')
+
+    print("="*60)
+    print("DATASET PREPARATION")
+    print("="*60)
+    t0 = time.perf_counter()
+    for split in SPLITS:
+        for kind in ('images', 'labels'):
+            os.makedirs(os.path.join(args.out, split, kind), exist_ok=True)
+    params = {'split': ratios, 'salt': args.salt, 'remap': {str(k): v for k, v in sorted(remap.items())},
+              'drop': sorted(drop), 'names': names}
+    old_params, old_files = load_manifest(args.out)
+    old = old_params or {}
+    relabel = old_params is None or (old.get('remap'), old.get('drop')) != (params['remap'], params['drop'])
+    jobs, counts, assigned, skipped, unlabelled, duplicates = plan(args.src, args.out, ratios, args.salt,
+                                                                   args.link, remap, drop, relabel)
+    stale = remove_stale(args.out, old_files, assigned)
+    t_plan = time.perf_counter() - t0
+    print(f"✓ Scanned {', '.join(args.src)} in {t_plan:.2f} s: {len(jobs)} to process, "
+          f"{skipped} up to date, {stale} stale outputs removed")
+    if relabel and old_files:
+        print("  Class remap changed (or no manifest yet): rewriting every label")
+    if old_params and (old.get('split'), old.get('salt')) != (params['split'], params['salt']):
+        print("  Split settings changed: images move to their new split")
+    if unlabelled:
+        print(f"  Warning: {unlabelled} images without a label file skipped")
+    if duplicates:
+        print(f"  Warning: {duplicates} images with an already used file name skipped")
+
+    modes, size, kept, removed = {}, 0, 0, 0
+    t1 = time.perf_counter()
+    if jobs:
+        workers = max(1, min(args.workers, len(jobs)))
+        with mp.Pool(workers) as pool:
+            for used, nbytes, k, r in pool.imap_unordered(process_one, jobs, chunksize=64):
+                modes[used] = modes.get(used, 0) + 1
+                size += nbytes
+                kept += k
+                removed += r
+    t_work = time.perf_counter() - t1
+
+    save_manifest(args.out, params, assigned)
+    changed = update_data_yaml(args.out, names)
+    total = time.perf_counter() - t0
+    print(f"✓ {' / '.join(f'{counts[s]} {s}' for s in SPLITS)} images")
+    if jobs:
+        print(f"✓ Processed {len(jobs)} images in {t_work:.2f} s: {len(jobs) / t_work:.0f} images/s, "
+              f"{size / 1e6 / t_work:.0f} MB/s ({', '.join(f'{n} {m}' for m, n in sorted(modes.items()))})")
+        print(f"  labels: {kept} boxes kept, {removed} dropped")
+    print(f"{'✓ Updated' if changed else '✓ Unchanged'} {os.path.join(args.out, 'data.yaml')}")
+    print(f"Done in {total:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Non-blocking SportClient dispatch for file_control.py
+SportDispatcher - thread that owns the SportClient; Move calls are coalesced to the
+                  newest setpoint and pose transitions run as tracked async operations
+FakeSportClient - stand-in with configurable RPC delays for tests and benchmarks
+"""
+import random
+import threading
+import time
+from collections import deque
+
+from control_loop import Histogram
+
+LATENCY_EDGES_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 500, 1000]
+
+
+class PoseOp:
+    """One pose transition. state: pending -> running -> settling -> done | failed"""
+
+    def __init__(self, pose):
+        self.pose = pose
+        self.state = 'pending'
+        self.error = None
+        self.requested = time.monotonic()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        self.finished = time.monotonic()
+        self._done.set()
+
+
+class SportDispatcher:
+    """Owns the SportClient. The control loop only calls set_velocity()/request_pose(),
+    which never block on the robot RPC."""
+
+    def __init__(self, client, settle_time=2.0, on_error=None, on_move=None):
+        self.client = client
+        self.settle_time = settle_time
+        self.on_error = on_error or (lambda what, e: print(f"{what} error: {e}"))
+        self.on_move = on_move  # on_move(tag, t_start, t_end) after a tagged Move returns
+        self.move_latency = Histogram(LATENCY_EDGES_MS)
+        self.pose_latency = Histogram(LATENCY_EDGES_MS)
+        self.moves_sent = 0
+        self.moves_coalesced = 0
+        self.last_move_ms = 0.0
+        self.current_pose = 'stand'
+        self._cond = threading.Condition()
+        self._setpoint = (0.0, 0.0, 0.0)
+        self._setpoint_tag = None
+        self._setpoint_version = 0
+        self._sent_version = 0
+        self._pose_ops = []
+        self._active_op = None
+        self._settle_until = 0.0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sport-dispatch', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def set_velocity(self, vx, vy, vyaw, tag=None):
+        """tag: passed to on_move once the Move carrying this setpoint returns. An untagged
+        setpoint keeps the pending tag (the command it traces is still in this setpoint);
+        a newer tag replaces it."""
+        with self._cond:
+            if self._setpoint_version != self._sent_version:
+                self.moves_coalesced += 1
+            self._setpoint = (vx, vy, vyaw)
+            if tag is not None:
+                self._setpoint_tag = tag
+            self._setpoint_version += 1
+            self._cond.notify()
+
+    def request_pose(self, pose):
+        op = PoseOp(pose)
+        with self._cond:
+            self._pose_ops.append(op)
+            self._cond.notify()
+        return op
+
+    def busy(self):
+        """True while a pose transition (including its settle time) is in progress."""
+        with self._cond:
+            return (self._active_op is not None or bool(self._pose_ops) or
+                    time.monotonic() < self._settle_until)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._pose_ops and self._active_op is None:
+                        break
+                    settling = time.monotonic() < self._settle_until
+                    if self._active_op is not None and not settling:
+                        break
+                    if not settling and self._setpoint_version != self._sent_version:
+                        break
+                    timeout = self._settle_until - time.monotonic() if settling else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                if self._active_op is not None and time.monotonic() >= self._settle_until:
+                    self._active_op._finish('done')
+                    self._active_op = None
+                    continue
+                if self._pose_ops and self._active_op is None:
+                    op = self._active_op = self._pose_ops.pop(0)
+                    op.state = 'running'
+                    op.started = time.monotonic()
+                    action = None
+                else:
+                    op = None
+                    action, tag = self._setpoint, self._setpoint_tag
+                    self._setpoint_tag = None
+                    self._sent_version = self._setpoint_version
+
+            if op is not None:
+                self._run_pose(op)
+            else:
+                t_start = time.monotonic()
+                t0 = time.perf_counter()
+                try:
+                    self.client.Move(*action)
+                except Exception as e:
+                    self.on_error('Move', e)
+                self.last_move_ms = (time.perf_counter() - t0) * 1000.0
+                if tag is not None and self.on_move is not None:
+                    self.on_move(tag, t_start, time.monotonic())
+                self.move_latency.add(self.last_move_ms)
+                self.moves_sent += 1
+
+    def _run_pose(self, op):
+        t0 = time.perf_counter()
+        try:
+            if op.pose == 'sit':
+                self.client.StandDown()
+            elif op.pose == 'stand':
+                self.client.StandUp()
+            else:
+                raise ValueError(f"Unsupported pose: {op.pose}")
+        except Exception as e:
+            self.on_error('Pose', e)
+            with self._cond:
+                self._active_op = None
+            op._finish('failed', e)
+            return
+        self.pose_latency.add((time.perf_counter() - t0) * 1000.0)
+        with self._cond:
+            self.current_pose = op.pose
+            op.state = 'settling'
+            self._settle_until = time.monotonic() + self.settle_time
+
+    def format_stats(self):
+        return (self.move_latency.format("Move call latency (ms)") + "\n" +
+                self.pose_latency.format("Pose call latency (ms)") + "\n" +
+                f"Moves sent: {self.moves_sent}, coalesced: {self.moves_coalesced}")
+
+
+class FakeSportClient:
+    """SportClient stand-in. Delays are seconds; jitter is a +/- fraction of the delay.
+    `calls` keeps the last `history` RPCs, `counts` the number of calls per name."""
+
+    def __init__(self, move_delay=0.002, pose_delay=0.5, jitter=0.2, history=1000):
+        self.move_delay = move_delay
+        self.pose_delay = pose_delay
+        self.jitter = jitter
+        self.calls = deque(maxlen=history)
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def _rpc(self, name, delay, *args):
+        if delay > 0:
+            time.sleep(delay * (1.0 + random.uniform(-self.jitter, self.jitter)))
+        with self._lock:
+            self.calls.append((time.monotonic(), name, args))
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def SetTimeout(self, timeout):
+        pass
+
+    def Init(self):
+        pass
+
+    def RecoveryStand(self):
+        self._rpc('RecoveryStand', self.pose_delay)
+
+    def StandUp(self):
+        self._rpc('StandUp', self.pose_delay)
+
+    def StandDown(self):
+        self._rpc('StandDown', self.pose_delay)
+
+    def Move(self, vx, vy, vyaw):
+        self._rpc('Move', self.move_delay, vx, vy, vyaw)
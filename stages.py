@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Staged pipeline helpers for the trackers
+LatestSlot   - bounded (size 1) latest-value handoff; an unread value is dropped, never queued
+StageCounter - per-stage frames, busy time and throughput
+Stage        - worker thread: take newest input, run fn, publish output
+Pipeline     - starts/stops a chain of stages and reports their counters
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LatestSlot:
+    """Single-consumer mailbox that only ever holds the newest value."""
+
+    def __init__(self, name=''):
+        self.name = name
+        self.version = 0
+        self.dropped = 0
+        self.closed = False
+        self._taken = 0
+        self._value = None
+        self._cond = threading.Condition()
+
+    def put(self, value):
+        with self._cond:
+            if self.version != self._taken:
+                self.dropped += 1  # consumer never saw the previous value
+            self._value = value
+            self.version += 1
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Newest value not yet taken, or None on timeout/close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.version != self._taken or self.closed, timeout):
+                return None
+            if self.version == self._taken:
+                return None
+            self._taken = self.version
+            value, self._value = self._value, None
+            return value
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StageCounter:
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def timing(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy += time.perf_counter() - t0
+            self.frames += 1
+
+    def reset(self):
+        self.frames = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+
+    def fps(self):
+        elapsed = time.perf_counter() - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def busy_ms(self):
+        return self.busy / self.frames * 1000.0 if self.frames else 0.0
+
+
+def format_counters(counters, dropped=None):
+    dropped = dropped or {}
+    lines = [f"{'stage':10s} | {'frames':>7s} | {'fps':>6s} | {'busy ms':>8s} | {'dropped':>7s}"]
+    for c in counters:
+        lines.append(f"{c.name:10s} | {c.frames:7d} | {c.fps():6.1f} | {c.busy_ms():8.2f} | "
+                     f"{dropped.get(c.name, 0):7d}")
+    return '\n'.join(lines)
+
+
+class Stage(threading.Thread):
+    """Runs fn(item) on the newest item of `inbox` (or fn() for a source stage) and
+    puts non-None results into `outbox`. A source raising EOFError stops the pipeline."""
+
+    def __init__(self, name, fn, inbox=None, outbox=None, stop_event=None):
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.counter = StageCounter(name)
+        self.stop_event = stop_event or threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if self.inbox is not None:
+                    item = self.inbox.get(timeout=0.1)
+                    if item is None:
+                        continue
+                    with self.counter.timing():
+                        out = self.fn(item)
+                else:
+                    with self.counter.timing():
+                        out = self.fn()
+                if out is not None and self.outbox is not None:
+                    self.outbox.put(out)
+        except EOFError:
+            self.stop_event.set()
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+
+
+class Pipeline:
+    """Chain of stages joined by LatestSlots: fns[0]() -> fns[1](x) -> ... -> fns[-1](x)."""
+
+    def __init__(self, stages):
+        self.stop_event = threading.Event()
+        self.slots = []
+        self.stages = []
+        inbox = None
+        for i, (name, fn) in enumerate(stages):
+            outbox = LatestSlot(name) if i < len(stages) - 1 else None
+            self.stages.append(Stage(name, fn, inbox, outbox, self.stop_event))
+            if outbox is not None:
+                self.slots.append(outbox)
+            inbox = outbox
+
+    def start(self):
+        for s in self.stages:
+            s.counter.reset()
+            s.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until a stage fails (re-raised here) or timeout; returns True if stopped."""
+        stopped = self.stop_event.wait(timeout)
+        for s in self.stages:
+            if s.error is not None:
+                raise s.error
+        return stopped
+
+    def stop(self):
+        self.stop_event.set()
+        for slot in self.slots:
+            slot.close()
+        for s in self.stages:
+            if s.is_alive():
+                s.join(1.0)
+
+    def counters(self):
+        return [s.counter for s in self.stages]
+
+    def format_stats(self):
+        # frames dropped at a stage's input = values overwritten in the slot feeding it
+        dropped = {s.name: s.inbox.dropped for s in self.stages if s.inbox is not None}
+        return format_counters(self.counters(), dropped)
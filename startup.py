@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Startup timeline for the trackers, with concurrent bring-up of the slow parts
+Camera start + warm-up and model load + warm-up are independent, so they run as tasks
+on their own threads (the RealSense waits and the inference runs release the GIL).
+The timeline is printed once the first command is published: time-to-first-command
+is the number to watch. Times are from process start (read from /proc when available).
+
+    boot = StartupTimeline()
+    camera = boot.start('camera', lambda: open_source(args).start())
+    model = boot.start('model', load_detector, args.backend, path)
+    source, detect_fn = camera.result(), model.result()
+    ...
+    boot.finish('first command')      # after the first cmd.send(); no-op afterwards
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+
+def process_start_monotonic():
+    """time.monotonic() value of process start, or None if /proc is unavailable."""
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_s = int(fields[19]) / os.sysconf('SC_CLK_TCK')  # field 22: starttime, ticks since boot
+        return time.monotonic() - (time.clock_gettime(time.CLOCK_BOOTTIME) - start_s)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTask:
+    """A callable running on its own thread; result() waits and re-raises its exception."""
+
+    def __init__(self, timeline, name, fn, args, kwargs):
+        self.timeline = timeline
+        self.name = name
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(fn, args, kwargs),
+                                        name=f'startup-{name}', daemon=True)
+        self._thread.start()
+
+    def _run(self, fn, args, kwargs):
+        t0 = time.monotonic()
+        try:
+            self._result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._error = e
+        self.timeline.span(self.name, t0, time.monotonic())
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class StartupTimeline:
+    def __init__(self, name=None):
+        self.name = name or os.path.basename(sys.argv[0])
+        self.t_created = time.monotonic()
+        self.t0 = process_start_monotonic() or self.t_created
+        self.spans = []             # (name, start, end), monotonic
+        self.done = False
+        self._lock = threading.Lock()
+        if self.t0 < self.t_created:
+            self.span('interpreter + imports', self.t0, self.t_created)
+
+    def span(self, name, start, end):
+        with self._lock:
+            self.spans.append((name, start, end))
+
+    def mark(self, name):
+        """A point event (zero-length span) at now."""
+        t = time.monotonic()
+        self.span(name, t, t)
+
+    def start(self, name, fn, *args, **kwargs):
+        return StartupTask(self, name, fn, args, kwargs)
+
+    def run(self, name, fn, *args, **kwargs):
+        """Timed call on the current thread."""
+        t0 = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.span(name, t0, time.monotonic())
+
+    def finish(self, name='first command', log_path=None):
+        """Mark the end of startup, print the timeline and optionally append it to log_path
+        (one JSON line per run). Only the first call does anything."""
+        if self.done:
+            return
+        self.done = True
+        self.mark(name)
+        print(self.format())
+        if log_path:
+            with open(log_path, 'a') as f:
+                f.write(json.dumps(self.to_dict()) + '\n')
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s[1], s[2]))
+        return {'script': self.name, 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'total_s': round(max(e for _, _, e in spans) - self.t0, 3) if spans else 0.0,
+                'spans': [{'name': n, 'start_s': round(s - self.t0, 3), 'end_s': round(e - self.t0, 3)}
+                          for n, s, e in spans]}
+
+    def format(self, width=40):
+        d = self.to_dict()
+        total = d['total_s'] or 1e-9
+        lines = [f"Startup timeline ({d['script']}): first command after {d['total_s']:.2f} s",
+                 f"  {'step':>22s} {'start':>7s} {'end':>7s} {'took':>7s}"]
+        for s in d['spans']:
+            a, b = int(s['start_s'] / total * width), int(s['end_s'] / total * width)
+            bar = ' ' * a + ('#' * max(1, b - a) if b > a else '|')
+            lines.append(f"  {s['name']:>22s} {s['start_s']:7.2f} {s['end_s']:7.2f} "
+                         f"{s['end_s'] - s['start_s']:7.2f}  {bar}")
+        return '\n'.join(lines)
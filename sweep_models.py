@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Accuracy/latency Pareto sweep over checkpoints x export settings
+Every combination of --weights, --formats (onnx, pt), --precisions (fp32, fp16, int8;
+ONNX only) and --imgsz is exported with export_models.py, evaluated on the `test` split
+(mAP@0.5 and recall of green/pink/yellow, ultralytics val on CPU) in parallel worker
+processes, then timed one at a time for single-frame CPU latency (the evaluation pool
+is finished by then, so timings do not compete with it). The variants that no other
+variant beats on both latency and accuracy form the Pareto frontier, which is printed
+and marked in <out>/sweep.md (<out>/sweep.json has everything).
+Rectangular sizes (WxH) are evaluated with the .pt checkpoint at rect=True, as in
+export_models.py, so only their fp32 variants get an accuracy.
+Usage: python3 sweep_models.py --weights final_best.pt,yolov8n_balls.pt --data data.yaml
+                               [--formats onnx,pt] [--precisions fp32,fp16,int8]
+                               [--imgsz 320,480,640] [--workers 3] [--objective map50]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from export_models import (evaluate_map50, export_fp16, export_fp32, export_int8, measure_latency,
+                           parse_sizes, size_tag, split_images)
+
+BALL_CLASSES = ('green_ball', 'pink_ball', 'yellow_ball')
+
+
+def size_label(imgsz):
+    return f"{imgsz}x{imgsz}" if isinstance(imgsz, int) else f"{imgsz[1]}x{imgsz[0]}"
+
+
+def build_variants(args, calib):
+    """Export every combination; [{'variant', 'weights', 'format', 'precision', 'imgsz', 'path',
+    'eval': (path, imgsz, rect) or None}]."""
+    variants = []
+    for weights in args.weights.split(','):
+        name = os.path.splitext(os.path.basename(weights))[0]
+        for imgsz in args.imgsz:
+            label = size_label(imgsz)
+            square = isinstance(imgsz, int)
+            rect_eval = (weights, max(imgsz), True) if not square else None
+            if 'pt' in args.formats:
+                variants.append({'variant': f"{name} pt fp32 {label}", 'weights': weights, 'format': 'pt',
+                                 'precision': 'fp32', 'imgsz': imgsz, 'path': weights,
+                                 'eval': (weights, imgsz, False) if square else rect_eval})
+            if 'onnx' not in args.formats:
+                continue
+            print(f"Exporting {name} at {label}...")
+            fp32 = export_fp32(weights, args.out, imgsz, name)
+            paths = {'fp32': fp32}
+            if 'fp16' in args.precisions:
+                try:
+                    paths['fp16'] = export_fp16(fp32, os.path.join(args.out, f'{name}{size_tag(imgsz)}_fp16.onnx'))
+                except ImportError as e:
+                    print(f"✗ FP16 skipped ({e}); pip install onnxconverter-common")
+            if 'int8' in args.precisions:
+                paths['int8'] = export_int8(fp32, os.path.join(args.out, f'{name}{size_tag(imgsz)}_int8.onnx'), calib)
+            for precision in [p for p in args.precisions if p in paths]:
+                path = paths[precision]
+                if square:
+                    evaluation = (path, imgsz, False)
+                else:
+                    evaluation = rect_eval if precision == 'fp32' else None
+                variants.append({'variant': f"{name} onnx {precision} {label}", 'weights': weights,
+                                 'format': 'onnx', 'precision': precision, 'imgsz': imgsz, 'path': path,
+                                 'eval': evaluation})
+    return variants
+
+
+def evaluate_worker(job):
+    """Worker process: (variant, mAP@0.5, recall by class, error)."""
+    variant, (path, imgsz, rect), data, threads = job
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        map50, recall = evaluate_map50(path, data, imgsz, rect=rect)
+    except Exception as e:
+        return variant, None, None, f"{type(e).__name__}: {e}"
+    return variant, map50, {c: recall.get(c, 0.0) for c in BALL_CLASSES}, None
+
+
+def measure_pt_latency(weights, images, imgsz, runs=50, warmup=5):
+    """Single-frame CPU latency (ms) of ultralytics predict on the .pt checkpoint."""
+    import cv2
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    frames = [cv2.imread(p) for p in images[:max(1, min(len(images), 10))]]
+    frames = [f for f in frames if f is not None] or [np.zeros((480, 640, 3), np.uint8)]
+    size = list(imgsz) if isinstance(imgsz, tuple) else imgsz
+    for i in range(warmup):
+        model(frames[i % len(frames)], imgsz=size, device='cpu', verbose=False)
+    times = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        model(frames[i % len(frames)], imgsz=size, device='cpu', verbose=False)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {'mean_ms': float(np.mean(times)), 'p50_ms': float(np.percentile(times, 50)),
+            'p95_ms': float(np.percentile(times, 95))}
+
+
+def score(row, objective):
+    if row.get('map50') is None:
+        return None
+    return row['map50'] if objective == 'map50' else min(row['recall'].values())
+
+
+def pareto_front(rows, objective):
+    """Rows not dominated on (p50 latency lower, score higher), fastest first."""
+    rated = sorted((r for r in rows if score(r, objective) is not None),
+                   key=lambda r: (r['p50_ms'], -score(r, objective)))
+    front, best = [], -1.0
+    for r in rated:
+        if score(r, objective) > best:
+            front.append(r)
+            best = score(r, objective)
+    return front
+
+
+def format_report(rows, front, objective):
+    on_front = {r['variant'] for r in front}
+    lines = [f"| | variant | size MB | mAP@0.5 | {' | '.join(c.split('_')[0] for c in BALL_CLASSES)} "
+             f"| p50 ms | p95 ms |",
+             "|---|---|---:|---:|" + "---:|" * len(BALL_CLASSES) + "---:|---:|"]
+    for r in sorted(rows, key=lambda r: r['p50_ms']):
+        m = f"{r['map50']:.4f}" if r.get('map50') is not None else 'n/a'
+        rec = ' | '.join(f"{r['recall'][c]:.3f}" if r.get('recall') else 'n/a' for c in BALL_CLASSES)
+        lines.append(f"| {'*' if r['variant'] in on_front else ''} | {r['variant']} | {r['size_mb']:.1f} | "
+                     f"{m} | {rec} | {r['p50_ms']:.2f} | {r['p95_ms']:.2f} |")
+    lines.append(f"\nPareto frontier (marked *, p50 latency vs {objective}), fastest first:")
+    for r in front:
+        lines.append(f"- **{r['variant']}**: {score(r, objective):.4f} at {r['p50_ms']:.2f} ms ({r['path']})")
+    if not front:
+        lines.append("- none (no variant was evaluated)")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--weights', default='final_best.pt', help='comma-separated checkpoints')
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--out', default='sweep')
+    parser.add_argument('--formats', type=lambda s: s.split(','), default=['onnx', 'pt'])
+    parser.add_argument('--precisions', type=lambda s: s.split(','), default=['fp32', 'fp16', 'int8'])
+    parser.add_argument('--imgsz', type=parse_sizes, default=[320, 480, 640],
+                        help='comma-separated sizes: 640 or WxH')
+    parser.add_argument('--calib-images', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help='evaluation processes')
+    parser.add_argument('--runs', type=int, default=50, help='latency runs per variant')
+    parser.add_argument('--threads', type=int, default=None, help='onnxruntime intra-op threads')
+    parser.add_argument('--objective', choices=('map50', 'min_recall'), default='map50',
+                        help='accuracy axis of the frontier (min_recall = worst of the three colours)')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    print("="*60)
+    print("MODEL SWEEP - ACCURACY VS CPU LATENCY")
+    print("="*60)
+    calib = split_images(args.data, 'valid')[:args.calib_images] if 'int8' in args.precisions else []
+    test_images = split_images(args.data, 'test')
+    variants = build_variants(args, calib)
+    print(f"✓ {len(variants)} variants, {len(test_images)} test images\n")
+
+    jobs = [(v['variant'], v['eval'], args.data, max(1, (os.cpu_count() or 1) // args.workers))
+            for v in variants if v['eval'] is not None]
+    print(f"Evaluating {len(jobs)} variants in {args.workers} worker processes...")
+    t0 = time.perf_counter()
+    accuracy = {}
+    with mp.get_context('spawn').Pool(args.workers) as pool:
+        for variant, map50, recall, error in pool.imap_unordered(evaluate_worker, jobs):
+            accuracy[variant] = (map50, recall)
+            if error:
+                print(f"✗ {variant}: {error}")
+            else:
+                print(f"  {variant}: mAP@0.5={map50:.4f} "
+                      + ' '.join(f"{c.split('_')[0]}={recall[c]:.3f}" for c in BALL_CLASSES))
+    print(f"✓ Evaluated in {time.perf_counter() - t0:.0f} s\n")
+
+    print("Measuring single-frame CPU latency...")
+    rows = []
+    for v in variants:
+        if v['format'] == 'onnx':
+            timing = measure_latency(v['path'], test_images, args.runs, threads=args.threads)
+        else:
+            timing = measure_pt_latency(v['path'], test_images, v['imgsz'], args.runs)
+        map50, recall = accuracy.get(v['variant'], (None, None))
+        row = {k: v[k] for k in ('variant', 'weights', 'format', 'precision', 'path')}
+        row.update(imgsz=size_label(v['imgsz']), size_mb=os.path.getsize(v['path']) / 1e6,
+                   map50=map50, recall=recall, **timing)
+        rows.append(row)
+        print(f"  {v['variant']}: p50 {timing['p50_ms']:.2f} ms")
+
+    front = pareto_front(rows, args.objective)
+    report = format_report(rows, front, args.objective)
+    with open(os.path.join(args.out, 'sweep.md'), 'w') as f:
+        f.write(f"# Model sweep ({time.strftime('%Y-%m-%d %H:%M')})\n\n{report}\n")
+    with open(os.path.join(args.out, 'sweep.json'), 'w') as f:
+        json.dump({'objective': args.objective, 'rows': rows,
+                   'frontier': [r['variant'] for r in front]}, f, indent=2)
+    print("\n" + report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Target selection for the trackers, switched in-process
+request() is called from the stream server (POST /target) or the target-file fallback;
+the inference stage calls apply(frame_no) once per frame, so a request takes effect on
+the very next frame and the caller gets back the frame number it was applied on.
+
+    control = TargetControl()
+    ack = control.request('yellow')         # blocks until applied (or timeout)
+    target, classes = control.apply(pkt.frame_no)
+"""
+import threading
+import time
+
+from control_loop import Histogram
+from tracker_core import NAME_TO_ID
+
+APPLY_EDGES_MS = [1, 2, 5, 10, 20, 35, 50, 100, 200, 500]
+
+
+def target_classes(name):
+    return [0, 1, 2] if name == 'all' else [NAME_TO_ID[name]]
+
+
+class TargetControl:
+    def __init__(self, initial='all'):
+        self.current = initial
+        self.classes = target_classes(initial)
+        self.applied_frame = None
+        self._applied_at = None
+        self.apply_ms = Histogram(APPLY_EDGES_MS)   # request -> applied on a frame
+        self._cond = threading.Condition()
+        self._pending = None                        # (name, request time, request id)
+        self._requests = 0
+
+    def request(self, name, timeout=1.0, source='api'):
+        """Queue a switch to `name`. With timeout > 0, wait until the tracker applied it and
+        return {'target', 'frame', 'apply_ms'}; on timeout 'frame' is None."""
+        if not isinstance(name, str):
+            raise ValueError(f"target must be a string (green, pink, yellow, all), not {name!r}")
+        name = name.strip().lower()
+        if name not in NAME_TO_ID:
+            raise ValueError(f"unknown target '{name}' (green, pink, yellow, all)")
+        with self._cond:
+            self._requests += 1
+            rid = self._requests
+            t0 = time.monotonic()
+            self._pending = (name, t0, rid)
+            print(f">>> TARGET REQUEST ({source}): {name.upper()} <<<")
+            if timeout <= 0:
+                return {'target': name, 'frame': None, 'apply_ms': None}
+            applied = self._cond.wait_for(lambda: self._pending is None or self._pending[2] != rid, timeout)
+            if not applied or self.current != name or self._pending is not None:
+                return {'target': name, 'frame': None, 'apply_ms': None}
+            return {'target': name, 'frame': self.applied_frame,
+                    'apply_ms': round((self._applied_at - t0) * 1000.0, 2)}
+
+    def apply(self, frame_no):
+        """Called by the inference stage before detecting on `frame_no`; returns (target, classes)."""
+        if self._pending is None:  # fast path, no lock
+            return self.current, self.classes
+        with self._cond:
+            if self._pending is not None:
+                name, t0, _ = self._pending
+                self._pending = None
+                self._applied_at = time.monotonic()
+                if name != self.current:
+                    print(f">>> TARGET CHANGED: {name.upper()} (frame {frame_no}) <<<")
+                self.current, self.classes = name, target_classes(name)
+                self.applied_frame = frame_no
+                self.apply_ms.add((self._applied_at - t0) * 1000.0)
+                self._cond.notify_all()
+            return self.current, self.classes
+
+    def format_stats(self):
+        h = self.apply_ms
+        if not h.n:
+            return f"target: {self.current}"
+        return f"target: {self.current}, {h.n} switches, request->frame mean={h.mean():.1f} ms max={h.max:.1f} ms"
+
+
+def file_fallback(control, path, interval=0.5):
+    """The original target.txt polling, now only acting when the file content changes
+    (so it does not undo switches made through the API)."""
+    last = None
+    while True:
+        try:
+            with open(path, 'r') as f:
+                t = f.read().strip().lower()
+            if t != last and t in NAME_TO_ID:
+                if last is not None and t != control.current:
+                    control.request(t, timeout=0, source='file')
+                last = t
+        except OSError:
+            pass
+        time.sleep(interval)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Fixed-size binary telemetry for the control loop and the trackers
+The hot loop writes one record per cycle into a preallocated NumPy ring buffer (a tuple
+assignment, no string formatting, no I/O); a background thread appends the new records
+to <dir>/<name>_<n>.tlm and rotates files at `rotate_bytes`, keeping the newest `keep`.
+Each file is self-describing: b'BOLTTLM1', u32 header length, JSON header (name, dtype),
+then raw records. A run (one Telemetry object) can span several rotated files; load()
+returns a run as one structured array.
+
+    tlm = Telemetry('telemetry', 'control', CONTROL_DTYPE).start()
+    tlm.record((time.monotonic(), iteration, ...))    # field order of the dtype
+    tlm.close()
+    data = load('telemetry', 'control')               # latest run, np.ndarray[CONTROL_DTYPE]
+"""
+import glob
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'BOLTTLM1'
+_HEADER_LEN = struct.Struct('<I')
+
+CONTROL_DTYPE = np.dtype([
+    ('t', 'f8'),            # time.monotonic() of the cycle (s)
+    ('iteration', 'i8'),
+    ('cmd_seq', 'i8'),      # sequence number of the channel command read this cycle, -1 if none
+    ('cmd_age', 'f4'),      # s since the command was written
+    ('vx', 'f4'), ('vy', 'f4'), ('vyaw', 'f4'),         # commanded
+    ('mx', 'f4'), ('my', 'f4'), ('myaw', 'f4'),         # sent to Move (after the watchdog)
+    ('pose', 'i1'),         # cmd_channel POSE_* of the current pose
+    ('flags', 'u1'),        # FLAG_*
+    ('move_ms', 'f4'),      # latency of the most recent Move call
+])
+FLAG_NEW_CMD = 1
+FLAG_WATCHDOG = 2
+FLAG_POSE_BUSY = 4
+FLAG_OVERRUN = 8
+FLAG_PREDICTED = 16  # vyaw corrected by the bearing predicted to this cycle
+
+PERCEPTION_DTYPE = np.dtype([
+    ('t', 'f8'),            # time.monotonic() when the control stage ran (s)
+    ('frame_no', 'i8'),
+    ('cam_ts', 'f8'),       # camera timestamp (ms)
+    ('target', 'i1'),       # class id, -1 = all
+    ('source', 'i1'),       # SOURCE_CODES
+    ('cls', 'i1'),          # -1 = no detection
+    ('status', 'i1'),       # STATUS_CODES
+    ('conf', 'f4'),
+    ('x1', 'i2'), ('y1', 'i2'), ('x2', 'i2'), ('y2', 'i2'),
+    ('distance', 'f4'),     # m, NaN if unknown
+    ('vx', 'f4'), ('vyaw', 'f4'),
+])
+SOURCE_CODES = {None: 0, 'detector': 1, 'flow': 2, 'predict': 3}
+STATUS_CODES = {None: 0, 'TOO CLOSE': 1, 'HOLDING': 2, 'APPROACHING': 3, 'CREEPING': 4,
+                'BACKING': 5, 'SEARCHING': 6, 'SITTING': 7}
+
+
+def perception_record(pkt, target, detection, distance, status, vx=0.0, vyaw=0.0, source='detector'):
+    """PERCEPTION_DTYPE values of one tracker frame; detection is (xyxy, conf, cls_id) or
+    None, target a class id or None (all)."""
+    if detection is None:
+        box, conf, cls_id, source = (0, 0, 0, 0), 0.0, -1, None
+    else:
+        xyxy, conf, cls_id = detection
+        box = tuple(int(v) for v in xyxy[:4])
+    return (time.monotonic(), pkt.frame_no, getattr(pkt, 'timestamp', pkt.t_capture * 1000.0),
+            -1 if target is None else target, SOURCE_CODES.get(source, 0), int(cls_id),
+            STATUS_CODES.get(status, 0), float(conf), *box,
+            np.nan if distance is None else distance, vx, vyaw)
+
+
+class Telemetry:
+    """Single-producer ring buffer + background file writer. record() never blocks; if the
+    writer falls more than `capacity` records behind, the oldest are overwritten and counted."""
+
+    def __init__(self, directory, name, dtype, capacity=8192, rotate_bytes=64 << 20, keep=20,
+                 flush_interval=0.5):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.rotate_bytes = rotate_bytes
+        self.keep = keep
+        self.flush_interval = flush_interval
+        self.run = time.strftime('%Y%m%d-%H%M%S')
+        self.buf = np.zeros(capacity, self.dtype)
+        self.head = 0           # records written by the producer (monotonic count)
+        self.tail = 0           # records flushed by the writer
+        self.lost = 0
+        self.written = 0
+        self._file = None
+        self._file_bytes = 0
+        self._index = self._next_index()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'telemetry-{name}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def record(self, values):
+        """values: tuple in dtype field order."""
+        self.buf[self.head % self.capacity] = values
+        self.head += 1
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _next_index(self):
+        existing = sorted(glob.glob(os.path.join(self.directory, f'{self.name}_*.tlm')))
+        return int(existing[-1].rsplit('_', 1)[1][:-4]) + 1 if existing else 0
+
+    def _open(self):
+        path = os.path.join(self.directory, f'{self.name}_{self._index:05d}.tlm')
+        self._index += 1
+        header = json.dumps({'name': self.name, 'run': self.run, 'dtype': self.dtype.descr,
+                             'created': time.time(), 'monotonic': time.monotonic()}).encode()
+        self._file = open(path, 'ab')
+        self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+        self._file_bytes = self._file.tell()
+        self._prune()
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, f'{self.name}_*.tlm')))
+        for old in files[:-self.keep] if self.keep else []:
+            os.remove(old)
+
+    def _flush(self):
+        head = self.head
+        if head - self.tail > self.capacity:
+            self.lost += head - self.tail - self.capacity
+            self.tail = head - self.capacity
+        if head == self.tail:
+            return
+        start, end = self.tail % self.capacity, head % self.capacity
+        if start < end:
+            chunk = self.buf[start:end].copy()
+        else:
+            chunk = np.concatenate([self.buf[start:], self.buf[:end]])
+        # the producer may have lapped us while copying; drop what could be torn
+        lapped = self.head - self.capacity - self.tail
+        if lapped > 0:
+            chunk = chunk[lapped:]
+            self.lost += lapped
+        self.tail = head
+        if self._file is None or self._file_bytes >= self.rotate_bytes:
+            if self._file is not None:
+                self._file.close()
+            self._open()
+        data = chunk.tobytes()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.written += len(chunk)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+
+    def format_stats(self):
+        return f"telemetry {self.name}: {self.written} records written, {self.lost} lost"
+
+
+def read_header(path):
+    """(header dict, data offset) of one .tlm file."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a telemetry file")
+        (n,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+        header = json.loads(f.read(n))
+        return header, f.tell()
+
+
+def read_file(path):
+    """(header dict, structured array) of one .tlm file."""
+    header, offset = read_header(path)
+    dtype = np.dtype([tuple(field) for field in header['dtype']])
+    count = (os.path.getsize(path) - offset) // dtype.itemsize  # ignore a partly written tail
+    return header, np.fromfile(path, dtype=dtype, count=count, offset=offset)
+
+
+def runs(directory, name):
+    """{run id: [files]} oldest run first."""
+    out = {}
+    for path in sorted(glob.glob(os.path.join(directory, f'{name}_*.tlm'))):
+        out.setdefault(read_header(path)[0].get('run'), []).append(path)
+    return out
+
+
+def load(directory, name, run='latest', start=None, end=None):
+    """Records of one run of `name` ('latest', a run id, or None for every run on disk),
+    oldest first; optional time.monotonic() window."""
+    by_run = runs(directory, name)
+    if not by_run:
+        raise FileNotFoundError(f"no {name}_*.tlm in {directory}")
+    if run is None:
+        files = [p for paths in by_run.values() for p in paths]
+    elif run == 'latest':
+        files = list(by_run.values())[-1]
+    else:
+        files = by_run[run]
+    parts = [read_file(p)[1] for p in files]
+    data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+    if start is not None:
+        data = data[data['t'] >= start]
+    if end is not None:
+        data = data[data['t'] <= end]
+    return data
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Query the binary telemetry written by file_control.py and test_coloured_model.py
+Lists runs, summarizes one (rate, gaps, field statistics, FSM status and detection
+source mix) and exports it to CSV. For analysis in Python use telemetry.load() directly.
+Usage: python3 telemetry_query.py [DIR] [--name control|perception] [--list] [--run ID]
+                                  [--last SECONDS] [--csv out.csv]
+"""
+import argparse
+
+import numpy as np
+
+from telemetry import FLAG_WATCHDOG, SOURCE_CODES, STATUS_CODES, load, runs
+
+
+def summarize(data, name):
+    lines = []
+    duration = data['t'][-1] - data['t'][0] if len(data) > 1 else 0.0
+    gaps = np.diff(data['t']) * 1000.0 if len(data) > 1 else np.zeros(1)
+    lines.append(f"{name}: {len(data)} records over {duration:.1f} s "
+                 f"({len(data) / duration if duration else 0:.1f} Hz)")
+    lines.append(f"  interval ms: p50={np.percentile(gaps, 50):.2f} p99={np.percentile(gaps, 99):.2f} "
+                 f"max={gaps.max():.2f}")
+    for field in data.dtype.names:
+        if field == 't' or data.dtype[field].kind != 'f':
+            continue
+        values = data[field][np.isfinite(data[field])]
+        if len(values):
+            lines.append(f"  {field:>9s}: mean={values.mean():9.3f} min={values.min():9.3f} "
+                         f"max={values.max():9.3f}")
+    if 'status' in data.dtype.names:
+        names = {v: k or 'none' for k, v in STATUS_CODES.items()}
+        counts = np.bincount(data['status'].astype(np.int64), minlength=len(names))
+        lines.append("  status: " + ", ".join(f"{names[i]}={c}" for i, c in enumerate(counts) if c))
+        sources = {v: k or 'none' for k, v in SOURCE_CODES.items()}
+        counts = np.bincount(data['source'].astype(np.int64), minlength=len(sources))
+        lines.append("  source: " + ", ".join(f"{sources[i]}={c}" for i, c in enumerate(counts) if c))
+    if 'flags' in data.dtype.names:
+        tripped = (data['flags'] & FLAG_WATCHDOG) != 0
+        lines.append(f"  watchdog active in {tripped.sum()} cycles, "
+                     f"{np.count_nonzero(np.diff(tripped.astype(np.int8)) == 1)} trips")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?', default='telemetry')
+    parser.add_argument('--name', default='control', help="'control' or 'perception'")
+    parser.add_argument('--list', action='store_true', help='list runs and exit')
+    parser.add_argument('--run', default='latest', help="run id, 'latest' or 'all'")
+    parser.add_argument('--last', type=float, default=None, help='only the last N seconds')
+    parser.add_argument('--csv', default=None, help='write the records to this CSV file')
+    args = parser.parse_args()
+
+    if args.list:
+        for run, files in runs(args.directory, args.name).items():
+            print(f"{run}: {len(files)} file(s)")
+        return
+
+    data = load(args.directory, args.name, None if args.run == 'all' else args.run)
+    if args.last is not None and len(data):
+        data = data[data['t'] >= data['t'][-1] - args.last]
+    print(summarize(data, args.name))
+    if args.csv:
+        np.savetxt(args.csv, data, delimiter=',', header=','.join(data.dtype.names), comments='',
+                   fmt=['%.6f' if data.dtype[f].kind == 'f' else '%d' for f in data.dtype.names])
+        print(f"✓ {len(data)} records -> {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,226 +1,403 @@
 #!/usr/bin/env python3
 """
 Ball tracker with depth - Using custom trained model
-Target ball read from target.txt (green, pink, yellow, or all)
-Change target anytime: echo "yellow" > target.txt
+Target ball (green, pink, yellow, or all) set with POST /target on the stream port,
+applied on the next frame: curl -d '{"target": "yellow"}' http://<robot_ip>:8080/target
+Fallback: echo "yellow" > target.txt
+Capture, alignment, inference and control run as overlapping stages connected by
+latest-value slots (stale frames are dropped, never queued).
+Stream on :8080 - the overlay is only drawn while someone watches (at most 15 fps);
+per-frame detections/distance/status as JSON on :8080/events (SSE) and /detections.
+Glass-to-publish latency per stage on :8080/metrics (latency_trace.py).
+Usage: python3 test_coloured_model.py [--sequential] [--source live|synthetic|<recording dir>]
+                                     [--fast] [--record DIR] [--depth-mode align|roi]
+                                     [--detect-mode full|crop] [--full-every N] [--crop-imgsz PX]
+                                     [--crop-model PATH]
+                                     [--track] [--detect-every N]
+                                     [--backend ultralytics|onnx|daemon] [--model PATH[,PATH...]]
+                                     [--telemetry DIR] [--startup-log FILE]
+                                     [--offload HOST[:PORT]] [--offload-budget MS]
+Several ONNX models (one per input size, see export_models.py --imgsz) switch input
+resolution with the box size and distance (input_policy.py).
+--offload sends frames to an inference server on the laptop (offload.py); depth, FSM and
+commands stay here, and detection falls back on-device when the round trip is too slow.
+Offline, deterministic run: --sequential --source <recording dir> --fast
+Camera and model come up concurrently; the startup timeline prints at the first command
+(--startup-log appends it to a JSONL file).
 """
-import pyrealsense2 as rs
+from startup import StartupTimeline
+boot = StartupTimeline()
 import numpy as np
 import time
 import cv2
+import argparse
+import os
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from ultralytics import YOLO
+from cmd_channel import CommandWriter
+from mjpeg_server import FrameBroadcaster, start_stream_server
+from target_control import TargetControl, file_fallback
+from latency_trace import FrameTrace, LatencyTracer, glass_time
+from telemetry import Telemetry, PERCEPTION_DTYPE, SOURCE_CODES, STATUS_CODES
+from stages import Pipeline, StageCounter, format_counters
+from frame_source import add_source_args, open_source, Recorder
+from depth_roi import RoiDepth
+from crop_detect import CropDetector
+from box_tracker import BoxTracker
+from tracker_core import (CLASS_NAMES, NAME_TO_ID, COLORS, SEARCH_TIMEOUT, SEARCH_CMD,
+                          load_detector, box_center, sample_depth, fsm_command,
+                          pixel_bearing, BearingFilter)
 
-CLASS_NAMES = {0: 'green_ball', 1: 'pink_ball', 2: 'yellow_ball'}
-NAME_TO_ID = {'green': 0, 'pink': 1, 'yellow': 2, 'all': None}
-COLORS = {0: (0, 255, 0), 1: (255, 0, 255), 2: (0, 255, 255)}
+BASE = os.path.dirname(os.path.abspath(__file__))  # /home/unitree/depth_test on the robot
 
-target_file = '/home/unitree/depth_test/target.txt'
-cmd_file = '/home/unitree/depth_test/velocities.txt'
+parser = argparse.ArgumentParser(description="Ball tracker - custom model")
+parser.add_argument('--sequential', action='store_true',
+                    help='run the original single loop (for comparing stage throughput)')
+parser.add_argument('--detect-mode', choices=['full', 'crop'], default='full',
+                    help="'crop': full-frame search, then re-detect on a crop around the ball")
+parser.add_argument('--full-every', type=int, default=15,
+                    help='crop mode: force a full-frame pass every N frames')
+parser.add_argument('--crop-imgsz', type=int, default=320, help='crop mode: inference size')
+parser.add_argument('--crop-model', default=None,
+                    help='crop mode with a fixed-shape backend: ONNX export at --crop-imgsz '
+                         '(export_models.py --imgsz 320)')
+parser.add_argument('--track', action='store_true',
+                    help='propagate the box between detector runs (Kalman + optical flow)')
+parser.add_argument('--detect-every', type=int, default=1,
+                    help='run the detector on every Nth frame (N > 1 implies --track)')
+parser.add_argument('--backend', choices=['ultralytics', 'onnx', 'daemon'], default='ultralytics',
+                    help="'onnx': lean onnxruntime detector (model exported with yolo_models.py); "
+                         "'daemon': the model kept loaded by detector_daemon.py")
+parser.add_argument('--model', default=None,
+                    help='weights (default final_best.pt, or final_best.onnx for --backend onnx); '
+                         'comma-separated ONNX exports at different sizes enable adaptive resolution')
+parser.add_argument('--telemetry', default=os.path.join(BASE, 'telemetry'),
+                    help="per-frame binary records directory ('' = off, see telemetry_query.py)")
+parser.add_argument('--startup-log', default='', help='append the startup timeline to this JSONL file')
+parser.add_argument('--offload', default='', metavar='HOST[:PORT]',
+                    help='run detection on an offload.py inference server, on-device as fallback')
+parser.add_argument('--offload-budget', type=float, default=60.0,
+                    help='round-trip budget (ms) before falling back to on-device inference')
+parser.add_argument('--offload-model', default='',
+                    help='model name on the server (default: file name of --model)')
+add_source_args(parser)
+args = parser.parse_args()
+if args.model is None:
+    args.model = ('/home/unitree/depth_test/final_best.onnx' if args.backend in ('onnx', 'daemon')
+                  else '/home/unitree/depth_test/final_best.pt')
+fixed_shape = args.backend != 'ultralytics' or args.offload or ',' in args.model
+if args.detect_mode == 'crop' and fixed_shape and not args.crop_model:
+    # onnx/daemon/offload run at the export size: the crop would be letterboxed back up
+    parser.error("--detect-mode crop needs --crop-model (an ONNX export at --crop-imgsz) with "
+                 "the onnx, daemon or offload backends, or --backend ultralytics")
 
-# Initialize target file
-with open(target_file, 'w') as f:
-    f.write('all')
+target_file = os.path.join(BASE, 'target.txt')
+cmd = CommandWriter()
 
-latest_frame = None
-frame_lock = threading.Lock()
-current_target = 'all'
-target_classes = [0, 1, 2]
+# Initialize target file (best effort: the API works without it)
+try:
+    with open(target_file, 'w') as f:
+        f.write('all')
+except OSError as e:
+    print(f"✗ Cannot write {target_file} ({e}); use POST /target")
 
-def read_target():
-    global current_target, target_classes
-    try:
-        with open(target_file, 'r') as f:
-            t = f.read().strip().lower()
-            if t != current_target and t in NAME_TO_ID:
-                current_target = t
-                if t == 'all':
-                    target_classes = [0, 1, 2]
-                else:
-                    target_classes = [NAME_TO_ID[t]]
-                print(f">>> TARGET CHANGED: {current_target.upper()} <<<")
-    except:
-        pass
-
-def target_reader():
-    while True:
-        read_target()
-        time.sleep(0.5)
-
-class MJPEGHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=frame')
-        self.end_headers()
-        while True:
-            with frame_lock:
-                if latest_frame is not None:
-                    _, jpeg = cv2.imencode('.jpg', latest_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                    self.wfile.write(b'--frame\r\n')
-                    self.send_header('Content-type', 'image/jpeg')
-                    self.send_header('Content-length', len(jpeg))
-                    self.end_headers()
-                    self.wfile.write(jpeg.tobytes())
-                    self.wfile.write(b'\r\n')
-            time.sleep(0.033)
-    def log_message(self, format, *args): pass
-
-def start_server():
-    server = HTTPServer(('0.0.0.0', 8080), MJPEGHandler)
-    server.serve_forever()
-
-threading.Thread(target=start_server, daemon=True).start()
-threading.Thread(target=target_reader, daemon=True).start()
+def draw_overlay(image, state):
+    """Target, box and status text; runs on the stream's encoder thread."""
+    t_color = COLORS.get(NAME_TO_ID.get(state['target']), (255,255,255))
+    cv2.putText(image, f"Target: {state['target']}", (10, 25),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, t_color, 2)
+    det = state['detection']
+    if det is not None:
+        x1, y1, x2, y2 = det['box']
+        color = COLORS.get(det['cls'], (255, 255, 255))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2 if det['source'] == 'detector' else 1)
+        cv2.circle(image, tuple(det['center']), 5, color, -1)
+        if state['status'] is not None:
+            cv2.putText(image, f"{det['name']} {state['distance']:.2f}m {state['status']}",
+                       (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    elif state['status'] == 'SEARCHING':
+        cv2.putText(image, f"SEARCHING {state['target']}...", (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    return image
+
+stream = FrameBroadcaster(quality=70, max_fps=15, render=draw_overlay)
+targets = TargetControl('all')
+
+def post_target(request):
+    """POST /target {"target": "yellow"} -> {"target", "frame", "apply_ms"} once applied."""
+    return targets.request(request['target'], timeout=1.0)
+
+tracer = LatencyTracer('tracker')
+start_stream_server(stream, port=8080, actions={'/target': post_target},
+                    pages={'/metrics': lambda: ('text/plain; version=0.0.4', tracer.prometheus())})
+# target.txt stays as a fallback for scripts and ssh
+threading.Thread(target=file_fallback, args=(targets, target_file), daemon=True).start()
 
 print("="*60)
 print("BALL TRACKER - CUSTOM MODEL")
 print("="*60)
-print(f"Stream: http://<robot_ip>:8080")
-print(f"Change target: echo 'yellow' > {target_file}")
+print("Stream: http://<robot_ip>:8080  (detections: /events, /detections)")
+print("Change target: curl -d '{\"target\": \"yellow\"}' http://<robot_ip>:8080/target")
+print(f"          or: echo 'yellow' > {target_file}")
 print("Options: green, pink, yellow, all")
 
-print("\n1. Initializing RealSense...")
-pipeline = rs.pipeline()
-config = rs.config()
-config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-profile = pipeline.start(config)
-depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+def load_local():
+    """(detect_fn, MultiResDetector or None) on this device."""
+    if args.backend == 'onnx' and ',' in args.model:
+        from input_policy import MultiResDetector
+        from onnx_detector import GRAPH_CACHE_DIR
+        multires = MultiResDetector(args.model.split(','), cache_dir=GRAPH_CACHE_DIR)
+        return multires.detect, multires
+    return load_detector(args.backend, args.model), None  # includes 3 warm-up passes
+
+def load_model():
+    """(detect_fn, MultiResDetector or None, OffloadDetector or None); runs concurrently
+    with the camera start. With --offload the local model loads in the background as the
+    fallback."""
+    if args.offload:
+        from offload import OffloadDetector, parse_host
+        host, port = parse_host(args.offload)
+        name = args.offload_model or os.path.basename(args.model.split(',')[0])
+        offload = OffloadDetector(host, port, name, local=lambda: load_local()[0],
+                                  budget_ms=args.offload_budget)
+        return offload.detect, None, offload
+    return (*load_local(), None)
+
+boot.mark('imports + stream server')
+print(f"\n1. Initializing frame source ({args.source}) and loading model ({args.backend}: {args.model})...")
+camera = boot.start('camera', lambda: open_source(args).start())  # live: starts RealSense and warms up
+model = boot.start('model', load_model)
+crop_model = boot.start('crop model', load_detector, 'onnx', args.crop_model) if args.crop_model else None
+source = camera.result()
+depth_scale = source.depth_scale
 print(f"✓ Depth scale: {depth_scale}")
-align = rs.align(rs.stream.color)
-
-print("Warming up...")
-for i in range(30):
-    pipeline.poll_for_frames()
-    time.sleep(0.033)
-print("✓ RealSense ready")
-
-print("\n2. Loading model...")
-model = YOLO('/home/unitree/depth_test/final_best.pt', task='detect')
-for _ in range(3):
-    model(np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8), verbose=False)
+if source.aligned:
+    depth_at = sample_depth
+else:
+    # Raw depth: map only the 7x7 patch around the box center into color
+    depth_at = RoiDepth(source.geometry).sample
+    print("✓ ROI depth mapping (no full-frame align)")
+recorder = Recorder(args.record, source.meta()) if args.record else None
+tlm = Telemetry(args.telemetry, 'perception', PERCEPTION_DTYPE).start() if args.telemetry else None
+print("✓ Frame source ready")
+
+detect_fn, multires, offload = model.result()
+if offload is not None:
+    print(f"✓ Offloading inference to {args.offload} (budget {args.offload_budget:.0f} ms, on-device fallback)")
+if multires is not None:
+    print(f"✓ Adaptive input size: {', '.join(f'{w}x{h}' for h, w in multires.policy.sizes)}")
+
+detector = None
+if args.detect_mode == 'crop':
+    detector = CropDetector(detect_fn, full_every=args.full_every, crop_imgsz=args.crop_imgsz,
+                            crop_fn=crop_model.result() if crop_model is not None else None)
+    print(f"✓ Crop-and-track detection (full frame every {args.full_every}, crop at {args.crop_imgsz}px)")
+tracker = None
+if args.track or args.detect_every > 1:
+    tracker = BoxTracker()
+    print(f"✓ Box tracking between detections (detector every {args.detect_every} frame(s))")
 print("✓ Model ready")
 
-with open(cmd_file, 'w') as f:
-    f.write('0.0,0.0,0.0')
+cmd.send(0.0, 0.0, 0.0)
 
 print("\n" + "="*60)
 print("TRACKING ACTIVE")
 print("="*60 + "\n")
 
-try:
-    loop_count = 0
-    last_detection_time = time.time()
-    ball_found = False
-    
+# --- Stages -------------------------------------------------------------
+last_detection_time = None  # camera time (s), so replays are deterministic
+bearing_filter = BearingFilter()  # bearing + rate sent with each command for file_control's prediction
+ball_found = False
+
+def capture():
+    """Blocks on the source (the camera wait releases the GIL)."""
+    return source.read()
+
+def align_frames(pkt):
+    trace = FrameTrace(pkt.frame_no, glass_time(pkt))
+    trace.mark('capture', pkt.t_capture)
+    pkt = source.prepare(pkt)  # depth-to-color alignment for the live camera
+    if pkt is None:
+        return None
+    trace.mark('align')
+    pkt.trace = trace
+    if recorder is not None:
+        recorder.record(pkt)
+    return pkt
+
+last_target = None
+detect_calls = 0
+
+def detect(pkt):
+    global last_target, detect_calls
+    pkt.target, classes = targets.apply(pkt.frame_no)  # API switches land on this frame
+    if pkt.target != last_target:
+        # New target: search the full frame, forget the propagated box
+        if detector is not None:
+            detector.reset()
+        if tracker is not None:
+            tracker.reset()
+    last_target = pkt.target
+
+    run_detector = detect_calls % args.detect_every == 0
+    detect_calls += 1
+    detection = None
+    if run_detector:
+        if detector is None:
+            detection = detect_fn(pkt.color_image, classes, None)
+        else:
+            detection = detector.detect(pkt.color_image, classes)
+
+    pkt.track = None
+    if tracker is None:
+        pkt.detection = detection
+    else:
+        # Skipped frames and single misses coast on the tracker until its confidence drops
+        pkt.track = tracker.step(pkt.color_image, pkt.timestamp / 1000.0, detection, run_detector)
+        pkt.detection = pkt.track.detection if pkt.track is not None else None
+    pkt.trace.mark('inference')
+    return pkt
+
+def publish_state(pkt, state):
+    """Detections/status to /events and telemetry every frame; an overlay frame only if
+    someone watches."""
+    if tlm is not None:
+        det = state['detection']
+        box = det['box'] if det is not None else (0, 0, 0, 0)
+        vx, vyaw = state['cmd'] if state['cmd'] is not None else (0.0, 0.0)
+        target_id = NAME_TO_ID.get(state['target'])
+        tlm.record((time.monotonic(), pkt.frame_no, pkt.timestamp,
+                    -1 if target_id is None else target_id,
+                    SOURCE_CODES.get(det['source'], 0) if det is not None else 0,
+                    det['cls'] if det is not None else -1,
+                    STATUS_CODES.get(state['status'], 0),
+                    det['conf'] if det is not None else 0.0, *box,
+                    state['distance'] if state['distance'] is not None else np.nan, vx, vyaw))
+    stream.events.publish(state)
+    if stream.wants_frame():
+        stream.publish(pkt.color_image.copy(), state)
+
+def control(pkt):
+    global last_detection_time, ball_found
+    now = pkt.timestamp / 1000.0
+    if last_detection_time is None:
+        last_detection_time = now
+    state = {'frame': pkt.frame_no, 't': now, 'target': pkt.target, 'detection': None,
+             'distance': None, 'status': None, 'cmd': None}
+
+    if pkt.detection is not None:
+        last_detection_time = now
+        xyxy, conf, cls_id = pkt.detection
+        cls_name = CLASS_NAMES.get(cls_id, f"class_{cls_id}")
+        x_center, y_center = box_center(xyxy)
+        bearing, bearing_rate = bearing_filter.update(pkt.trace.t_glass, pixel_bearing(x_center))
+        state['detection'] = {'box': [int(v) for v in xyxy], 'center': [x_center, y_center],
+                              'conf': round(float(conf), 3), 'cls': int(cls_id), 'name': cls_name,
+                              'source': pkt.track.source if pkt.track is not None else 'detector'}
+
+        distance = depth_at(pkt.depth_image, x_center, y_center, depth_scale)
+        pkt.trace.mark('depth')
+        if multires is not None:
+            multires.observe_distance(distance)
+        if distance is None:
+            publish_state(pkt, state)
+            return
+
+        vx, vyaw, status = fsm_command(x_center, distance)
+        pkt.trace.mark('fsm')
+        state.update(distance=round(distance, 3), status=status, cmd=[vx, vyaw])
+
+        if status == "HOLDING" and not ball_found:
+            print(f"Ball found: {cls_name}")
+            ball_found = True
+
+        cmd.send(vx, 0.0, vyaw, frame_id=pkt.frame_no, t_frame=pkt.trace.t_glass,
+                 bearing=bearing, bearing_rate=bearing_rate)
+        pkt.trace.mark('publish')
+        tracer.add(pkt.trace)
+        boot.finish('first command', args.startup_log)
+
+        if pkt.frame_no % 10 == 0:
+            track = f" | {pkt.track.source} {pkt.track.confidence:.2f}" if pkt.track is not None else ""
+            print(f"{status:12s} | {cls_name:11s} | dist: {distance:5.2f}m | conf={conf:.2f}{track}")
+
+    else:
+        ball_found = False
+        if now - last_detection_time > SEARCH_TIMEOUT:
+            cmd.send(*SEARCH_CMD)
+            boot.finish('first command', args.startup_log)
+            state.update(status='SEARCHING', cmd=[SEARCH_CMD[0], SEARCH_CMD[2]])
+            if pkt.frame_no % 10 == 0:
+                print(f"SEARCHING {pkt.target}...")
+
+    publish_state(pkt, state)
+
+STAGES = [('capture', capture), ('align', align_frames), ('inference', detect), ('control', control)]
+STATS_EVERY = 5.0  # seconds
+
+def print_stats(table):
+    print(table)
+    if detector is not None:
+        print(detector.format_stats())
+    if tracker is not None:
+        print(tracker.format_stats())
+    if multires is not None:
+        print(multires.format_stats())
+    if offload is not None:
+        print(offload.format_stats())
+    print(stream.format_stats())
+    print(targets.format_stats())
+    print(tracer.format())
+
+def run_sequential():
+    """The original single loop: every step in sequence, then a 10 ms sleep."""
+    counters = [StageCounter(name) for name, _ in STAGES]
+    next_stats = time.monotonic() + STATS_EVERY
     while True:
-        loop_count += 1
-        frames = pipeline.poll_for_frames()
-        if not frames:
+        t0 = time.perf_counter()
+        pkt = source.poll()
+        if pkt is None:
             time.sleep(0.01)
             continue
-        
-        aligned = align.process(frames)
-        depth_frame = aligned.get_depth_frame()
-        color_frame = aligned.get_color_frame()
-        if not depth_frame or not color_frame:
-            continue
-        
-        depth_image = np.asanyarray(depth_frame.get_data())
-        color_image = np.asanyarray(color_frame.get_data())
-        display_image = color_image.copy()
-        
-        # Show target on display
-        t_color = COLORS.get(NAME_TO_ID.get(current_target), (255,255,255))
-        cv2.putText(display_image, f"Target: {current_target}", (10, 25),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, t_color, 2)
-        
-        results = model(color_image, classes=target_classes, verbose=False)
-        
-        if len(results[0].boxes) > 0:
-            last_detection_time = time.time()
-            box = results[0].boxes[0]
-            conf = float(box.conf.cpu().numpy()[0])
-            cls_id = int(box.cls.cpu().numpy()[0])
-            cls_name = CLASS_NAMES.get(cls_id, f"class_{cls_id}")
-            color = COLORS.get(cls_id, (255, 255, 255))
-            xyxy = box.xyxy.cpu().numpy()[0].astype(int)
-            
-            cv2.rectangle(display_image, (xyxy[0], xyxy[1]), (xyxy[2], xyxy[3]), color, 2)
-            
-            x_center = int((xyxy[0] + xyxy[2]) / 2)
-            y_center = int((xyxy[1] + xyxy[3]) / 2)
-            x_c = max(5, min(634, x_center))
-            y_c = max(5, min(474, y_center))
-            
-            cv2.circle(display_image, (x_center, y_center), 5, color, -1)
-            
-            depth_region = depth_image[y_c-3:y_c+4, x_c-3:x_c+4]
-            valid_depths = depth_region[depth_region > 0]
-            
-            if len(valid_depths) < 5:
-                with frame_lock:
-                    latest_frame = display_image
-                continue
-            
-            distance = np.median(valid_depths) * depth_scale
-            
-            if distance < 0.1 or distance > 3.0:
-                with frame_lock:
-                    latest_frame = display_image
-                continue
-            
-            error = x_center - 320
-            turn_speed = -error / 320.0
-            if abs(turn_speed) < 0.08:
-                turn_speed = 0.0
-            
-            d_error = distance - 0.45
-            
-            if distance < 0.15:
-                vx, vyaw, status = -0.15, turn_speed * 0.5, "TOO CLOSE"
-            elif abs(d_error) < 0.05:
-                vx, vyaw, status = 0.0, turn_speed, "HOLDING"
-            elif d_error > 0.4:
-                vx, vyaw, status = 0.30, turn_speed * 0.7, "APPROACHING"
-            elif d_error > 0:
-                vx, vyaw, status = 0.30, turn_speed * 0.8, "CREEPING"
-            else:
-                vx, vyaw, status = -0.12, turn_speed * 0.6, "BACKING"
-            
-            cv2.putText(display_image, f"{cls_name} {distance:.2f}m {status}", 
-                       (xyxy[0], xyxy[1]-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            if status == "HOLDING" and not ball_found:
-                print(f"Ball found: {cls_name}")
-                ball_found = True
-            
-            with open(cmd_file, 'w') as f:
-                f.write(f'{vx:.3f},0.0,{vyaw:.3f}')
-            
-            if loop_count % 10 == 0:
-                print(f"{status:12s} | {cls_name:11s} | dist: {distance:5.2f}m | conf={conf:.2f}")
-        
-        else:
-            ball_found = False
-            if time.time() - last_detection_time > 0.5:
-                with open(cmd_file, 'w') as f:
-                    f.write('0.0,0.0,0.4')
-                cv2.putText(display_image, f"SEARCHING {current_target}...", (10, 60),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                if loop_count % 10 == 0:
-                    print(f"SEARCHING {current_target}...")
-        
-        with frame_lock:
-            latest_frame = display_image
-        
+        counters[0].busy += time.perf_counter() - t0
+        counters[0].frames += 1
+        for (name, fn), counter in zip(STAGES[1:], counters[1:]):
+            with counter.timing():
+                pkt = fn(pkt)
+            if pkt is None:
+                break
+        if time.monotonic() > next_stats:
+            print_stats(format_counters(counters))
+            next_stats += STATS_EVERY
         time.sleep(0.01)
 
+def run_pipelined():
+    stage_pipeline = Pipeline(STAGES).start()
+    try:
+        while not stage_pipeline.wait(STATS_EVERY):
+            print_stats(stage_pipeline.format_stats())
+    finally:
+        stage_pipeline.stop()
+        print_stats(stage_pipeline.format_stats())
+
+try:
+    if args.sequential:
+        run_sequential()
+    else:
+        run_pipelined()
+
 except KeyboardInterrupt:
     print("\nStopping...")
+except EOFError:
+    print("\nEnd of recording")
 finally:
-    with open(cmd_file, 'w') as f:
-        f.write('0.0,0.0,0.0')
-    pipeline.stop()
+    cmd.send(0.0, 0.0, 0.0)
+    source.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.frames} frames to {args.record} ({recorder.dropped} dropped)")
+    if tlm is not None:
+        tlm.close()
+        print(tlm.format_stats())
+    if offload is not None:
+        offload.close()
     print("Stopped")
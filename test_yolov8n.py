@@ -2,54 +2,60 @@
 """
 Ball tracker with depth - CORRECTED POLLING
 Prints 'ball found' when entering holding mode
+Runs yolov8s.onnx directly on onnxruntime (--backend ultralytics for the old path,
+--backend daemon to use the model kept loaded by detector_daemon.py)
+Per-stage glass-to-publish latency is printed at exit (and on /metrics with --metrics-port)
+Every frame's detection, distance and command go to --telemetry (telemetry_query.py --name perception)
+Camera and model come up concurrently; the startup timeline prints at the first command
 """
-import pyrealsense2 as rs
-import numpy as np
+from startup import StartupTimeline
+boot = StartupTimeline()
 import time
+import argparse
 import os
-from ultralytics import YOLO
+from cmd_channel import CommandWriter
+from frame_source import add_source_args, open_source, Recorder
+from tracker_core import sample_depth, load_detector, pixel_bearing, BearingFilter
+from depth_roi import RoiDepth
+from latency_trace import FrameTrace, LatencyTracer, glass_time, serve_metrics
+from telemetry import Telemetry, PERCEPTION_DTYPE, perception_record
+
+BASE = os.path.dirname(os.path.abspath(__file__))  # /home/unitree/depth_test on the robot
+
+parser = argparse.ArgumentParser(description="Ball tracker with depth")
+parser.add_argument('--backend', choices=['onnx', 'ultralytics', 'daemon'], default='onnx')
+parser.add_argument('--metrics-port', type=int, default=0, help='serve latency on /metrics (0 = off)')
+parser.add_argument('--startup-log', default='', help='append the startup timeline to this JSONL file')
+parser.add_argument('--telemetry', default=os.path.join(BASE, 'telemetry'),
+                    help="per-frame binary records directory ('' = off, see telemetry_query.py)")
+add_source_args(parser)
+args = parser.parse_args()
 
 print("="*60)
 print("BALL TRACKER WITH DEPTH")
 print("="*60)
 
-print("\n1. Initializing RealSense...")
-pipeline = rs.pipeline()
-config = rs.config()
-
-config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-
-print("Starting pipeline...")
-profile = pipeline.start(config)
-
-depth_sensor = profile.get_device().first_depth_sensor()
-depth_scale = depth_sensor.get_depth_scale()
+boot.mark('imports + args')
+print(f"\n1. Initializing frame source ({args.source}) and loading ONNX model ({args.backend})...")
+camera = boot.start('camera', lambda: open_source(args).start())  # live: starts RealSense and warms up
+model = boot.start('model', load_detector, args.backend, 'yolov8s.onnx')
+source = camera.result()
+depth_scale = source.depth_scale
 print(f"✓ Depth scale: {depth_scale}")
-
-align = rs.align(rs.stream.color)
-
-# Warmup
-print("Warming up (polling mode)...")
-for i in range(30):
-    frames = pipeline.poll_for_frames()
-    if frames and i % 10 == 0:
-        print(f"  {i}/30")
-    time.sleep(0.033)
-
-print("✓ RealSense ready")
-
-# YOLO
-print("\n2. Loading ONNX model...")
-model = YOLO('yolov8s.onnx', task='detect')
-dummy = np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8)
-for _ in range(3):
-    _ = model(dummy, classes=[32], verbose=False)
+# Raw depth (--depth-mode roi): map only the patch around the box into color
+depth_at = sample_depth if source.aligned else RoiDepth(source.geometry).sample
+recorder = Recorder(args.record, source.meta()) if args.record else None
+tlm = Telemetry(args.telemetry, 'perception', PERCEPTION_DTYPE).start() if args.telemetry else None
+print("✓ Frame source ready")
+detect_fn = model.result()
 print("✓ Model ready")
 
-cmd_file = '/home/unitree/depth_test/velocities.txt'
-with open(cmd_file, 'w') as f:
-    f.write('0.0,0.0,0.0')
+cmd = CommandWriter()
+cmd.send(0.0, 0.0, 0.0)
+tracer = LatencyTracer('yolov8n')
+bearing_filter = BearingFilter()  # bearing + rate for file_control's latency compensation
+if args.metrics_port:
+    serve_metrics(tracer, args.metrics_port)
 
 print("\n" + "="*60)
 print("TRACKING ACTIVE")
@@ -57,59 +63,60 @@ print("="*60 + "\n")
 
 try:
     loop_count = 0
-    last_detection_time = time.time()
+    last_detection_time = None  # camera time (s), so replays are deterministic
     ball_found = False  # Flag for ball found
     
     while True:
         loop_count += 1
         
         # Poll for frames
-        frames = pipeline.poll_for_frames()
+        pkt = source.poll()
         
-        if not frames:
+        if pkt is None:
             print("No frames")  # Debug print
             time.sleep(0.01)
             continue
         
-        # Align
-        aligned = align.process(frames)
-        depth_frame = aligned.get_depth_frame()
-        color_frame = aligned.get_color_frame()
+        # Align (no-op for recorded/synthetic frames)
+        trace = FrameTrace(pkt.frame_no, glass_time(pkt))
+        trace.mark('capture', pkt.t_capture)
+        pkt = source.prepare(pkt)
         
-        if not depth_frame or not color_frame:
+        if pkt is None:
             print("No depth/color frame")  # Debug print
             continue
+        trace.mark('align')
+        if recorder is not None:
+            recorder.record(pkt)
         
-        depth_image = np.asanyarray(depth_frame.get_data())
-        color_image = np.asanyarray(color_frame.get_data())
+        now = pkt.timestamp / 1000.0
+        if last_detection_time is None:
+            last_detection_time = now
+        depth_image = pkt.depth_image
+        color_image = pkt.color_image
         
         # Detect
-        results = model(color_image, classes=[32], verbose=False)
+        detection = detect_fn(color_image, [32])
+        trace.mark('inference')
         
-        if len(results[0].boxes) > 0:
-            last_detection_time = time.time()
+        if detection is not None:
+            last_detection_time = now
             
-            box = results[0].boxes[0]
-            conf = float(box.conf.cpu().numpy()[0])
-            xyxy = box.xyxy.cpu().numpy()[0]
+            xyxy, conf, _ = detection
             
             x_center = int((xyxy[0] + xyxy[2]) / 2)
             y_center = int((xyxy[1] + xyxy[3]) / 2)
             x_center = max(5, min(634, x_center))
             y_center = max(5, min(474, y_center))
+            bearing, bearing_rate = bearing_filter.update(trace.t_glass, pixel_bearing(x_center))
             
-            # Depth
-            x1, x2 = x_center - 3, x_center + 4
-            y1, y2 = y_center - 3, y_center + 4
-            depth_region = depth_image[y1:y2, x1:x2]
-            valid_depths = depth_region[depth_region > 0]
-            
-            if len(valid_depths) < 5:
-                continue
-            
-            distance = np.median(valid_depths) * depth_scale
+            # Depth (7x7 median; None if too few valid pixels or out of range)
+            distance = depth_at(depth_image, x_center, y_center, depth_scale)
+            trace.mark('depth')
             
-            if distance < 0.1 or distance > 3.0:
+            if distance is None:
+                if tlm is not None:
+                    tlm.record(perception_record(pkt, 32, detection, None, None))
                 continue
             
             # Control
@@ -131,14 +138,20 @@ try:
                 vx, vyaw, status = 0.30, turn_speed * 0.8, "CREEPING"
             else:
                 vx, vyaw, status = -0.12, turn_speed * 0.6, "BACKING"
+            trace.mark('fsm')
             
             # Print 'ball found' when entering holding
             if status == "HOLDING" and not ball_found:
                 print("Ball found")
                 ball_found = True
             
-            with open(cmd_file, 'w') as f:
-                f.write(f'{vx:.3f},0.0,{vyaw:.3f}')
+            cmd.send(vx, 0.0, vyaw, frame_id=pkt.frame_no, t_frame=trace.t_glass,
+                     bearing=bearing, bearing_rate=bearing_rate)
+            trace.mark('publish')
+            tracer.add(trace)
+            if tlm is not None:
+                tlm.record(perception_record(pkt, 32, detection, distance, status, vx, vyaw))
+            boot.finish('first command', args.startup_log)
             
             if loop_count % 10 == 0:
                 print(f"{status:12s} | dist: {distance:5.2f}m | x={x_center:3d} | "
@@ -147,20 +160,32 @@ try:
         else:
             # No detection: search
             ball_found = False  # Reset flag when ball lost
-            if time.time() - last_detection_time > 0.5:
-                with open(cmd_file, 'w') as f:
-                    f.write('0.0,0.0,0.4')
+            if now - last_detection_time > 0.5:
+                cmd.send(0.0, 0.0, 0.4)
+                boot.finish('first command', args.startup_log)
+                if tlm is not None:
+                    tlm.record(perception_record(pkt, 32, None, None, 'SEARCHING', 0.0, 0.4))
                 if loop_count % 10 == 0:
                     print("SEARCHING...")
             else:
                 print("Waiting for search")  # Debug print
+                if tlm is not None:
+                    tlm.record(perception_record(pkt, 32, None, None, None))
         
         time.sleep(0.01)
 
 except KeyboardInterrupt:
     print("\nStopping...")
+except EOFError:
+    print("\nEnd of recording")
 finally:
-    with open(cmd_file, 'w') as f:
-        f.write('0.0,0.0,0.0')
-    pipeline.stop()
+    cmd.send(0.0, 0.0, 0.0)
+    source.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.frames} frames to {args.record} ({recorder.dropped} dropped)")
+    if tlm is not None:
+        tlm.close()
+        print(tlm.format_stats())
+    print(tracer.format())
     print("Stopped")
\ No newline at end of file
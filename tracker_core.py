@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Shared perception/control logic of the ball trackers (no camera, model or robot I/O)
+Depth sampling around the box center, the distance/turn state machine and the target
+bearing estimate that goes with each command (for control_loop.SetpointShaper)
+"""
+import math
+import os
+
+import numpy as np
+
+CLASS_NAMES = {0: 'green_ball', 1: 'pink_ball', 2: 'yellow_ball'}
+NAME_TO_ID = {'green': 0, 'pink': 1, 'yellow': 2, 'all': None}
+COLORS = {0: (0, 255, 0), 1: (255, 0, 255), 2: (0, 255, 255)}
+
+FRAME_W, FRAME_H = 640, 480
+FOCAL_PX = 385.0  # D435 color at 640x480, approximately
+# slope of the FSM turn law in rad/s of vyaw per rad of bearing (small angles, HOLDING)
+YAW_PER_BEARING = -FOCAL_PX / (FRAME_W / 2.0)
+TARGET_DISTANCE = 0.45
+SEARCH_TIMEOUT = 0.5
+SEARCH_CMD = (0.0, 0.0, 0.4)
+
+
+class FramePacket:
+    """Everything one camera frame accumulates on its way through the stages."""
+
+    def __init__(self, frame_no, t_capture, **fields):
+        self.frame_no = frame_no
+        self.t_capture = t_capture
+        self.__dict__.update(fields)
+
+
+def first_detection(results):
+    """(xyxy int array, conf, cls_id) of the top ultralytics box, or None."""
+    boxes = results[0].boxes
+    if len(boxes) == 0:
+        return None
+    box = boxes[0]
+    conf = float(box.conf.cpu().numpy()[0])
+    cls_id = int(box.cls.cpu().numpy()[0])
+    xyxy = box.xyxy.cpu().numpy()[0].astype(int)
+    return xyxy, conf, cls_id
+
+
+def yolo_detect(model, image, classes, imgsz=None):
+    """Top detection of an ultralytics model on `image`; imgsz=None keeps the model default."""
+    kwargs = {'imgsz': imgsz} if imgsz else {}
+    return first_detection(model(image, classes=classes, verbose=False, **kwargs))
+
+
+def load_detector(backend, path, warmup=3):
+    """detect_fn(image, classes, imgsz) -> (xyxy, conf, cls_id) or None for any backend.
+    'onnx' runs onnx_detector.OnnxDetector and never imports ultralytics; its input size
+    is fixed by the export, so imgsz is ignored. 'daemon' uses the model already loaded by
+    detector_daemon.py (matched by file name) and falls back to loading it in-process.
+    ONNX graphs are optimized once and cached in onnx_detector.GRAPH_CACHE_DIR."""
+    if backend == 'daemon':
+        from detector_daemon import DetectorClient
+        try:
+            client = DetectorClient(os.path.basename(path))
+            print(f"✓ Using resident {client.model} from detector_daemon.py")
+            return lambda image, classes, imgsz=None: client.top(image, classes)
+        except ConnectionError as e:
+            print(f"✗ {e} - loading in-process")
+            backend = 'onnx' if path.endswith('.onnx') else 'ultralytics'
+    if backend == 'onnx':
+        from onnx_detector import GRAPH_CACHE_DIR, OnnxDetector
+        det = OnnxDetector(path, cache_dir=GRAPH_CACHE_DIR)
+        det.warmup(warmup)
+        return lambda image, classes, imgsz=None: det.top(image, classes)
+    from ultralytics import YOLO
+    model = YOLO(path, task='detect')
+    for _ in range(warmup):
+        model(np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8), verbose=False)
+    return lambda image, classes, imgsz=None: yolo_detect(model, image, classes, imgsz)
+
+
+def box_center(xyxy):
+    return int((xyxy[0] + xyxy[2]) / 2), int((xyxy[1] + xyxy[3]) / 2)
+
+
+def sample_depth(depth_image, x_center, y_center, depth_scale):
+    """Median depth (m) of the 7x7 patch at the box center, or None if unusable."""
+    x_c = max(5, min(FRAME_W - 6, x_center))
+    y_c = max(5, min(FRAME_H - 6, y_center))
+    depth_region = depth_image[y_c-3:y_c+4, x_c-3:x_c+4]
+    valid_depths = depth_region[depth_region > 0]
+    if len(valid_depths) < 5:
+        return None
+    distance = np.median(valid_depths) * depth_scale
+    if distance < 0.1 or distance > 3.0:
+        return None
+    return float(distance)
+
+
+def fsm_command(x_center, distance):
+    """(vx, vyaw, status) for a target at pixel column x_center and distance (m)."""
+    error = x_center - FRAME_W // 2
+    turn_speed = -error / (FRAME_W / 2.0)
+    if abs(turn_speed) < 0.08:
+        turn_speed = 0.0
+
+    d_error = distance - TARGET_DISTANCE
+
+    if distance < 0.15:
+        return -0.15, turn_speed * 0.5, "TOO CLOSE"
+    elif abs(d_error) < 0.05:
+        return 0.0, turn_speed, "HOLDING"
+    elif d_error > 0.4:
+        return 0.30, turn_speed * 0.7, "APPROACHING"
+    elif d_error > 0:
+        return 0.30, turn_speed * 0.8, "CREEPING"
+    else:
+        return -0.12, turn_speed * 0.6, "BACKING"
+
+
+def pixel_bearing(x_center):
+    """Bearing (rad) of pixel column x_center, + = right of the image center."""
+    return math.atan2(x_center - FRAME_W / 2.0, FOCAL_PX)
+
+
+class BearingFilter:
+    """Alpha-beta filter on the target bearing: (bearing, rate) at each frame's glass time.
+    Restarts (rate 0) after a gap longer than max_gap, e.g. when the target was lost."""
+
+    def __init__(self, alpha=0.6, beta=0.2, max_gap=0.3):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_gap = max_gap
+        self.t = None
+        self.bearing = 0.0
+        self.rate = 0.0
+
+    def update(self, t, bearing):
+        dt = t - self.t if self.t is not None else None
+        if dt is None or dt > self.max_gap or dt <= 0:
+            self.bearing, self.rate = bearing, 0.0
+        else:
+            predicted = self.bearing + self.rate * dt
+            residual = bearing - predicted
+            self.bearing = predicted + self.alpha * residual
+            self.rate += self.beta * residual / dt
+        self.t = t
+        return self.bearing, self.rate
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Pre-decoded training image cache for fast CPU retraining
+Every image of a split is decoded once, resized (long side = imgsz, as ultralytics does)
+and stored in a fixed imgsz x imgsz slot of a memory-mapped uint8 array, with the parsed
+labels next to it, under TRAIN_CACHE_DIR/<dataset hash>. The hash covers the file names,
+sizes and mtimes of all images and labels and imgsz, so adding or relabelling data makes
+a new cache and an unchanged dataset reuses the old one across runs.
+CachedDetectionTrainer reads images and labels straight from the cache, so an epoch only
+pays for augmentation (mosaic, letterbox, HSV, flips) instead of JPEG decode + resize.
+
+Usage: python3 train_cache.py build --data dataset/data.yaml [--imgsz 640] [--workers 4]
+       python3 train_cache.py train --data dataset/data.yaml [--model yolov8n.pt] [--epochs 100]
+In code:
+    YOLO('yolov8n.pt').train(data='data.yaml', epochs=100, trainer=CachedDetectionTrainer)
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import shutil
+import time
+import warnings
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+
+from export_models import split_images
+
+TRAIN_CACHE_DIR = os.path.expanduser('~/.cache/bolt/train')
+CACHE_VERSION = 1
+PAD_VALUE = 114  # ultralytics letterbox grey
+
+
+def label_path(image_path):
+    """YOLO layout: .../images/x.jpg -> .../labels/x.txt."""
+    head, tail = os.path.split(image_path)
+    parent, leaf = os.path.split(head)
+    return os.path.join(parent, 'labels' if leaf == 'images' else leaf, os.path.splitext(tail)[0] + '.txt')
+
+
+def dataset_hash(image_paths, imgsz):
+    """Hex key over (name, size, mtime) of every image and its label, plus imgsz."""
+    h = hashlib.sha1(f"v{CACHE_VERSION}:{imgsz}".encode())
+    for path in image_paths:
+        for p in (path, label_path(path)):
+            try:
+                st = os.stat(p)
+                h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+            except OSError:
+                h.update(f"{p}:-\n".encode())
+    return h.hexdigest()[:16]
+
+
+def read_labels(path):
+    """(n, 5) float32 rows of cls, x, y, w, h (normalized); empty if missing."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # empty label file = background image
+            rows = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    except (OSError, ValueError):
+        return np.zeros((0, 5), np.float32)
+    return rows[:, :5] if rows.size else np.zeros((0, 5), np.float32)
+
+
+def resize_long_side(image, imgsz):
+    """Same resize as ultralytics BaseDataset.load_image (rect_mode, training)."""
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    return image
+
+
+class TrainCache:
+    """Opened cache of one split: images (N, S, S, 3) memmap, hw/orig (N, 2), labels."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as f:
+            self.index = json.load(f)
+        self.files = self.index['files']
+        self.imgsz = self.index['imgsz']
+        meta = np.load(os.path.join(directory, 'meta.npz'))
+        self.hw = meta['hw']
+        self.orig = meta['orig']
+        self.labels = meta['labels']
+        self.offsets = meta['offsets']
+        self.images = np.memmap(os.path.join(directory, 'images.u8'), np.uint8, 'r',
+                                shape=(len(self.files), self.imgsz, self.imgsz, 3))
+
+    def __len__(self):
+        return len(self.files)
+
+    def image(self, i):
+        """Resized image i as a writable copy (augmentations work in place)."""
+        h, w = self.hw[i]
+        return np.array(self.images[i, :h, :w])
+
+    def label_rows(self, i):
+        return self.labels[self.offsets[i]:self.offsets[i + 1]]
+
+
+def _fill_slot(job):
+    """Worker: decode, resize and write one image into the memmap; (h, w, h0, w0)."""
+    path, array_path, n, imgsz, i = job
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"cannot decode {path}")
+    h0, w0 = image.shape[:2]
+    resized = resize_long_side(image, imgsz)
+    h, w = resized.shape[:2]
+    images = np.memmap(array_path, np.uint8, 'r+', shape=(n, imgsz, imgsz, 3))
+    images[i] = PAD_VALUE
+    images[i, :h, :w] = resized
+    images.flush()
+    return h, w, h0, w0
+
+
+def build_cache(image_paths, imgsz=640, root=TRAIN_CACHE_DIR, workers=None, verbose=True):
+    """TrainCache for these images, building it if no cache with the same hash exists."""
+    key = dataset_hash(image_paths, imgsz)
+    directory = os.path.join(root, key)
+    if os.path.exists(os.path.join(directory, 'index.json')):
+        return TrainCache(directory)
+    t0 = time.perf_counter()
+    tmp = f"{directory}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    n = len(image_paths)
+    array_path = os.path.join(tmp, 'images.u8')
+    np.memmap(array_path, np.uint8, 'w+', shape=(max(n, 1), imgsz, imgsz, 3)).flush()
+    jobs = [(p, array_path, max(n, 1), imgsz, i) for i, p in enumerate(image_paths)]
+    with mp.Pool(max(1, min(workers or os.cpu_count() or 1, n or 1))) as pool:
+        shapes = pool.map(_fill_slot, jobs, chunksize=16)
+    rows = [read_labels(label_path(p)) for p in image_paths]
+    offsets = np.zeros(n + 1, np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in rows])
+    np.savez(os.path.join(tmp, 'meta.npz'),
+             hw=np.array([s[:2] for s in shapes], np.int32).reshape(-1, 2),
+             orig=np.array([s[2:] for s in shapes], np.int32).reshape(-1, 2),
+             labels=np.concatenate(rows) if rows else np.zeros((0, 5), np.float32),
+             offsets=offsets)
+    with open(os.path.join(tmp, 'index.json'), 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'imgsz': imgsz, 'files': list(image_paths),
+                   'created': time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+    try:
+        os.replace(tmp, directory)
+    except OSError:  # built concurrently by another process
+        shutil.rmtree(tmp, ignore_errors=True)
+    if verbose:
+        size = os.path.getsize(os.path.join(directory, 'images.u8')) / 1e9
+        print(f"✓ Cached {n} images at {imgsz} in {time.perf_counter() - t0:.1f} s "
+              f"({size:.2f} GB, {directory})")
+    return TrainCache(directory)
+
+
+class CachedYOLODataset(YOLODataset):
+    """YOLODataset whose images and labels come from a TrainCache instead of the files."""
+
+    cache_root = TRAIN_CACHE_DIR
+
+    def get_labels(self):
+        self.train_cache = build_cache(self.im_files, self.imgsz, self.cache_root)
+        labels = []
+        for i, path in enumerate(self.train_cache.files):
+            rows = self.train_cache.label_rows(i)
+            labels.append({'im_file': path, 'shape': tuple(int(v) for v in self.train_cache.orig[i]),
+                           'cls': rows[:, 0:1].copy(), 'bboxes': rows[:, 1:5].copy(),
+                           'segments': [], 'keypoints': None, 'normalized': True, 'bbox_format': 'xywh'})
+        self.im_files = list(self.train_cache.files)
+        return labels
+
+    def load_image(self, i, rect_mode=True):
+        image = self.train_cache.image(i)
+        if not rect_mode:
+            image = cv2.resize(image, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+        if self.augment:  # mosaic draws its extra images from this buffer
+            self.buffer.append(i)
+            if len(self.buffer) > self.max_buffer_length:
+                self.buffer.pop(0)
+        return image, tuple(int(v) for v in self.train_cache.orig[i]), image.shape[:2]
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """DetectionTrainer building CachedYOLODataset for train and val."""
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        gs = max(int(self.model.stride.max() if self.model else 0), 32)
+        cfg = self.args
+        return CachedYOLODataset(
+            img_path=img_path, imgsz=cfg.imgsz, batch_size=batch, augment=mode == 'train', hyp=cfg,
+            rect=cfg.rect or mode == 'val', cache=None, single_cls=cfg.single_cls or False, stride=gs,
+            pad=0.0 if mode == 'train' else 0.5, prefix=colorstr(f"{mode}: "), task=cfg.task,
+            classes=cfg.classes, data=self.data, fraction=cfg.fraction if mode == 'train' else 1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=('build', 'train'))
+    parser.add_argument('--data', default='data.yaml')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--splits', default='train,valid', help='splits to cache (build)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--model', default='yolov8n.pt', help='starting weights (train)')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--cache-dir', default=TRAIN_CACHE_DIR)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("TRAINING IMAGE CACHE")
+    print("="*60)
+    CachedYOLODataset.cache_root = args.cache_dir
+    if args.command == 'build':
+        for split in args.splits.split(','):
+            paths = split_images(args.data, split)
+            print(f"{split}: {len(paths)} images, key {dataset_hash(paths, args.imgsz)}")
+            build_cache(paths, args.imgsz, args.cache_dir, args.workers)
+        return
+    from ultralytics import YOLO
+    YOLO(args.model).train(data=args.data, epochs=args.epochs, imgsz=args.imgsz, device='cpu',
+                           workers=args.workers, trainer=CachedDetectionTrainer)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """
 Test YOLOv8s detection
+--daemon asks the running detector_daemon.py instead of loading the model again
 """
+import argparse
 import pyrealsense2 as rs
 import numpy as np
 import cv2
 import time
-from ultralytics import YOLO
+
+parser = argparse.ArgumentParser(description="Test YOLOv8s detection")
+parser.add_argument('--daemon', action='store_true', help='use the model kept loaded by detector_daemon.py')
+args = parser.parse_args()
 
 print("Testing YOLOv8s (better accuracy)...\n")
 
@@ -17,8 +22,16 @@ pipeline.start(config)
 time.sleep(2)
 
 # Load YOLOv8s
-model = YOLO('yolov8s.onnx', task='detect')
-print("✓ YOLOv8s loaded\n")
+if args.daemon:
+    from detector_daemon import DetectorClient
+    client = DetectorClient('yolov8s.onnx')
+    names = client.names
+    print("✓ YOLOv8s (detector daemon)\n")
+else:
+    from ultralytics import YOLO
+    model = YOLO('yolov8s.onnx', task='detect')
+    names = model.names
+    print("✓ YOLOv8s loaded\n")
 
 for i in range(10):
     frames = pipeline.poll_for_frames()
@@ -33,25 +46,34 @@ for i in range(10):
     img = np.asanyarray(color_frame.get_data())
     
     # Detect
-    results = model(img, verbose=False)
+    if args.daemon:
+        dets = client.detect(img)
+        boxes = [((d['x1'], d['y1'], d['x2'], d['y2']), int(d['cls']), float(d['conf'])) for d in dets]
+    else:
+        results = model(img, verbose=False)
+        boxes = [(box.xyxy[0].cpu().numpy(), int(box.cls[0]), float(box.conf[0])) for box in results[0].boxes]
     
-    print(f"Frame {i+1}: {len(results[0].boxes)} detections")
+    print(f"Frame {i+1}: {len(boxes)} detections")
     
-    for box in results[0].boxes:
-        cls_id = int(box.cls[0])
-        conf = float(box.conf[0])
-        name = model.names[cls_id]
+    annotated = img.copy() if args.daemon else results[0].plot()
+    for xyxy, cls_id, conf in boxes:
+        name = names.get(cls_id, str(cls_id))
         
         if cls_id == 32:  # Sports ball
             print(f"  ⚽ BALL: {conf:.2%}")
         else:
             print(f"  {name}: {conf:.2%}")
+        if not args.daemon:
+            continue
+        x1, y1, x2, y2 = [int(v) for v in xyxy]
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(annotated, f"{name} {conf:.2f}", (x1, max(12, y1 - 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
     
     # Save image
-    annotated = results[0].plot()
     cv2.imwrite(f'yolov8s_test_{i}.jpg', annotated)
     
     time.sleep(0.5)
 
 pipeline.stop()
-print("\n✓ Check yolov8s_test_*.jpg images")
\ No newline at end of file
+print("\n✓ Check yolov8s_test_*.jpg images")
@@ -1,29 +1,43 @@
 #!/usr/bin/env python3
 """
 Download and export YOLOv8s (better than nano)
+Also exports other checkpoints the same way, e.g. the custom model for onnx_detector.py:
+--dynamic writes <name>_dynamic.onnx with dynamic batch/size axes, which lets the offload
+inference server (offload.py) run frames from several robots in one batch
+Usage: python3 yolo_models.py [weights.pt] [--dynamic]   (default: yolov8s.pt)
 """
 from ultralytics import YOLO
 import os
+import sys
+
+dynamic = '--dynamic' in sys.argv
+positional = [a for a in sys.argv[1:] if not a.startswith('--')]
+weights = positional[0] if positional else 'yolov8s.pt'
+name = os.path.splitext(os.path.basename(weights))[0]
 
 print("="*60)
-print("DOWNLOADING YOLOv8s (SMALL - BETTER ACCURACY)")
+print(f"DOWNLOADING {name} (SMALL - BETTER ACCURACY)" if name == 'yolov8s' else f"EXPORTING {name}")
 print("="*60)
 
 # Download YOLOv8s
-print("\n1. Downloading YOLOv8s.pt...")
-model = YOLO('yolov8s.pt')  # Auto-downloads
-print(f"✓ Downloaded: {os.path.getsize('yolov8s.pt')/1e6:.1f} MB")
+print(f"\n1. Loading {weights}...")
+model = YOLO(weights)  # Auto-downloads stock weights
+print(f"✓ Loaded: {os.path.getsize(weights)/1e6:.1f} MB")
 
 # Export to ONNX
 print("\n2. Exporting to ONNX...")
-model.export(
+onnx_path = model.export(
     format='onnx',
     simplify=True,
-    dynamic=False,
+    dynamic=dynamic,
     opset=12,
     imgsz=640
 )
 
-print(f"\n✓ Created: yolov8s.onnx")
-print(f"💾 Size: {os.path.getsize('yolov8s.onnx')/1e6:.1f} MB")
-print("\n✅ Ready to use YOLOv8s!")
\ No newline at end of file
+if dynamic:
+    dynamic_path = onnx_path[:-len('.onnx')] + '_dynamic.onnx'
+    os.replace(onnx_path, dynamic_path)
+    onnx_path = dynamic_path
+print(f"\n✓ Created: {onnx_path}")
+print(f"💾 Size: {os.path.getsize(onnx_path)/1e6:.1f} MB")
+print(f"\n✅ Ready to use {name}!")